@@ -1,8 +1,12 @@
 import copy
+import functools
 import logging
+import multiprocessing
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from time import perf_counter
 
 import pandas as pd
 import numpy as np
@@ -18,8 +22,28 @@ import smrf
 import smrf.framework.logger as logger
 
 from awsm.framework import ascii_art
+from awsm.framework.run_cache import RunCache
+from awsm.framework.thread_budget import ThreadBudget
 from awsm.models.smrf_connector import SMRFConnector
 from awsm.models.pysnobal import PySnobal, ModelInit
+from awsm.models.pysnobal.grid_window import (TopoWindow, grid_shape,
+                                              grid_windows)
+from awsm.models.pysnobal.output_backends import output_file_path
+
+
+@functools.lru_cache(maxsize=None)
+def config_sections(modules):
+    """Sections of the master config for the modules, only parsed once per
+    process
+
+    Args:
+        modules (str): module name
+
+    Returns:
+        frozenset: section names
+    """
+
+    return frozenset(MasterConfig(modules=modules).cfg.keys())
 
 
 class AWSM():
@@ -33,15 +57,27 @@ class AWSM():
     Attributes:
     """
 
-    def __init__(self, config):
+    def __init__(self, config, topo=None, init_state=None, validate=True,
+                 model=True, setup_run=True):
         """
         Initialize the model, read config file, start and end date, and logging
         Args:
             config: string path to the config file or inicheck UserConfig
                 instance
+            topo: topo already loaded for this config, loaded from the config
+                if None
+            init_state: model init fields handed over in memory from the
+                previous run, instead of reading the init file
+            validate: check the config, can be turned off for a config that
+                was already checked
+            model: initialize the model state, turned off when only running
+                SMRF
+            setup_run: create the run folder, the log and the config
+                backup, turned off when the model reuses those of the SMRF
+                run for the same day in another process
         """
 
-        self.read_config(config)
+        self.read_config(config, validate)
 
         # create blank log and error log because logger is not initialized yet
         self.tmp_log = []
@@ -50,8 +86,8 @@ class AWSM():
 
         self.parse_time()
         self.parse_folder_structure()
-        self.mk_directories()
-        self.create_log()
+        self.mk_directories(setup_run)
+        self.create_log(setup_run)
 
         # ################## Decide which modules to run #####################
         self.do_smrf = self.config['awsm master']['run_smrf']
@@ -60,6 +96,25 @@ class AWSM():
         #     self.config['awsm master']['run_smrf_ipysnobal']
         # self.do_ipysnobal = self.config['awsm master']['run_ipysnobal']
 
+        self.thread_budget = None
+        system = self.config['awsm system']
+        if system['thread_budget'] and \
+                self.model_type == 'smrf_ipysnobal' and \
+                self.config['system']['threading']:
+            self.thread_budget = ThreadBudget(
+                system['budget_cpus'],
+                system['model_fraction'],
+                system['io_cpus'],
+                system['pin_threads'])
+
+        # skip the stages that already finished with the same inputs, a
+        # crash restart always runs
+        self.run_cache = None
+        if system['run_cache'] and \
+                not self.config['isnobal restart']['restart_crash']:
+            self.run_cache = RunCache(
+                self.path_output, system['run_cache_files'] == 'hash')
+
         # store smrf version if running smrf
         self.smrf_version = smrf.__version__
 
@@ -74,6 +129,10 @@ class AWSM():
 
         self.model_restart()
 
+        # out-of-core runs model a window of rows of the grid at a time
+        self.tile_rows = self.config['ipysnobal']['tile_rows']
+        self.window = None
+
         # read in update depth parameters
         self.update_depth = False
         if 'update depth' in self.config:
@@ -86,36 +145,48 @@ class AWSM():
                 if not isinstance(self.flight_numbers, list):
                     self.flight_numbers = [self.flight_numbers]
 
+        self.check_out_of_core()
+
         # ################ Topo data for iSnobal ##################
         self.soil_temp = self.config['soil_temp']['temp']
-        self.load_topo()
+        if self.out_of_core:
+            # the topo is read for each window when running the model
+            self.topo = None
+        elif topo is None:
+            self.load_topo()
+        else:
+            self.topo = topo
 
         # ################ Generate config backup ##################
         # if self.config['output']['input_backup']:
         # set location for backup and output backup of awsm sections
         config_backup_location = \
             os.path.join(self.path_output, 'awsm_config_backup.ini')
-        generate_config(self.ucfg, config_backup_location)
+        if setup_run:
+            generate_config(self.ucfg, config_backup_location)
 
         self.smrf_connector = SMRFConnector(self)
+        self.pysnobal = None
+        self.model_init = None
 
         # if we have a model, initialize it
-        if self.model_type is not None:
+        if self.model_type is not None and model and not self.out_of_core:
             self.model_init = ModelInit(
                 self.config,
                 self.topo,
                 self.path_output,
-                self.start_date)
+                self.start_date,
+                init_state)
 
     @property
     def awsm_config_sections(self):
-        return MasterConfig(modules='awsm').cfg.keys()
+        return config_sections('awsm')
 
     @property
     def smrf_config_sections(self):
-        return MasterConfig(modules='smrf').cfg.keys()
+        return config_sections('smrf')
 
-    def read_config(self, config):
+    def read_config(self, config, validate=True):
         if isinstance(config, str):
             if not os.path.isfile(config):
                 raise Exception('Configuration file does not exist --> {}'
@@ -141,15 +212,8 @@ class AWSM():
             raise Exception("""Config passed to AWSM is neither file """
                             """name nor UserConfig instance""")
 
-        warnings, errors = check_config(self.ucfg)
-
-        if len(errors) > 0:
-            print_config_report(warnings, errors)
-            print("Errors in the config file. "
-                  "See configuration status report above.")
-            sys.exit()
-        elif len(warnings) > 0:
-            print_config_report(warnings, errors)
+        if validate:
+            validate_config(self.ucfg)
 
         self.config = self.ucfg.cfg
 
@@ -221,10 +285,14 @@ class AWSM():
             raise ValueError('Cannot run daily_folders with anything other'
                              ' than run_smrf_ipysnobal')
 
-    def create_log(self):
+    def create_log(self, new_log=True):
         """
         Now that the directory structure is done, create log file and print out
         saved logging statements.
+
+        Args:
+            new_log: start the log with the AWSM title, off when appending to
+                the log of the SMRF run for the same day
         """
 
         # setup the logging
@@ -243,8 +311,9 @@ class AWSM():
                 not os.getenv('SUPPRESS_AWSM_STDOUT'):
             print('Logging to file: {}'.format(logfile))
 
-        self._logger.info(ascii_art.MOUNTAIN)
-        self._logger.info(ascii_art.TITLE)
+        if new_log:
+            self._logger.info(ascii_art.MOUNTAIN)
+            self._logger.info(ascii_art.TITLE)
 
         # dump saved logs
         for line in self.tmp_log:
@@ -259,6 +328,16 @@ class AWSM():
         like storm days for certrain models
         """
 
+        if self.config['ipysnobal']['restart_checkpoint'] is not None:
+            if self.model_type != 'ipysnobal':
+                raise ValueError(
+                    'Restarting from a checkpoint requires the ipysnobal '
+                    'model_type, SMRF does not restart from a checkpoint')
+            if self.config['ipysnobal']['restart_date_time'] is not None:
+                raise ValueError(
+                    'Use either restart_checkpoint or restart_date_time '
+                    'to restart')
+
         if self.config['ipysnobal']['restart_date_time'] is not None:
             self.start_date = self.config['ipysnobal']['restart_date_time']
             self.start_date = self.start_date - \
@@ -278,6 +357,33 @@ class AWSM():
                     'storm_days.nc'
                 )
 
+    @property
+    def out_of_core(self):
+        """The model is run one window of rows of the grid at a time"""
+        return self.tile_rows > 0
+
+    def check_out_of_core(self):
+        """Check that the options work with an out-of-core run
+
+        Raises:
+            ValueError: if an option needs the whole grid in memory
+        """
+
+        if not self.out_of_core:
+            return
+
+        if self.model_type != 'ipysnobal':
+            raise ValueError(
+                'tile_rows requires the ipysnobal model_type, SMRF '
+                'distributes the whole grid')
+        if self.config['ipysnobal']['restart_checkpoint'] is not None or \
+                self.config['ipysnobal']['checkpoint_frequency'] > 0:
+            raise ValueError('Checkpoints are not supported with tile_rows')
+        # the depth updates use the state of the whole grid, the minimum
+        # non-zero depth and the window search would differ by tile
+        if self.update_depth:
+            raise ValueError('Depth updates are not supported with tile_rows')
+
     def run_smrf(self):
         """
         Run smrf through the :mod: `awsm.smrf_connector.SMRFConnector`
@@ -290,18 +396,158 @@ class AWSM():
         Run smrf and pass inputs to ipysnobal in memory.
         """
 
-        PySnobal(self).run_smrf_ipysnobal()
-        # smrf_ipy.run_smrf_ipysnobal(self)
+        self.pysnobal = PySnobal(self)
+        self.pysnobal.run_smrf_ipysnobal()
 
     def run_ipysnobal(self):
         """
         Run PySnobal from previously run smrf forcing data
         """
-        PySnobal(self).run_ipysnobal()
 
-    def mk_directories(self):
+        if self.out_of_core:
+            self.run_ipysnobal_tiles()
+            return
+
+        self.pysnobal = PySnobal(self)
+        self.pysnobal.run_ipysnobal()
+
+    def stage_fingerprint(self, stage):
+        """
+        Fingerprint of the inputs of a stage of the run. SMRF is
+        fingerprinted from the SMRF config, the model from the full config,
+        the forcing files it reads and the init fields.
+
+        Args:
+            stage: smrf, ipysnobal or smrf_ipysnobal
+
+        Returns:
+            str: hex digest of the fingerprint
+        """
+
+        if stage == 'smrf':
+            return self.run_cache.fingerprint(
+                self.smrf_connector.smrf_config.cfg)
+
+        files = []
+        if stage == 'ipysnobal':
+            files = [
+                os.path.join(self.path_output, '{}.nc'.format(variable))
+                for variable in SMRFConnector.MAP_INPUTS
+            ]
+
+        # the init fields are the same when read from the init file or
+        # handed over in memory, out-of-core runs read them per window
+        arrays = None
+        if self.model_init is not None:
+            arrays = self.model_init.init
+
+        return self.run_cache.fingerprint(self.config, files, arrays)
+
+    def stage_outputs(self, stage):
+        """
+        Output files a stage writes to the run folder
+
+        Args:
+            stage: smrf, ipysnobal or smrf_ipysnobal
+
+        Returns:
+            list: output file paths
+        """
+
+        if stage == 'smrf':
+            return [
+                os.path.join(self.path_output, '{}.nc'.format(variable))
+                for variable in self.config['output']['variables']
+            ]
+
+        return [output_file_path(self.path_output, self.config)]
+
+    def run_stage(self, stage, run, force=False):
+        """
+        Run a stage, unless the run cache is on and the stage already
+        finished with the same fingerprint and its outputs exist
+
+        Args:
+            stage: smrf, ipysnobal or smrf_ipysnobal
+            run: method that runs the stage
+            force: run the stage even if it is current
+        """
+
+        if self.run_cache is None:
+            run()
+            return
+
+        fingerprint = self.stage_fingerprint(stage)
+        if not force and self.run_cache.is_current(stage, fingerprint):
+            self._logger.info(
+                'Skipping {}, the inputs are unchanged and the outputs '
+                'exist in {}'.format(stage, self.path_output))
+            return
+
+        self.run_cache.invalidate(stage)
+        run()
+        self.run_cache.record(stage, fingerprint, self.stage_outputs(stage))
+
+    def run_ipysnobal_tiles(self):
+        """
+        Run PySnobal out-of-core, the full time series for one window of
+        rows at a time. Each window reads its rows of the topo, init and
+        forcing and writes its rows of the output.
+        """
+
+        ny, nx = grid_shape(self.config['topo'])
+
+        windows = grid_windows(ny, self.tile_rows)
+        self._logger.info(
+            'Running iPysnobal out-of-core for a {} x {} grid in {} tiles '
+            'of {} rows'.format(ny, nx, len(windows), self.tile_rows))
+
+        try:
+            for self.window in windows:
+                self._logger.info('Running {}'.format(self.window))
+
+                self.topo = TopoWindow(
+                    self.config['topo'],
+                    self.window,
+                    self.config['ipysnobal']['mask_isnobal'])
+                self.model_init = ModelInit(
+                    self.config,
+                    self.topo,
+                    self.path_output,
+                    self.start_date,
+                    window=self.window)
+
+                self.pysnobal = PySnobal(self)
+                self.pysnobal.run_ipysnobal()
+
+                # release the window before reading the next one
+                self.model_init = None
+                self.pysnobal = None
+
+        finally:
+            self.window = None
+            self.topo = None
+
+    def restart_state(self):
+        """Model state at the end of the run to initialize the next run in
+        memory
+
+        Returns:
+            dict: init fields, None if the model did not run or the state
+                can't be handed over
+        """
+
+        if self.pysnobal is None or self.out_of_core:
+            return None
+        return self.pysnobal.restart_state()
+
+    def mk_directories(self, create=True):
         """
         Create all needed directories starting from the working drive
+
+        Args:
+            create: create the directories, off when they were created by the
+                SMRF run for the same day
         """
         # rigid directory work
         self.tmp_log.append('AWSM creating directories')
@@ -340,7 +586,10 @@ class AWSM():
         path_names_att = ['path_output', 'path_log']
 
         # Only start if your drive exists
-        if os.path.exists(self.path_dr):
+        if not create:
+            self.tmp_log.append('Using the directories of the SMRF run')
+
+        elif os.path.exists(self.path_dr):
             self.make_rigid_directories(path_names_att)
             self.create_project_description()
 
@@ -397,135 +646,383 @@ class AWSM():
         logging.shutdown()
 
 
-def run_awsm_daily_ops(config_file):
+def validate_config(ucfg):
+    """Check the config and exit if there are errors
+
+    Args:
+        ucfg: inicheck UserConfig instance
+    """
+
+    warnings, errors = check_config(ucfg)
+
+    if len(errors) > 0:
+        print_config_report(warnings, errors)
+        print("Errors in the config file. "
+              "See configuration status report above.")
+        sys.exit()
+    elif len(warnings) > 0:
+        print_config_report(warnings, errors)
+
+
+def _run_smrf_day(config, force=False):
+    """
+    Run only SMRF for a day in a daily pipeline worker process
+
+    Args:
+        config: UserConfig for the day
+        force: run SMRF even if the run cache has it
+
+    Returns:
+        tuple: run folder of the day and seconds SMRF took
+    """
+
+    start = perf_counter()
+    a = run_awsm(config, validate=False, model=False, force=force)
+    return a.path_output, perf_counter() - start
+
+
+class DailyOps():
     """
-    Run each day seperately. Calls run_awsm
+    Run AWSM for each day separately in a single process. The config is
+    read, cast and checked and the topo is loaded once for all the days.
+    Each day gets its own copy of the config sections and writes its own
+    run folder and outputs. The model state at the end of a day is handed
+    to the next day in memory, rounded to the output precision so the next
+    day starts from the same state as reading the previous day's output.
+
+    With ``[awsm system] daily_pipeline``, SMRF for the next day runs in a
+    worker process while the model runs the current day. SMRF only depends
+    on the previous day through the storm days file, which the previous
+    SMRF run has written by the time the next day's config is made.
+
+    With ``[awsm system] run_cache``, the days that already finished with
+    the same inputs are skipped unless ``force`` is set.
+
+    Args:
+        config_file: string path to the config file
+        force: run every stage even if the run cache has it
     """
+
     # define some formats
-    fmt_day = '%Y%m%d'
-    fmt_cfg = '%Y-%m-%d %H:%M'
-    add_day = pd.to_timedelta(24, unit='h')
-
-    # get config instance
-    config = get_user_config(config_file,
-                             modules=['smrf', 'awsm'])
-
-    # copy the config and get total start and end
-    # config = deepcopy(base_config)
-    # set naming style
-    config.raw_cfg['paths']['folder_date_style'] = 'day'
-    config.apply_recipes()
-    config = cast_all_variables(config, config.mcfg)
-
-    # get the water year
-    cfg_start_date = pd.to_datetime(config.cfg['time']['start_date'])
-    tzinfo = pytz.timezone(config.cfg['time']['time_zone'])
-    wy = utils.water_day(cfg_start_date.replace(tzinfo=tzinfo))[1]
-
-    # find the model start depending on restart
-    if config.cfg['isnobal restart']['restart_crash']:
-        offset_wyhr = int(config.cfg['isnobal restart']['wyh_restart_output'])
-        wy_start = pd.to_datetime('{:d}-10-01'.format(wy - 1))
-        model_start = wy_start + pd.to_timedelta(offset_wyhr, unit='h')
-    else:
-        model_start = config.cfg['time']['start_date']
-
-    model_end = config.cfg['time']['end_date']
-
-    # find output location for previous output
-    paths = config.cfg['paths']
-
-    prev_out_base = os.path.join(paths['path_dr'],
-                                 paths['basin'],
-                                 'wy{}'.format(wy),
-                                 paths['project_name'],
-                                 'runs')
-
-    prev_data_base = os.path.join(paths['path_dr'],
-                                  paths['basin'],
-                                  'wy{}'.format(wy),
-                                  paths['project_name'],
-                                  'data')
-
-    # find day of start and end
-    start_day = pd.to_datetime(model_start.strftime(fmt_day))
-    end_day = pd.to_datetime(model_end.strftime(fmt_day))
-
-    # find total range of run
-    ndays = int((end_day-start_day).days) + 1
-    date_list = [start_day +
-                 pd.to_timedelta(x, unit='D') for x in range(0, ndays)]
-
-    # loop through daily runs and run awsm
-    for idd, sd in enumerate(date_list):
-        new_config = copy.deepcopy(config)
-        if idd > 0:
-            new_config.raw_cfg['isnobal restart']['restart_crash'] = False
-            new_config.raw_cfg['ipysnobal']['thresh_normal'] = 60
-            new_config.raw_cfg['ipysnobal']['thresh_medium'] = 10
-            new_config.raw_cfg['ipysnobal']['thresh_small'] = 1
+    FMT_DAY = '%Y%m%d'
+    FMT_CFG = '%Y-%m-%d %H:%M'
+
+    def __init__(self, config_file, force=False):
+
+        # get config instance
+        config = get_user_config(config_file,
+                                 modules=['smrf', 'awsm'])
+
+        # set naming style
+        config.raw_cfg['paths']['folder_date_style'] = 'day'
+        config.apply_recipes()
+        self.config = cast_all_variables(config, config.mcfg)
+        validate_config(self.config)
+
+        # the worker process is started with a spawn context
+        if self.config.cfg['awsm system']['daily_pipeline'] and \
+                sys.version_info < (3, 7):
+            raise ValueError(
+                'daily_pipeline requires Python 3.7 or later')
+
+        self.topo = None
+        self.force = force
+        self.timing = []
+        self._logger = logging.getLogger(__name__)
+
+        # get the water year
+        cfg_start_date = pd.to_datetime(self.config.cfg['time']['start_date'])
+        tzinfo = pytz.timezone(self.config.cfg['time']['time_zone'])
+        wy = utils.water_day(cfg_start_date.replace(tzinfo=tzinfo))[1]
+
+        # find the model start depending on restart
+        if self.config.cfg['isnobal restart']['restart_crash']:
+            offset_wyhr = int(
+                self.config.cfg['isnobal restart']['wyh_restart_output'])
+            wy_start = pd.to_datetime('{:d}-10-01'.format(wy - 1))
+            self.model_start = wy_start + \
+                pd.to_timedelta(offset_wyhr, unit='h')
+        else:
+            self.model_start = self.config.cfg['time']['start_date']
+
+        self.model_end = self.config.cfg['time']['end_date']
+
+        # find output location for previous SMRF data
+        paths = self.config.cfg['paths']
+        self.prev_data_base = os.path.join(paths['path_dr'],
+                                           paths['basin'],
+                                           'wy{}'.format(wy),
+                                           paths['project_name'],
+                                           'data')
+
+        # find day of start and end
+        start_day = pd.to_datetime(self.model_start.strftime(self.FMT_DAY))
+        end_day = pd.to_datetime(self.model_end.strftime(self.FMT_DAY))
+
+        # find total range of run
+        ndays = int((end_day-start_day).days) + 1
+        self.date_list = [
+            start_day + pd.to_timedelta(x, unit='D') for x in range(0, ndays)
+        ]
+
+    @property
+    def pipeline(self):
+        """Check if SMRF can run ahead of the model"""
+
+        cfg = self.config.cfg
+        return cfg['awsm system']['daily_pipeline'] and \
+            cfg['awsm master']['run_smrf'] and \
+            cfg['awsm master']['model_type'] == 'ipysnobal' and \
+            not cfg['isnobal restart']['restart_crash']
+
+    def day_dates(self, sd):
+        """
+        Start and end date of a day, within the model date range
+
+        Args:
+            sd: start of the day
+
+        Returns:
+            tuple: start and end date
+        """
+
         # get the end of the day
-        ed = sd + add_day
+        ed = sd + pd.to_timedelta(24, unit='h')
 
         # make sure we're in the model date range
-        if sd < model_start:
-            sd = model_start
-        if ed > model_end:
-            ed = model_end
+        if sd < self.model_start:
+            sd = self.model_start
+        if ed > self.model_end:
+            ed = self.model_end
+
+        return sd, ed
+
+    def day_config(self, idd, sd, ed, prev_path_output):
+        """
+        Config for a single day. The sections are copied from the cast and
+        the raw config and both are changed the same way as the config for
+        a separate run, so the config backup of the day has its dates and
+        initialization.
+
+        Args:
+            idd: index of the day
+            sd: start date of the day
+            ed: end date of the day
+            prev_path_output: run folder of the previous day
+
+        Returns:
+            UserConfig for the day
+        """
+
+        new_config = copy.copy(self.config)
+        new_config.cfg = {
+            section: copy.copy(items)
+            for section, items in self.config.cfg.items()
+        }
+        new_config.raw_cfg = {
+            section: copy.copy(items)
+            for section, items in self.config.raw_cfg.items()
+        }
+
+        def set_item(section, item, value, raw_value=None):
+            """Set the cast value and the raw value the config backup and
+            a recast of the config use
+            """
+            new_config.cfg[section][item] = value
+            new_config.raw_cfg.setdefault(section, {})[item] = \
+                value if raw_value is None else raw_value
+
+        if idd > 0:
+            set_item('isnobal restart', 'restart_crash', False)
+            set_item('ipysnobal', 'thresh_normal', 60)
+            set_item('ipysnobal', 'thresh_medium', 10)
+            set_item('ipysnobal', 'thresh_small', 1)
 
         # set the start and end dates
-        new_config.raw_cfg['time']['start_date'] = sd.strftime(fmt_cfg)
-        new_config.raw_cfg['time']['end_date'] = ed.strftime(fmt_cfg)
+        for item, date in (('start_date', sd), ('end_date', ed)):
+            set_item('time', item,
+                     pd.to_datetime(date.strftime(self.FMT_CFG)),
+                     date.strftime(self.FMT_CFG))
 
         # reset the initialization
         if idd > 0:
-            # find previous output file
-            prev_day = sd - pd.to_timedelta(1, unit='D')
-            prev_out = os.path.join(prev_out_base,
-                                    'run{}'.format(prev_day.strftime(fmt_day)),
-                                    'ipysnobal.nc')
-            # reset if running the model
+            # reset if running the model, the state itself is handed over
+            # in memory when it can be
             if new_config.cfg['awsm master']['model_type'] is not None:
-                new_config.raw_cfg['ipysnobal']['init_type'] = 'netcdf_out'
-                new_config.raw_cfg['ipysnobal']['init_file'] = prev_out
+                set_item('ipysnobal', 'init_type', 'netcdf_out')
+                set_item('ipysnobal', 'init_file', output_file_path(
+                    prev_path_output, new_config.cfg))
 
             # if we have a previous storm day file, use it
-            prev_storm = os.path.join(prev_data_base,
+            prev_day = sd - pd.to_timedelta(1, unit='D')
+            prev_storm = os.path.join(self.prev_data_base,
                                       'data{}'.format(
-                                          prev_day.strftime(fmt_day)),
+                                          prev_day.strftime(self.FMT_DAY)),
                                       'smrfOutputs', 'storm_days.nc')
             if os.path.isfile(prev_storm):
-                new_config.raw_cfg['precip']['storm_days_restart'] = prev_storm
+                set_item('precip', 'storm_days_restart', prev_storm)
+
+        return new_config
+
+    def run(self):
+        """
+        Run the days in order
+        """
+
+        if self.pipeline:
+            self.run_pipeline()
+        else:
+            self.run_sequential()
 
-        # apply recipes with new settings
-        new_config.apply_recipes()
-        new_config = cast_all_variables(new_config, new_config.mcfg)
+        self.log_timing()
 
-        # run awsm for the day
-        run_awsm(new_config)
+    def run_sequential(self):
+        """
+        Run SMRF and the model for each day, one after the other
+        """
+
+        previous = None
+
+        for idd, day in enumerate(self.date_list):
+            sd, ed = self.day_dates(day)
+
+            prev_path_output = None
+            init_state = None
+            if previous is not None:
+                prev_path_output = previous.path_output
+                init_state = previous.restart_state()
+
+            # run awsm for the day
+            start = perf_counter()
+            previous = run_awsm(
+                self.day_config(idd, sd, ed, prev_path_output),
+                topo=self.topo,
+                init_state=init_state,
+                validate=False,
+                force=self.force)
+            self.topo = previous.topo
+
+            self.timing.append({
+                'day': sd,
+                'total': perf_counter() - start,
+            })
+
+    def run_pipeline(self):
+        """
+        Run SMRF for the next day in a worker process while the model runs
+        the current day. The SMRF run creates the run folder, the log and
+        the config backup of the day, the model appends to its log.
+        """
+
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'))
+
+        try:
+            sd, ed = self.day_dates(self.date_list[0])
+            config = self.day_config(0, sd, ed, None)
+            smrf_future = executor.submit(_run_smrf_day, config, self.force)
+            previous = None
+
+            for idd in range(len(self.date_list)):
+                start = perf_counter()
+                path_output, smrf_time = smrf_future.result()
+                wait_time = perf_counter() - start
+
+                # SMRF for the next day, now that the storm days are written
+                if idd + 1 < len(self.date_list):
+                    next_sd, next_ed = self.day_dates(self.date_list[idd + 1])
+                    next_config = self.day_config(
+                        idd + 1, next_sd, next_ed, path_output)
+                    smrf_future = executor.submit(
+                        _run_smrf_day, next_config, self.force)
+
+                init_state = None
+                if previous is not None:
+                    init_state = previous.restart_state()
+
+                start = perf_counter()
+                previous = run_awsm(
+                    config,
+                    topo=self.topo,
+                    init_state=init_state,
+                    validate=False,
+                    smrf=False,
+                    force=self.force,
+                    setup_run=False)
+                self.topo = previous.topo
+
+                self.timing.append({
+                    'day': sd,
+                    'smrf': smrf_time,
+                    'wait': wait_time,
+                    'model': perf_counter() - start,
+                })
+
+                if idd + 1 < len(self.date_list):
+                    sd, config = next_sd, next_config
+
+        finally:
+            executor.shutdown()
+
+    def log_timing(self):
+        """
+        Log the time spent in each stage of each day
+        """
+
+        for timing in self.timing:
+            self._logger.info('Daily run {} took {}'.format(
+                timing['day'].strftime(self.FMT_CFG),
+                ', '.join([
+                    '{} {:.1f} s'.format(stage, value)
+                    for stage, value in timing.items() if stage != 'day'
+                ])))
 
 
-def run_awsm(config):
+def run_awsm_daily_ops(config_file, force=False):
+    """
+    Run each day seperately in a single process. See :class:`DailyOps`
+    """
+
+    DailyOps(config_file, force).run()
+
+
+def run_awsm(config, topo=None, init_state=None, validate=True, smrf=True,
+             model=True, force=False, setup_run=True):
     """
     Function that runs awsm how it should be operate for full runs.
 
     Args:
         config: string path to the config file or inicheck UserConfig instance
+        topo: topo already loaded for the config
+        init_state: model init fields handed over from the previous run
+        validate: check the config before running
+        smrf: run SMRF if the config runs SMRF separately from the model
+        model: run the model
+        force: run the stages even if the run cache has them, see
+            ``[awsm system] run_cache``
+        setup_run: create the run folder, the log and the config backup,
+            see :class:`AWSM`
+
+    Returns:
+        AWSM instance that was run
     """
 
-    with AWSM(config) as a:
+    with AWSM(config, topo, init_state, validate, model, setup_run) as a:
         if not a.config['isnobal restart']['restart_crash']:
-            if a.do_smrf:
-                a.run_smrf()
+            if a.do_smrf and smrf:
+                a.run_stage('smrf', a.run_smrf, force)
 
-            if a.model_type == 'ipysnobal':
-                a.run_ipysnobal()
+            if a.model_type == 'ipysnobal' and model:
+                a.run_stage('ipysnobal', a.run_ipysnobal, force)
 
         # if restart
         else:
-            if a.model_type == 'ipysnobal':
+            if a.model_type == 'ipysnobal' and model:
                 a.run_ipysnobal()
 
         # Run iPySnobal from SMRF in memory
-        if a.model_type == 'smrf_ipysnobal':
-            a.run_smrf_ipysnobal()
+        if a.model_type == 'smrf_ipysnobal' and model:
+            a.run_stage('smrf_ipysnobal', a.run_smrf_ipysnobal, force)
+
+    return a
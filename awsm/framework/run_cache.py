@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import smrf
+
+from awsm import __version__
+
+
+class RunCache():
+    """Fingerprints of the stages of a run, recorded in the run folder so
+    running the same run again skips the stages that already finished.
+
+    A stage fingerprint hashes the software versions, the casted config,
+    the files referenced by the config, any extra input files of the stage
+    and the model init fields. Files are fingerprinted by their modification
+    time and size, or by a hash of their contents with ``hash_files``.
+    Directories are fingerprinted by their own modification time and size.
+    The run folder, anything in it and the folders above it are written by
+    the run itself and are left out of the file fingerprints.
+
+    The fingerprint of a stage and the outputs it wrote are recorded once
+    the stage finishes. A stage is current when the recorded fingerprint
+    matches and all of its outputs exist.
+
+    Args:
+        path_output (str): run folder
+        hash_files (bool): fingerprint the files by a hash of their
+            contents instead of their modification time and size
+    """
+
+    RECORD_FILE = 'run_fingerprint.json'
+
+    # config that does not change the outputs of a run
+    IGNORE_SECTIONS = frozenset(['logging'])
+    IGNORE_ITEMS = {
+        'awsm system': frozenset([
+            'log_level', 'log_to_file', 'log_file', 'run_cache',
+            'run_cache_files', 'queue_telemetry',
+            'queue_telemetry_interval']),
+        'system': frozenset(['log_level', 'log_file', 'qotw']),
+    }
+
+    # bytes read at a time when hashing the contents of a file
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, path_output, hash_files=False):
+
+        self._logger = logging.getLogger(__name__)
+
+        self.path_output = os.path.realpath(path_output)
+        self.record_file = os.path.join(path_output, self.RECORD_FILE)
+        self.hash_files = hash_files
+
+    def written_by_run(self, path):
+        """Check if a path is the run folder, in it or above it
+
+        Args:
+            path (str): file or directory
+
+        Returns:
+            bool: True if the run writes to the path
+        """
+
+        path = os.path.realpath(path)
+        try:
+            common = os.path.commonpath([path, self.path_output])
+        except ValueError:
+            return False
+        return common in (path, self.path_output)
+
+    def file_signature(self, path):
+        """Signature of a file or directory, its contents hash or its
+        modification time and size
+
+        Args:
+            path (str): existing file or directory
+
+        Returns:
+            str: file signature
+        """
+
+        if self.hash_files and os.path.isfile(path):
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                    sha.update(chunk)
+            return sha.hexdigest()
+
+        stat = os.stat(path)
+        return '{} {}'.format(stat.st_mtime_ns, stat.st_size)
+
+    def update_path(self, sha, value):
+        if isinstance(value, str) and os.path.exists(value) and \
+                not self.written_by_run(value):
+            sha.update(self.file_signature(value).encode())
+
+    def fingerprint(self, config, files=(), arrays=None):
+        """Hash the inputs of a stage
+
+        Args:
+            config (dict): casted config sections of the stage
+            files (list): input files of the stage that are not in the
+                config
+            arrays (dict): input fields of the stage, like the model init
+
+        Returns:
+            str: hex digest of the fingerprint
+        """
+
+        sha = hashlib.sha256()
+        sha.update('awsm {} smrf {}'.format(
+            __version__, smrf.__version__).encode())
+
+        for section in sorted(config.keys()):
+            if section in self.IGNORE_SECTIONS:
+                continue
+
+            ignore = self.IGNORE_ITEMS.get(section, ())
+            items = config[section]
+            for item in sorted(items.keys()):
+                if item in ignore:
+                    continue
+
+                sha.update('[{}] {} = {}'.format(
+                    section, item, items[item]).encode())
+
+                values = items[item]
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    self.update_path(sha, value)
+
+        for path in files:
+            sha.update(path.encode())
+            if os.path.exists(path):
+                sha.update(self.file_signature(path).encode())
+
+        if arrays is not None:
+            for name in sorted(arrays.keys()):
+                values = np.ascontiguousarray(arrays[name])
+                sha.update('{} {} {}'.format(
+                    name, values.dtype.str, values.shape).encode())
+                sha.update(values.data)
+
+        return sha.hexdigest()
+
+    def load(self):
+        """Read the recorded stages of the run
+
+        Returns:
+            dict: fingerprint, outputs and finish time by stage
+        """
+
+        if not os.path.isfile(self.record_file):
+            return {}
+
+        with open(self.record_file, 'r') as f:
+            return json.load(f)['stages']
+
+    def write(self, stages):
+        """Replace the recorded stages, a partly written record is never
+        read
+
+        Args:
+            stages (dict): fingerprint, outputs and finish time by stage
+        """
+
+        tmp_file = '{}.tmp'.format(self.record_file)
+        with open(tmp_file, 'w') as f:
+            json.dump({'stages': stages}, f, indent=2)
+        os.replace(tmp_file, self.record_file)
+
+    def is_current(self, stage, fingerprint):
+        """Check if a stage finished with the same fingerprint and its
+        outputs still exist
+
+        Args:
+            stage (str): stage name
+            fingerprint (str): fingerprint of the stage inputs
+
+        Returns:
+            bool: True if the stage can be skipped
+        """
+
+        record = self.load().get(stage)
+        if record is None or record['fingerprint'] != fingerprint:
+            return False
+
+        return all(
+            os.path.exists(os.path.join(self.path_output, output))
+            for output in record['outputs'])
+
+    def invalidate(self, stage):
+        """Remove the record of a stage before running it, so a stage that
+        fails part way is run again
+
+        Args:
+            stage (str): stage name
+        """
+
+        stages = self.load()
+        if stages.pop(stage, None) is not None:
+            self.write(stages)
+
+    def record(self, stage, fingerprint, outputs):
+        """Record a finished stage
+
+        Args:
+            stage (str): stage name
+            fingerprint (str): fingerprint of the stage inputs
+            outputs (list): output files of the stage in the run folder
+        """
+
+        stages = self.load()
+        stages[stage] = {
+            'fingerprint': fingerprint,
+            'outputs': [os.path.basename(output) for output in outputs],
+            'finished': datetime.now().isoformat(),
+        }
+        self.write(stages)
+        self._logger.info('Recorded the {} fingerprint {} in {}'.format(
+            stage, fingerprint[:16], self.record_file))
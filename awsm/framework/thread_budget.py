@@ -0,0 +1,249 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# thread groups of a threaded smrf_ipysnobal run
+GROUPS = ('smrf', 'model', 'io')
+
+# environment variables of the BLAS thread pools, the OpenMP threads run
+# the iSnobal kernel and are left alone
+BLAS_VARIABLES = ('OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+# CPU time of the calling thread, only on Python 3.7 or later. The process
+# CPU time can't be split between the groups, so the utilization is not
+# measured without it
+THREAD_TIME = getattr(time, 'thread_time', None)
+
+
+def cpu_list():
+    """CPUs the process is allowed to run on"""
+
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cpus(cpus, model_fraction=0.5, io_cpus=1):
+    """Divide the CPUs between the SMRF distribution, model and I/O
+    thread groups. The I/O group takes the last ``io_cpus`` CPUs and the
+    model ``model_fraction`` of the rest. With less than a CPU for every
+    group, the groups share all the CPUs.
+
+    Args:
+        cpus (list): CPUs to divide
+        model_fraction (float): fraction of the CPUs not used for I/O that
+            run the model
+        io_cpus (int): number of CPUs for the I/O threads
+
+    Returns:
+        dict: CPUs of each group
+    """
+
+    cpus = list(cpus)
+    if len(cpus) < len(GROUPS):
+        return {group: cpus for group in GROUPS}
+
+    io_cpus = min(max(io_cpus, 1), len(cpus) - 2)
+    compute = len(cpus) - io_cpus
+    model_cpus = min(max(int(round(compute * model_fraction)), 1),
+                     compute - 1)
+
+    return {
+        'smrf': cpus[:compute - model_cpus],
+        'model': cpus[compute - model_cpus:compute],
+        'io': cpus[compute:],
+    }
+
+
+class ThreadBudget():
+    """Divide the CPUs between the thread groups of a threaded
+    smrf_ipysnobal run. SMRF's distribution threads, the output and queue
+    cleaner threads, the iPysnobal thread with its ``ithreads`` OpenMP
+    workers and the BLAS threads of NumPy otherwise all compete for the
+    same cores.
+
+    The model group sets the maximum ``ithreads``, the BLAS thread pools
+    are limited to one thread while the threads run as the SMRF variables
+    are already distributed in parallel. Optionally each group is pinned
+    to its CPUs, threads started by a pinned thread like the OpenMP workers
+    keep the CPUs. The CPU time of each group is measured for the run log.
+
+    Args:
+        cpus (int): number of CPUs to divide, all the available CPUs if
+            None
+        model_fraction (float): fraction of the CPUs not used for I/O that
+            run the model
+        io_cpus (int): number of CPUs for the I/O threads
+        pin (bool): pin the threads of each group to its CPUs
+    """
+
+    def __init__(self, cpus=None, model_fraction=0.5, io_cpus=1,
+                 pin=False):
+
+        self._logger = logging.getLogger(__name__)
+
+        available = cpu_list()
+        if cpus is not None and 0 < cpus < len(available):
+            available = available[:cpus]
+
+        self.cpus = split_cpus(available, model_fraction, io_cpus)
+        self.pin = pin and hasattr(os, 'sched_setaffinity')
+        if pin and not self.pin:
+            self._logger.warning(
+                'Pinning threads to CPUs is not supported on this platform')
+
+        self._lock = threading.Lock()
+        self.begin()
+
+        self._logger.info('Thread budget of {} CPUs{}: {}'.format(
+            len(available),
+            ', pinned' if self.pin else '',
+            ', '.join('{} {}'.format(group, self.cpus[group])
+                      for group in GROUPS)))
+
+    def nthreads(self, group):
+        """Number of CPUs of the group
+
+        Args:
+            group (str): thread group
+
+        Returns:
+            int: number of CPUs
+        """
+
+        return len(self.cpus[group])
+
+    @contextmanager
+    def limit_blas(self, nthreads=1):
+        """Limit the BLAS thread pools with ``threadpoolctl`` if installed.
+        The environment variables are set as well for processes started
+        meanwhile, they have no effect once NumPy is loaded. The limits and
+        the environment are restored after.
+
+        Args:
+            nthreads (int): maximum number of BLAS threads
+        """
+
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            threadpool_limits = None
+            self._logger.debug(
+                'threadpoolctl is not installed, BLAS threads are only '
+                'limited for new processes')
+
+        environ = {
+            variable: os.environ.get(variable) for variable in BLAS_VARIABLES
+        }
+        for variable in BLAS_VARIABLES:
+            os.environ[variable] = str(nthreads)
+
+        try:
+            if threadpool_limits is None:
+                yield
+            else:
+                with threadpool_limits(limits=nthreads, user_api='blas'):
+                    yield
+
+        finally:
+            for variable, value in environ.items():
+                if value is None:
+                    os.environ.pop(variable, None)
+                else:
+                    os.environ[variable] = value
+
+    @contextmanager
+    def pinned(self, group):
+        """Pin the calling thread to the CPUs of the group and restore its
+        affinity after
+
+        Args:
+            group (str): thread group
+        """
+
+        if not self.pin:
+            yield
+            return
+
+        affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, self.cpus[group])
+        try:
+            yield
+        finally:
+            os.sched_setaffinity(0, affinity)
+
+    def start(self, thread, group):
+        """Start a thread in the group, measuring its CPU time
+
+        Args:
+            thread (threading.Thread): thread that is not started
+            group (str): thread group
+        """
+
+        run = thread.run
+
+        def budget_run():
+            with self.pinned(group):
+                if THREAD_TIME is None:
+                    run()
+                    return
+
+                start = THREAD_TIME()
+                try:
+                    run()
+                finally:
+                    self.add_cpu_time(group, THREAD_TIME() - start)
+
+        thread.run = budget_run
+        thread.start()
+
+    def add_cpu_time(self, group, seconds):
+        with self._lock:
+            self.cpu_time[group] += seconds
+
+    def begin(self):
+        """Start measuring the utilization"""
+
+        self.cpu_time = {group: 0.0 for group in GROUPS}
+        self.wall_start = time.perf_counter()
+        self.process_start = time.process_time()
+
+    def utilization(self):
+        """Fraction of the CPU time of each group used since ``begin``.
+        The OpenMP workers of the model are not Python threads, the model
+        is the CPU time of the process not used by the other groups.
+
+        Returns:
+            dict: CPU seconds and utilization of each group
+        """
+
+        wall = max(time.perf_counter() - self.wall_start, 1e-12)
+        process = time.process_time() - self.process_start
+
+        with self._lock:
+            cpu_time = dict(self.cpu_time)
+        cpu_time['model'] = max(
+            process - cpu_time['smrf'] - cpu_time['io'], cpu_time['model'])
+
+        return {
+            group: (cpu_time[group],
+                    cpu_time[group] / (wall * self.nthreads(group)))
+            for group in GROUPS
+        }
+
+    def log_utilization(self):
+        """Log the measured utilization of each group"""
+
+        if THREAD_TIME is None:
+            self._logger.info(
+                'Thread budget utilization is only measured on Python 3.7 '
+                'or later')
+            return
+
+        self._logger.info('Thread budget utilization: {}'.format(
+            ', '.join(
+                '{} {:.1%} of {} CPUs ({:.1f} CPU s)'.format(
+                    group, used, self.nthreads(group), seconds)
+                for group, (seconds, used) in self.utilization().items())))
@@ -11,6 +11,9 @@ from netCDF4 import Dataset
 from smrf.utils import utils
 
 from awsm import __version__
+from awsm.models.pysnobal.output_backends import (least_significant_digits,
+                                                  netcdf_storage_options,
+                                                  set_chunk_cache)
 
 C_TO_K = 273.16
 FREEZE = C_TO_K
@@ -44,7 +47,8 @@ class StateUpdater():
                 start_date,
                 time_zone,
                 __version__,
-                myawsm.smrf_version)
+                myawsm.smrf_version,
+                myawsm.config['ipysnobal'])
 
         # calculate offset for each section of the run and filter updates
         # update_info, runsteps, offsets, firststeps =
@@ -701,7 +705,7 @@ class StateUpdater():
             self.delta_ds.close()
 
     def initialize_update_output(self, start_date, time_zone, awsm_version,
-                                 smrf_version):
+                                 smrf_version, storage_config):
         """
         Initialize the output files to track the changes in the state Variables
         resulting from an update in snow depth.
@@ -711,11 +715,18 @@ class StateUpdater():
             time_zone: time zone from config
             awsm_version: version of awsm being used
             smrf_version: version of smrf being used
+            storage_config: ipysnobal config section with the chunking and
+                compression options
 
         """
         fmt = '%Y-%m-%d %H:%M:%S'
-        # chunk size
-        cs = (6, 10, 10)
+        # chunking and compression, one update per output
+        storage = netcdf_storage_options(
+            storage_config,
+            len(self.y),
+            len(self.x),
+            nt=max(len(self.update_info), 1))
+        digits = least_significant_digits(storage_config)
 
         variable_dict = {
             'depth_change': {
@@ -773,7 +784,12 @@ class StateUpdater():
 
             # em image
             for v, f in variable_dict.items():
-                ds.createVariable(v, 'f', dimensions[:3], chunksizes=cs)
+                ds.createVariable(
+                    v,
+                    'f',
+                    dimensions[:3],
+                    least_significant_digit=digits.get(v),
+                    **storage)
                 setattr(ds.variables[v], 'units', f['units'])
                 setattr(ds.variables[v], 'description', f['description'])
 
@@ -800,6 +816,8 @@ class StateUpdater():
                 'USDA Agricultural Research Service, Northwest Watershed Research Center'  # noqa
             )
 
+        set_chunk_cache(ds, storage_config)
+
         # save the open dataset so we can write to it
         ds.sync()
 
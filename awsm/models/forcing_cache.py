@@ -0,0 +1,406 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import smrf
+
+from awsm import __version__
+from awsm.models.smrf_connector import SMRFConnector, phase_fill
+
+
+class ForcingCache():
+    """Time contiguous, memory mapped store of the SMRF forcing for
+    replaying iPysnobal runs without decoding the compressed netCDF files.
+
+    Each forcing variable is stored as a ``.npy`` file with shape
+    ``(time, y, x)`` that is opened with ``mmap_mode='r'``, so reading a time
+    step is a slice of the mapped file. The forcing is read as
+    ``read_dtype``, ``float64`` or ``float32`` with float32_forcing. Stores
+    of that type return the slice without a copy, the others are converted
+    on read. ``int16`` stores are quantized with a fixed scale and offset per
+    variable.
+
+    The cache lives in a folder named by a key that hashes the SMRF
+    configuration including the time window, the SMRF input files such as
+    the topo and the software versions. The key only depends on the inputs
+    of SMRF, so a cache filled while running smrf_ipysnobal is read by an
+    ipysnobal replay of the same run. A cache is only used once it has been
+    completely filled.
+
+    The time steps without precipitation are indexed in the metadata, the
+    precipitation phase of those time steps is not read.
+
+    Args:
+        cache_dir (str): base directory for forcing caches
+        key (str): cache key from :meth:`cache_key`
+        dtype (str): storage type, one of ``DTYPES``
+    """
+
+    META_FILE = 'forcing_cache.json'
+    DTYPES = ('float64', 'float32', 'int16')
+
+    # value range for the int16 quantization of each variable
+    QUANTIZE_RANGE = {
+        'air_temp': (-70.0, 70.0),
+        'net_solar': (0.0, 1600.0),
+        'thermal': (0.0, 1000.0),
+        'vapor_pressure': (0.0, 10000.0),
+        'wind_speed': (0.0, 100.0),
+        'soil_temp': (-70.0, 70.0),
+        'precip': (0.0, 300.0),
+        'percent_snow': (0.0, 1.0),
+        'snow_density': (0.0, 1000.0),
+        'precip_temp': (-70.0, 70.0),
+    }
+
+    # int16 values reserved for the quantization, zero maps to the bottom
+    # of the range so a range starting at 0 is stored exactly
+    INT16_MIN = -32767
+    INT16_MAX = 32767
+
+    # config sections that do not change the forcing values
+    IGNORE_SECTIONS = frozenset(['output', 'system', 'logging'])
+
+    def __init__(self, cache_dir, key, dtype='float32'):
+
+        self._logger = logging.getLogger(__name__)
+
+        if dtype not in self.DTYPES:
+            raise ValueError(
+                'Forcing cache type {} must be one of {}'.format(
+                    dtype, self.DTYPES))
+
+        self.key = key
+        self.dtype = dtype
+        self.path = os.path.join(cache_dir, key[:16])
+        self.meta_file = os.path.join(self.path, self.META_FILE)
+
+        self.meta = None
+        self.data = {}
+        self.time_index = {}
+        self.zero_precip = set()
+
+        # type of the forcing read from the cache
+        self.read_dtype = np.float64
+
+    @classmethod
+    def from_awsm(cls, myawsm):
+        """Create the forcing cache for an AWSM run from the ``[ipysnobal]``
+        forcing cache configuration
+
+        Args:
+            myawsm (AWSM): AWSM class instance
+
+        Returns:
+            ForcingCache: forcing cache for the run
+        """
+
+        config = myawsm.config['ipysnobal']
+
+        cache_dir = config['forcing_cache_dir']
+        if cache_dir is None:
+            cache_dir = os.path.join(myawsm.path_wy, 'forcing_cache')
+
+        connector = myawsm.smrf_connector
+        cache = cls(
+            cache_dir,
+            cls.cache_key(connector.smrf_config.cfg),
+            config['forcing_cache_dtype'])
+        cache.read_dtype = myawsm.smrf_connector.forcing_dtype
+
+        return cache
+
+    @classmethod
+    def cache_key(cls, smrf_config):
+        """Hash the SMRF configuration, the modification time and size of
+        any file or directory referenced by it and the software versions.
+        The output section is not hashed, the forcing files SMRF writes
+        there are not inputs of the forcing.
+
+        Args:
+            smrf_config (dict): casted SMRF configuration
+
+        Returns:
+            str: hex digest of the cache key
+        """
+
+        sha = hashlib.sha256()
+        sha.update('awsm {} smrf {}'.format(
+            __version__, smrf.__version__).encode())
+
+        for section in sorted(smrf_config.keys()):
+            if section in cls.IGNORE_SECTIONS:
+                continue
+
+            items = smrf_config[section]
+            for item in sorted(items.keys()):
+                sha.update('[{}] {} = {}'.format(
+                    section, item, items[item]).encode())
+
+                values = items[item]
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    if isinstance(value, str) and os.path.exists(value):
+                        stat = os.stat(value)
+                        sha.update('{} {}'.format(
+                            stat.st_mtime_ns, stat.st_size).encode())
+
+        return sha.hexdigest()
+
+    def file_name(self, variable):
+        return os.path.join(self.path, '{}.npy'.format(variable))
+
+    def exists(self):
+        """Check for a completely filled cache
+
+        Returns:
+            bool: True if the cache can be read
+        """
+
+        if not os.path.isfile(self.meta_file):
+            return False
+
+        with open(self.meta_file, 'r') as f:
+            meta = json.load(f)
+
+        return meta['key'] == self.key and meta['complete']
+
+    def create(self, date_time, shape, constants=None):
+        """Allocate the memory mapped files to fill
+
+        Args:
+            date_time (list): time steps of the run
+            shape (tuple): shape (y, x) of the forcing images
+            constants (list): variables that are constant in time and are
+                stored as a single image
+        """
+
+        constants = constants or []
+        os.makedirs(self.path, exist_ok=True)
+
+        self._logger.info('Creating forcing cache {}'.format(self.path))
+
+        self.meta = {
+            'key': self.key,
+            'dtype': self.dtype,
+            'complete': False,
+            'shape': list(shape),
+            'time': [str(pd.Timestamp(t).tz_localize(None))
+                     for t in date_time],
+            'variables': {},
+            'zero_precip': [],
+        }
+
+        for variable in SMRFConnector.MAP_INPUTS.keys():
+            nt = 1 if variable in constants else len(date_time)
+            scale, offset = self.scale_offset(variable)
+
+            self.data[variable] = np.lib.format.open_memmap(
+                self.file_name(variable),
+                mode='w+',
+                dtype=self.dtype,
+                shape=(nt, ) + tuple(shape))
+
+            self.meta['variables'][variable] = {
+                'constant': variable in constants,
+                'scale': scale,
+                'offset': offset,
+            }
+
+        self.build_time_index()
+        self.write_meta()
+
+    def scale_offset(self, variable):
+        """Scale and offset to store the variable with
+
+        Args:
+            variable (str): SMRF variable name
+
+        Returns:
+            tuple: scale and offset, where value = offset + scale * stored
+        """
+
+        if self.dtype != 'int16':
+            return 1.0, 0.0
+
+        vmin, vmax = self.QUANTIZE_RANGE[variable]
+        scale = (vmax - vmin) / (self.INT16_MAX - self.INT16_MIN)
+        offset = vmin - scale * self.INT16_MIN
+
+        return scale, offset
+
+    def build_time_index(self):
+        self.time_index = {
+            pd.Timestamp(t): idx for idx, t in enumerate(self.meta['time'])
+        }
+
+    def index(self, tstep):
+        """Index of the time step in the cache
+
+        Args:
+            tstep (datetime): time step
+
+        Raises:
+            ValueError: if the time step is not in the cache
+
+        Returns:
+            int: time index
+        """
+
+        try:
+            return self.time_index[pd.Timestamp(tstep).tz_localize(None)]
+        except KeyError:
+            raise ValueError(
+                'Time step {} not found in forcing cache {}'.format(
+                    tstep, self.path))
+
+    def write_timestep(self, tstep, data):
+        """Store the forcing for a time step
+
+        Args:
+            tstep (datetime): time step
+            data (dict): forcing images keyed by the iSnobal input names
+        """
+
+        idx = self.index(tstep)
+
+        if not np.any(data['m_pp']) and idx not in self.zero_precip:
+            self.zero_precip.add(idx)
+            self.meta['zero_precip'].append(idx)
+
+        for variable, input_name in SMRFConnector.MAP_INPUTS.items():
+            info = self.meta['variables'][variable]
+            if info['constant'] and idx > 0:
+                continue
+
+            values = data[input_name]
+            if self.dtype == 'int16':
+                values = self.quantize(variable, values)
+
+            self.data[variable][0 if info['constant'] else idx] = values
+
+    def quantize(self, variable, values):
+        """Quantize the values to int16, clipping to the range of the
+        variable
+        """
+
+        info = self.meta['variables'][variable]
+        q = np.round((values - info['offset']) / info['scale'])
+
+        if np.any(q < self.INT16_MIN) or np.any(q > self.INT16_MAX):
+            self._logger.warning(
+                '{} values outside of the forcing cache range {}, '
+                'clipping'.format(variable, self.QUANTIZE_RANGE[variable]))
+            q = np.clip(q, self.INT16_MIN, self.INT16_MAX)
+
+        return q.astype(np.int16)
+
+    def finalize(self):
+        """Flush the data and mark the cache as complete"""
+
+        for variable in self.data.keys():
+            self.data[variable].flush()
+
+        self.meta['complete'] = True
+        self.write_meta()
+        self.data = {}
+
+        self._logger.info('Forcing cache {} complete'.format(self.path))
+
+    def write_meta(self):
+        with open(self.meta_file, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+    def open(self):
+        """Open a complete cache for reading"""
+
+        with open(self.meta_file, 'r') as f:
+            self.meta = json.load(f)
+
+        self.data = {
+            variable: np.load(self.file_name(variable), mmap_mode='r')
+            for variable in self.meta['variables'].keys()
+        }
+        self.build_time_index()
+        self.zero_precip = set(self.meta.get('zero_precip', []))
+
+        self._logger.info('Reading forcing from cache {}'.format(self.path))
+
+    def get_timestep(self, tstep, rows=slice(None), variables=None):
+        """Read the forcing for a time step
+
+        Args:
+            tstep (datetime): time step
+            rows (slice): rows of the grid to read
+            variables (list): SMRF variables to read, defaults to all
+
+        Returns:
+            dict: forcing images keyed by the iSnobal input names. These are
+                read only views into the cache for stores of ``read_dtype``
+        """
+
+        idx = self.index(tstep)
+
+        inpt = {}
+        for variable, info in self.meta['variables'].items():
+            if variables is not None and variable not in variables:
+                continue
+
+            if variable in SMRFConnector.PRECIP_PHASE and \
+                    idx in self.zero_precip and 'm_pp' in inpt:
+                inpt[SMRFConnector.MAP_INPUTS[variable]] = phase_fill(
+                    inpt['m_pp'].shape, self.read_dtype)
+                continue
+
+            values = self.data[variable][0 if info['constant'] else idx, rows]
+
+            if self.meta['dtype'] == 'int16':
+                values = (info['offset'] + info['scale'] * values).astype(
+                    self.read_dtype, copy=False)
+            elif values.dtype != self.read_dtype:
+                values = values.astype(self.read_dtype)
+
+            inpt[SMRFConnector.MAP_INPUTS[variable]] = values
+
+        return inpt
+
+
+def convert_netcdf(myawsm, date_time, cache=None):
+    """Fill a forcing cache from the SMRF netCDF output of an AWSM run
+
+    Args:
+        myawsm (AWSM): AWSM class instance
+        date_time (list): time steps to store
+        cache (ForcingCache): cache to fill, defaults to the cache
+            configured for the run
+
+    Returns:
+        ForcingCache: the completed forcing cache
+    """
+
+    if cache is None:
+        cache = ForcingCache.from_awsm(myawsm)
+    if cache.exists():
+        myawsm._logger.info(
+            'Forcing cache {} already exists'.format(cache.path))
+        return cache
+
+    connector = myawsm.smrf_connector
+    connector.open_netcdf_files()
+
+    constants = [
+        v for v, f in connector.force.items() if isinstance(f, np.ndarray)
+    ]
+    cache.create(date_time, myawsm.topo.dem.shape, constants)
+
+    for tstep in date_time:
+        cache.write_timestep(tstep, connector.get_timestep_netcdf(tstep))
+
+    connector.close_netcdf_files()
+    cache.finalize()
+
+    return cache
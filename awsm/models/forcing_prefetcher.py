@@ -0,0 +1,247 @@
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import netCDF4 as nc
+import numpy as np
+
+from awsm.models.smrf_connector import SMRFConnector
+
+# forcing file descriptors opened by each prefetch worker process
+_WORKER_FORCE_INFO = {}
+
+
+def _open_worker_files(output_path, variables):
+    """Initializer for the prefetch worker processes. Each process
+    opens its own handle to the forcing files.
+
+    Args:
+        output_path (str): path to the SMRF forcing files
+        variables (list): SMRF variables to open
+    """
+
+    for variable in variables:
+        dataset = nc.Dataset(
+            os.path.join(output_path, '{}.nc'.format(variable)), 'r')
+        dataset.set_always_mask(False)
+        _WORKER_FORCE_INFO[variable] = \
+            SMRFConnector.forcing_descriptor(dataset)
+
+
+def _read_worker_variable(variable, tstep, rows=slice(None),
+                          dtype=np.float64):
+    """Read a single forcing variable for a time step in a worker process
+
+    Args:
+        variable (str): SMRF variable name
+        tstep (datetime): time step
+        rows (slice): rows of the grid to read
+        dtype (type): type of the forcing image
+
+    Returns:
+        ndarray: forcing image
+    """
+
+    info = _WORKER_FORCE_INFO[variable]
+    t = SMRFConnector.time_index(info, variable, tstep)
+    return info['variable'][t, rows].astype(dtype)
+
+
+class ForcingPrefetcher():
+    """Read the netCDF forcing for the next time steps while iPysnobal
+    is running the current time step.
+
+    A reader thread fills a bounded queue with the forcing dictionaries
+    from :meth:`SMRFConnector.get_timestep_netcdf`, in time step order. With
+    more than one worker, the variables for a time step are decompressed
+    concurrently in a pool of processes that each hold their own handle
+    to the forcing files.
+
+    Args:
+        smrf_connector (SMRFConnector): connector with the forcing files
+            already opened
+        date_time (list): time steps that will be requested, in order
+        depth (int): maximum number of time steps to read ahead
+        workers (int): number of processes to read variables with
+
+    Raises:
+        ValueError: for more than one worker before Python 3.7, which the
+            worker initializer needs
+    """
+
+    # seconds to wait on the queue before checking if the reader stopped
+    POLL_TIMEOUT = 1
+
+    def __init__(self, smrf_connector, date_time, depth, workers=1):
+
+        self._logger = logging.getLogger(__name__)
+
+        if workers > 1 and sys.version_info < (3, 7):
+            raise ValueError(
+                'prefetch_workers larger than 1 requires Python 3.7 or later')
+
+        self.smrf_connector = smrf_connector
+        self.date_time = list(date_time)
+        self.depth = depth
+        self.workers = workers
+
+        self.queue = queue.Queue(maxsize=self.depth)
+        self._stop = threading.Event()
+        self.pool = None
+
+        self.wait_time = 0.0
+        self.read_time = 0.0
+        self.nsteps = 0
+
+        self.thread = threading.Thread(
+            target=self.read_ahead,
+            name='forcing_prefetch',
+            daemon=True)
+
+        self._logger.debug(
+            'ForcingPrefetcher initialized with depth {} and {} '
+            'workers'.format(self.depth, self.workers))
+
+    @property
+    def file_variables(self):
+        """SMRF variables that are read from netCDF files"""
+        return [
+            v for v, f in self.smrf_connector.force.items()
+            if not isinstance(f, np.ndarray)
+        ]
+
+    def start(self):
+        """Start reading ahead"""
+
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_open_worker_files,
+                initargs=(self.smrf_connector.output_path,
+                          self.file_variables))
+
+        self.thread.start()
+
+    def read_timestep(self, tstep):
+        """Read the forcing for a time step, either in this thread or
+        spread across the worker processes
+
+        Args:
+            tstep (datetime): time step
+
+        Returns:
+            dict: forcing images keyed by the iSnobal input names
+        """
+
+        if self.pool is None:
+            return self.smrf_connector.get_timestep_netcdf(tstep)
+
+        force = self.smrf_connector.force
+        map_inputs = self.smrf_connector.MAP_INPUTS
+
+        futures = {
+            map_inputs[v]: self.pool.submit(
+                _read_worker_variable, v, tstep, self.smrf_connector.rows,
+                self.smrf_connector.forcing_dtype)
+            for v in self.file_variables
+        }
+
+        data = {
+            map_inputs[v]: f.astype(self.smrf_connector.forcing_dtype)
+            for v, f in force.items() if isinstance(f, np.ndarray)
+        }
+        for key, future in futures.items():
+            data[key] = future.result()
+
+        return data
+
+    def read_ahead(self):
+        """Thread target that reads every time step into the queue. Any
+        exception is passed to the consumer through the queue.
+        """
+
+        for tstep in self.date_time:
+            start = perf_counter()
+            try:
+                item = (tstep, self.read_timestep(tstep))
+            except Exception as e:
+                item = (tstep, e)
+            self.read_time += perf_counter() - start
+
+            while not self._stop.is_set():
+                try:
+                    self.queue.put(item, timeout=self.POLL_TIMEOUT)
+                    break
+                except queue.Full:
+                    continue
+
+            if self._stop.is_set() or isinstance(item[1], Exception):
+                return
+
+    def get(self, tstep):
+        """Get the forcing for the time step, waiting on the reader if it
+        has not gotten there yet
+
+        Args:
+            tstep (datetime): time step
+
+        Raises:
+            ValueError: if the time steps are not requested in order
+
+        Returns:
+            dict: forcing images keyed by the iSnobal input names
+        """
+
+        start = perf_counter()
+        while True:
+            try:
+                qtstep, data = self.queue.get(timeout=self.POLL_TIMEOUT)
+                break
+            except queue.Empty:
+                if not self.thread.is_alive():
+                    raise RuntimeError(
+                        'Forcing prefetch thread stopped before {}'.format(
+                            tstep))
+
+        self.wait_time += perf_counter() - start
+        self.nsteps += 1
+
+        if isinstance(data, Exception):
+            raise data
+
+        if qtstep != tstep:
+            raise ValueError(
+                'Forcing prefetch expected time step {} but got {}'.format(
+                    tstep, qtstep))
+
+        return data
+
+    def stop(self):
+        """Stop the reader, shutdown the workers and log how long the model
+        waited on the forcing
+        """
+
+        self._stop.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+        if self.nsteps > 0:
+            self._logger.info(
+                'iPysnobal waited {:.2f} seconds on forcing input over {} '
+                'time steps ({:.3f} seconds per step), reading took '
+                '{:.2f} seconds with a prefetch depth of {}'.format(
+                    self.wait_time,
+                    self.nsteps,
+                    self.wait_time / self.nsteps,
+                    self.read_time,
+                    self.depth))
@@ -0,0 +1,156 @@
+import glob
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class Checkpoints():
+    """Periodic checkpoints of the full iPysnobal state.
+
+    A checkpoint is an uncompressed ``.npz`` file with every array in the
+    output record, the forcing input at the checkpoint time, the time step
+    index and time and the number of depth updates already applied. Unlike
+    the output file, the state is stored in double precision and includes
+    the accumulators and ``time_since_out``, so a run restarted from a
+    checkpoint matches the uninterrupted run exactly.
+
+    Checkpoints are written to a temporary file that is moved into place,
+    and only the most recent ``keep`` checkpoints are kept.
+
+    Args:
+        path (str): directory for the checkpoint files
+        frequency (int): hours between checkpoints
+        keep (int): number of checkpoints to keep, 0 keeps all
+    """
+
+    VERSION = 1
+    PREFIX = 'checkpoint_'
+    TIME_FORMAT = '%Y%m%d_%H%M'
+
+    def __init__(self, path, frequency, keep=2):
+
+        self._logger = logging.getLogger(__name__)
+
+        self.path = path
+        self.frequency = frequency
+        self.keep = keep
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def is_checkpoint_step(self, step_index, data_time_step):
+        """Check if a checkpoint is written after the time step
+
+        Args:
+            step_index (int): index of the time step
+            data_time_step (float): seconds in a time step
+
+        Returns:
+            bool: True if a checkpoint is written
+        """
+
+        return step_index > 0 and \
+            (step_index * data_time_step / 3600.0) % self.frequency == 0
+
+    def file_name(self, time_step):
+        return os.path.join(self.path, '{}{}.npz'.format(
+            self.PREFIX, time_step.strftime(self.TIME_FORMAT)))
+
+    @staticmethod
+    def state(step_index, time_step, output_rec, input1, update_position,
+              copy=False):
+        """Collect the state to checkpoint
+
+        Args:
+            step_index (int): index of the time step
+            time_step (datetime): time step
+            output_rec (dict): iPysnobal output record
+            input1 (dict): forcing at the time step
+            update_position (int): number of depth updates applied
+            copy (bool): copy the arrays so the model can move on before
+                the checkpoint is saved
+
+        Returns:
+            dict: arrays to save keyed by their name in the checkpoint
+        """
+
+        state = {
+            'version': np.array(Checkpoints.VERSION),
+            'step_index': np.array(step_index),
+            'time': np.array(pd.Timestamp(time_step).isoformat()),
+            'update_position': np.array(update_position),
+        }
+
+        for prefix, values in (('output_rec', output_rec), ('input', input1)):
+            for key, value in values.items():
+                if key == 'time_step':
+                    continue
+                value = np.asarray(value)
+                state['{}.{}'.format(prefix, key)] = \
+                    value.copy() if copy else value
+
+        return state
+
+    def save(self, state):
+        """Write a checkpoint and remove the old ones
+
+        Args:
+            state (dict): state from :meth:`state`
+        """
+
+        time_step = pd.Timestamp(str(state['time']))
+        file_name = self.file_name(time_step)
+
+        # np.savez adds the .npz extension to the temporary file
+        tmp_name = file_name[:-len('.npz')] + '.tmp'
+        np.savez(tmp_name, **state)
+        os.replace(tmp_name + '.npz', file_name)
+
+        self._logger.info('Wrote checkpoint {}'.format(file_name))
+
+        if self.keep > 0:
+            files = sorted(glob.glob(
+                os.path.join(self.path, '{}*.npz'.format(self.PREFIX))))
+            for old in files[:-self.keep]:
+                os.remove(old)
+
+    @staticmethod
+    def read(file_name):
+        """Read a checkpoint
+
+        Args:
+            file_name (str): checkpoint file
+
+        Raises:
+            ValueError: if the checkpoint version is not supported
+
+        Returns:
+            dict: ``step_index``, ``time``, ``update_position``,
+                ``output_rec`` and ``input``
+        """
+
+        with np.load(file_name) as data:
+            if int(data['version']) != Checkpoints.VERSION:
+                raise ValueError(
+                    'Checkpoint {} has version {}, expected {}'.format(
+                        file_name, int(data['version']), Checkpoints.VERSION))
+
+            checkpoint = {
+                'step_index': int(data['step_index']),
+                'time': pd.Timestamp(str(data['time'])),
+                'update_position': int(data['update_position']),
+                'output_rec': {},
+                'input': {},
+            }
+
+            for name in data.files:
+                if '.' not in name:
+                    continue
+                prefix, key = name.split('.', 1)
+                value = data[name]
+                if value.ndim == 0:
+                    value = value.item()
+                checkpoint[prefix][key] = value
+
+        return checkpoint
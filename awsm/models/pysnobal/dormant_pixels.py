@@ -0,0 +1,127 @@
+import numpy as np
+
+# averages of the energy terms since the last output
+ENERGY_AVERAGES = (
+    'R_n_bar', 'H_bar', 'L_v_E_bar', 'E_bar', 'G_bar', 'G_0_bar', 'M_bar',
+    'delta_Q_bar', 'delta_Q_0_bar'
+)
+
+# totals of the mass changes since the last output
+MASS_SUMS = ('E_s_sum', 'melt_sum', 'ro_pred_sum')
+
+# energy and mass terms of the last run time step
+STEP_TERMS = (
+    'R_n', 'H', 'L_v_E', 'E', 'G', 'G_0', 'M', 'delta_Q', 'delta_Q_0',
+    'E_s', 'melt', 'ro_predict'
+)
+
+
+def dormant_pixels(output_rec, input1, input2, mask=None):
+    """Pixels without snow and without precipitation over the time step.
+    iSnobal does not change the snow state of these pixels, the energy
+    terms are zero and only the clocks and the averages since the last
+    output change.
+
+    Args:
+        output_rec (dict): iPysnobal output record
+        input1 (dict): forcing at the start of the time step
+        input2 (dict): forcing at the end of the time step
+        mask (ndarray): pixels the model runs on, None for all
+
+    Returns:
+        ndarray: True for the dormant pixels
+    """
+
+    dormant = (output_rec['m_s'] == 0) & \
+        (np.asarray(input1['m_pp']) == 0) & \
+        (np.asarray(input2['m_pp']) == 0)
+
+    if 'layer_count' in output_rec:
+        dormant &= output_rec['layer_count'] == 0
+    if mask is not None:
+        dormant &= mask
+
+    return dormant
+
+
+def dormant_update(output_rec, dormant, time_step, intervals=1):
+    """Advance the dormant pixels over the time step the same way iSnobal
+    does for a pixel without snowcover and precipitation. Each run time
+    step averages zero energy terms into the averages since the last
+    output, adds nothing to the mass totals and advances the clocks.
+
+    Args:
+        output_rec (dict): iPysnobal output record, changed in place
+        dormant (ndarray): True for the dormant pixels
+        time_step (float): seconds of a run time step
+        intervals (int): number of run time steps in the data time step
+    """
+
+    since = output_rec['time_since_out'][dormant]
+    averages = {
+        key: output_rec[key][dormant]
+        for key in ENERGY_AVERAGES if key in output_rec
+    }
+
+    for _ in range(intervals):
+        # same operations as the time average of iSnobal with a zero value
+        for key, value in averages.items():
+            averages[key] = value * since / (since + time_step)
+        since = since + time_step
+
+    for key, value in averages.items():
+        output_rec[key][dormant] = value
+
+    # the totals restart from zero if the pixel was just output
+    reset = dormant.copy()
+    reset[dormant] = output_rec['time_since_out'][dormant] == 0
+    for key in MASS_SUMS:
+        if key in output_rec:
+            output_rec[key][reset] = 0.0
+
+    for key in STEP_TERMS:
+        if isinstance(output_rec.get(key), np.ndarray):
+            output_rec[key][dormant] = 0.0
+
+    output_rec['time_since_out'][dormant] = since
+    output_rec['current_time'][dormant] += intervals * time_step
+
+
+def gather_pixels(rec, index, shape):
+    """Gather pixels of the grid arrays in a record into arrays of shape
+    (N, 1), the other values are passed through
+
+    Args:
+        rec (dict): output record or forcing input
+        index (ndarray): flat index of the pixels
+        shape (tuple): shape of the grid arrays
+
+    Returns:
+        dict: record of the pixels
+    """
+
+    pixels = {}
+    for key, value in rec.items():
+        if isinstance(value, np.ndarray) and value.shape == shape:
+            pixels[key] = np.take(value.reshape(-1), index)[:, np.newaxis]
+        else:
+            pixels[key] = value
+
+    return pixels
+
+
+def scatter_pixels(pixels, index, rec):
+    """Scatter the pixels gathered with ``gather_pixels`` back into the
+    grid arrays of the record
+
+    Args:
+        pixels (dict): record of the pixels
+        index (ndarray): flat index of the pixels
+        rec (dict): record to scatter into
+    """
+
+    for key, value in pixels.items():
+        grid = rec.get(key)
+        if isinstance(grid, np.ndarray) and isinstance(value, np.ndarray) \
+                and value is not grid and value.shape == (len(index), 1):
+            np.put(grid, index, value)
@@ -0,0 +1,108 @@
+import logging
+
+import netCDF4 as nc
+import numpy as np
+
+
+class GridWindow():
+    """Rows of the grid that an out-of-core run models at once.
+
+    The model is run pixel by pixel so a window only needs the rows of its
+    tile. Lidar depth updates are not supported as they depend on the
+    state of the whole grid at the time of the update.
+
+    Args:
+        start (int): first row of the tile
+        end (int): last row + 1 of the tile
+    """
+
+    def __init__(self, start, end):
+
+        # rows of the grid that are read, modeled and written
+        self.interior = slice(start, end)
+        self.rows = self.interior
+
+        # rows of the tile in the window arrays
+        self.local = slice(0, end - start)
+
+    def __repr__(self):
+        return 'GridWindow(rows {}-{})'.format(
+            self.interior.start, self.interior.stop)
+
+
+def grid_windows(ny, tile_rows):
+    """Split the grid into windows of rows
+
+    Args:
+        ny (int): number of rows in the grid
+        tile_rows (int): number of rows in a tile
+
+    Returns:
+        list: GridWindow for each tile
+    """
+
+    return [
+        GridWindow(start, min(start + tile_rows, ny))
+        for start in range(0, ny, tile_rows)
+    ]
+
+
+def grid_shape(topo_config):
+    """Shape of the grid in the topo file, without reading the images
+
+    Args:
+        topo_config (dict): topo section of the config
+
+    Returns:
+        tuple: (ny, nx)
+    """
+
+    with nc.Dataset(topo_config['filename'], 'r') as ds:
+        return len(ds.dimensions['y']), len(ds.dimensions['x'])
+
+
+class TopoWindow():
+    """The topo of the rows of a grid window, read from the topo file in
+    place of the full grid ``smrf.data.load_topo.Topo``.
+
+    Args:
+        topo_config (dict): topo section of the config
+        window (GridWindow): rows to read
+        mask_isnobal (bool): mask the model with the topo mask
+
+    Attributes:
+        dem, mask, roughness: images of the window rows
+        x, y: coordinates of the window
+        grid_y: y coordinates of the full grid
+    """
+
+    def __init__(self, topo_config, window, mask_isnobal=True):
+
+        self._logger = logging.getLogger(__name__)
+        self.topoConfig = topo_config
+        self.window = window
+
+        rows = window.rows
+        with nc.Dataset(topo_config['filename'], 'r') as ds:
+            ds.set_always_mask(False)
+
+            self.x = ds.variables['x'][:]
+            self.grid_y = ds.variables['y'][:]
+            self.y = self.grid_y[rows]
+
+            self.dem = ds.variables['dem'][rows, :].astype(np.float64)
+
+            if mask_isnobal and 'mask' in ds.variables:
+                self.mask = ds.variables['mask'][rows, :].astype(np.float64)
+            else:
+                self.mask = np.ones_like(self.dem)
+
+            if 'roughness' in ds.variables:
+                self.roughness = \
+                    ds.variables['roughness'][rows, :].astype(np.float64)
+            else:
+                self._logger.warning(
+                    'No surface roughness given in topo, setting to 5mm')
+                self.roughness = 0.005 * np.ones_like(self.dem)
+
+        self.ny, self.nx = self.dem.shape
@@ -6,6 +6,7 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 
+from awsm.models.pysnobal.output_backends import output_file_path
 
 C_TO_K = 273.16
 FREEZE = C_TO_K
@@ -41,13 +42,18 @@ class ModelInit():
 
     """
 
-    def __init__(self, cfg, topo, path_output, start_date):
+    def __init__(self, cfg, topo, path_output, start_date, init_state=None,
+                 window=None):
         """
         Args:
             cfg:            AWSM config dictionary
             topo:           AWSM topo class
             path_output:         run<date> directory
             start_date:     AWSM start date
+            init_state:     init fields handed over in memory from the
+                            previous run, used instead of the init file
+            window:         GridWindow of the rows to read for an
+                            out-of-core run, None reads the whole grid
 
         """
 
@@ -55,6 +61,8 @@ class ModelInit():
         self.topo = topo
         self.start_date = start_date
         self.config = cfg
+        self.init_state = init_state
+        self.rows = slice(None) if window is None else window.rows
 
         # get parameters from awsm
         self.init_file = cfg['ipysnobal']['init_file']
@@ -67,17 +75,28 @@ class ModelInit():
         self.model_type = cfg['awsm master']['model_type']
         self.path_output = path_output
 
+        # crash restart parameters
+        self.depth_thresh = cfg['isnobal restart']['depth_thresh']
+        self.restart_folder = cfg['isnobal restart']['output_folders']
+
         # when restarting, just reset the start date to grab the
         # right init time step
         if self.config['ipysnobal']['restart_date_time'] is not None:
             self.start_date = self.start_date - \
                 pd.Timedelta(minutes=self.config['time']['time_step'])
             self.init_type = 'netcdf_out'
-            self.init_file = os.path.join(self.path_output, 'ipysnobal.nc')
+            self.init_file = output_file_path(self.path_output, self.config)
             self._logger.info("""Initializing ipysnobal at time {} from """
                               """previous output file""".format(
                                   self.start_date))
 
+        # the state comes from the checkpoint, no need to read the init
+        if self.config['ipysnobal']['restart_checkpoint'] is not None:
+            self.init_file = None
+            self._logger.info(
+                'Initializing ipysnobal from checkpoint {}'.format(
+                    self.config['ipysnobal']['restart_checkpoint']))
+
         # dictionary to store init data
         self.init = {}
         self.init['x'] = self.topo.x
@@ -105,8 +124,11 @@ class ModelInit():
         This will check the model type and the init file and act accordingly.
         """
 
+        # state from the previous run in the same process
+        if self.init_state is not None:
+            self.get_state_init()
         # if we have no init info, make zero init
-        if self.init_file is None:
+        elif self.init_file is None:
             self.get_zero_init()
         # get init depending on file type
         elif self.init_type == 'netcdf':
@@ -127,7 +149,7 @@ class ModelInit():
         self.init_type = 'netcdf_out'
         # find the correct output folder from which to restart
         if self.restart_folder == 'standard':
-            self.init_file = os.path.join(self.path_output, 'ipysnobal.nc')
+            self.init_file = output_file_path(self.path_output, self.config)
 
         elif self.restart_folder == 'daily':
             fmt = '%Y%m%d'
@@ -139,7 +161,7 @@ class ModelInit():
             # get the previous day
             path_prev_day = os.path.join(self.path_output,
                                          '..', 'run'+day_dt_str)
-            self.init_file = os.path.join(path_prev_day, 'ipysnobal.nc')
+            self.init_file = output_file_path(path_prev_day, self.config)
 
         self.get_netcdf_out()
 
@@ -155,6 +177,38 @@ class ModelInit():
         for k, v in restart_var.items():
             self.init[k] = v
 
+    @staticmethod
+    def zero_crash_depths(depth_thresh, z_s, rho, T_s_0, T_s_l, T_s, h2o_sat):
+        """
+        Remove the snow where the depth is under the threshold. Shallow
+        snowpacks are a common cause of iSnobal crashes.
+
+        Args:
+            depth_thresh:   depth threshold in meters
+            z_s:            snow depth (m)
+            rho:            snow density (kg m-3)
+            T_s_0:          active layer temperature (C)
+            T_s_l:          lower layer temperature (C)
+            T_s:            average snow temperature (C)
+            h2o_sat:        percent saturation
+
+        Returns:
+            dict: the variables with the shallow snow removed
+        """
+
+        shallow = z_s < depth_thresh
+
+        restart_var = {
+            'z_s': np.where(shallow, 0.0, z_s),
+            'rho': np.where(shallow, 0.0, rho),
+            'T_s_0': np.where(shallow, -75.0, T_s_0),
+            'T_s_l': np.where(shallow, -75.0, T_s_l),
+            'T_s': np.where(shallow, -75.0, T_s),
+            'h2o_sat': np.where(shallow, 0.0, h2o_sat),
+        }
+
+        return restart_var
+
     def get_zero_init(self):
         """
         Set init fields for zero init
@@ -169,6 +223,19 @@ class ModelInit():
 
         self.init['h2o_sat'] = 0.0*self.topo.mask  # percent saturation
 
+    def get_state_init(self):
+        """
+        Get init fields from the state handed over by the previous run. The
+        state is what the previous run wrote to its output, so this matches
+        initializing from the output file.
+        """
+
+        self._logger.info(
+            'Initializing PySnobal with the state of the previous run')
+
+        for key, value in self.init_state.items():
+            self.init[key] = value[self.rows]
+
     def get_netcdf(self):
         """
         Get init fields from netcdf init file
@@ -189,7 +256,7 @@ class ModelInit():
             # if i.variables.has_key(f):
             if f in i.variables:
                 # read in the variables
-                self.init[f] = i.variables[f][0, :]
+                self.init[f] = i.variables[f][0, self.rows, :]
             else:
                 # default is set to zeros
                 self.init[f] = all_zeros
@@ -199,12 +266,17 @@ class ModelInit():
     def get_netcdf_out(self):
         """
         Get init fields from output netcdf for the closest date within
-        24 hours of the start date
+        24 hours of the start date. The output can be either a netCDF file
+        or a zarr store from the zarr output backend.
         """
 
-        ds = xr.open_dataset(self.init_file)
+        if os.path.isdir(self.init_file):
+            ds = xr.open_zarr(self.init_file)
+        else:
+            ds = xr.open_dataset(self.init_file)
 
-        init_data = ds.sel(time=self.start_date, method='nearest')
+        init_data = ds.isel(y=self.rows).sel(
+            time=self.start_date, method='nearest')
         time_diff = self.start_date.tz_localize(None) - init_data.time.values
 
         if time_diff.total_seconds() < 0 or \
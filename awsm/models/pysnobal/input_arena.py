@@ -0,0 +1,64 @@
+import numpy as np
+
+FREEZE = 273.16
+
+
+class InputArena():
+    """Preallocated, double buffered forcing input for iPysnobal.
+
+    iPysnobal needs the forcing at the start (``input1``) and the end
+    (``input2``) of the time step. Each call to :meth:`load` copies the
+    forcing into the buffer that was not loaded last, so after a time step
+    the previous ``input2`` becomes ``input1`` without copying and the next
+    load reuses the other buffer. The temperatures are converted to Kelvin
+    in place.
+
+    Args:
+        shape (tuple): shape (y, x) of the forcing images
+        names (list): iSnobal input names to allocate
+        zeros (callable): allocates a zeroed float64 array of a shape, to
+            place the buffers in shared memory
+    """
+
+    # inputs converted from Celsius to Kelvin
+    KELVIN_INPUTS = ('T_a', 'T_pp', 'T_g')
+
+    def __init__(self, shape, names, zeros=None):
+
+        if zeros is None:
+            def zeros(shape):
+                return np.zeros(shape, dtype=np.float64)
+
+        self.buffers = [
+            {name: zeros(shape) for name in names} for _ in range(2)
+        ]
+        self.free = 0
+
+    def load(self, data, time_step, kelvin=False):
+        """Copy the forcing for a time step into the free buffer
+
+        Args:
+            data (dict): forcing images or scalars keyed by the iSnobal
+                input names
+            time_step (datetime): time step of the forcing
+            kelvin (bool): the temperatures are already in Kelvin
+
+        Returns:
+            dict: the loaded buffer, valid until the second load after
+        """
+
+        inpt = self.buffers[self.free]
+        self.free = 1 - self.free
+
+        for name, values in data.items():
+            if name in inpt:
+                np.copyto(inpt[name], values)
+
+        if not kelvin:
+            for name in self.KELVIN_INPUTS:
+                if name in inpt:
+                    inpt[name] += FREEZE
+
+        inpt['time_step'] = time_step
+
+        return inpt
@@ -2,6 +2,8 @@
 from pysnobal.c_snobal import snobal
 from datetime import datetime, timedelta
 import logging
+import os
+from time import perf_counter
 import numpy as np
 from smrf.framework.model_framework import SMRF
 from smrf.utils import queue
@@ -9,7 +11,23 @@ from pysnobal import ipysnobal
 import pandas as pd
 
 import threading
-from awsm.models.pysnobal import PysnobalIO
+from awsm.models.pysnobal import ModelInit, PysnobalIO
+from awsm.models.pysnobal.checkpoint import Checkpoints
+from awsm.models.pysnobal.dormant_pixels import (dormant_pixels,
+                                                 dormant_update,
+                                                 gather_pixels,
+                                                 scatter_pixels)
+from awsm.models.pysnobal.input_arena import InputArena
+from awsm.models.pysnobal.output_writer import (AsyncOutputWriter,
+                                                SMRFOutputSnapshot)
+from awsm.models.pysnobal.pixel_cost import cost_regions, pixel_cost
+from awsm.models.pysnobal.thread_tuner import (ThreadTuner, available_cpus,
+                                               thread_candidates)
+from awsm.models.pysnobal.tile_executor import TileExecutor
+from awsm.models.forcing_cache import ForcingCache, convert_netcdf
+from awsm.models.forcing_prefetcher import ForcingPrefetcher
+from awsm.models.queue_telemetry import QueueTelemetry
+from awsm.models.smrf_process import SMRFProcess
 from awsm.interface.ingest_data import StateUpdater
 
 
@@ -52,6 +70,13 @@ class PySnobal():
         'precip_temp'
     ])
 
+    # snowcover state that is zero without snow
+    SNOW_STATE = (
+        'z_s', 'z_s_0', 'z_s_l', 'rho', 'm_s', 'm_s_0', 'm_s_l', 'cc_s',
+        'cc_s_0', 'cc_s_l', 'h2o', 'h2o_sat', 'h2o_max', 'h2o_vol',
+        'h2o_total', 'layer_count'
+    )
+
     def __init__(self, myawsm):
         """PySnobal class to run pysnobal. Will also run SMRF
         in a threaded mode for smrf_ipysnobal
@@ -66,19 +91,75 @@ class PySnobal():
         self.smrf = None
         self.force = None
         self.smrf_queue = None
+        self.prefetcher = None
+        self.smrf_process = None
+        self.forcing_cache = None
+        self.fill_forcing_cache = False
+        self.output_writer = None
+        self.inputs = None
+        self.tiles = None
+        self.model_mask = None
+        self.active_fraction = []
+        self.cost_total = None
+        self.skipped_pixels = None
+
+        # fast forward through time steps without snow or precipitation
+        self.fast_forward = False
+        self.fast_forward_steps = 0
+        self.stale_input = None
+        self.next_forcing = None
+        self.checkpoints = None
+        self.backup_rec = {}
+        self.retries = 0
+        self.cleared_pixels = set()
+
+        # rows of the grid modeled, a window for out-of-core runs
+        self.rows = slice(None)
+        if self.awsm.window is not None:
+            self.rows = self.awsm.window.rows
+
+        self.set_threads()
         self._logger.debug('Initialized PySnobal')
 
-    @property
-    def data_time_step(self):
-        return self.time_step_info[0]['time_step']
+    def set_threads(self):
+        """Set the number of threads for iSnobal from ``ithreads``. With
+        auto, the thread counts up to the available CPUs are timed on the
+        time steps by a ``ThreadTuner``, except with tile workers that
+        split the CPUs between them. A thread budget limits the threads to
+        the model CPUs.
+        """
 
-    @property
-    def init_zeros(self):
-        return np.zeros_like(self.awsm.topo.dem)
+        self.thread_tuner = None
+        ithreads = str(self.config['ithreads']).strip().lower()
+
+        cpus = available_cpus()
+        if self.awsm.thread_budget is not None:
+            cpus = self.awsm.thread_budget.nthreads('model')
+
+        if ithreads != 'auto':
+            self.nthreads = int(ithreads)
+            if self.nthreads > cpus and self.awsm.thread_budget is not None:
+                self._logger.info(
+                    'Thread budget limits ithreads from {} to {}'.format(
+                        self.nthreads, cpus))
+                self.nthreads = cpus
+
+        elif self.config['tile_workers'] > 1:
+            self.nthreads = max(cpus // self.config['tile_workers'], 1)
+            self._logger.info(
+                'iPysnobal ithreads auto runs {} threads in each of the {} '
+                'tile workers'.format(
+                    self.nthreads, self.config['tile_workers']))
+
+        else:
+            self.thread_tuner = ThreadTuner(
+                thread_candidates(cpus),
+                retune_steps=self.config['ithreads_retune'])
+            self.nthreads = self.thread_tuner.nthreads
 
     @property
-    def init_ones(self):
-        return np.ones_like(self.awsm.topo.dem)
+    def data_time_step(self):
+        return self.time_step_info[0]['time_step']
 
     @property
     def config_constants(self):
@@ -131,9 +212,7 @@ class PySnobal():
             self.options['constants'], self.options)
 
         # mass thresholds for run time steps
-        self.time_step_info[ipysnobal.NORMAL_TSTEP]['threshold'] = self.config['thresh_normal']  # noqa
-        self.time_step_info[ipysnobal.MEDIUM_TSTEP]['threshold'] = self.config['thresh_medium']  # noqa
-        self.time_step_info[ipysnobal.SMALL_TSTEP]['threshold'] = self.config['thresh_small']  # noqa
+        self.set_thresholds()
 
         # get init params
         self.init = self.awsm.model_init.init
@@ -141,13 +220,56 @@ class PySnobal():
         self.output_rec = ipysnobal.initialize(
             self.params, self.time_step_info, self.init)
 
+        # diagnostic of the estimated compute cost of the pixels between
+        # outputs, not a measurement of the kernel
+        if 'estimated_cost' in self.awsm.pysnobal_output_vars:
+            self.output_rec['estimated_cost'] = np.zeros_like(
+                self.output_rec['m_s'])
+
+        # pixels the model runs on
+        mask = self.output_rec.get('mask', self.init['mask'])
+        self.model_mask = np.asarray(mask) != 0
+
+        if 'estimated_cost' in self.output_rec:
+            self.cost_total = np.zeros(self.awsm.topo.dem.shape)
+
+        # double buffered forcing input, reused every time step
+        if self.config['tile_workers'] > 1:
+            self.tiles = TileExecutor(
+                self.output_rec,
+                self.awsm.smrf_connector.MAP_INPUTS.values(),
+                self.options['constants'],
+                self.params,
+                self.awsm.topo.mask,
+                self.config['tile_workers'],
+                self.nthreads)
+            self.inputs = self.tiles.inputs
+        else:
+            self.inputs = InputArena(
+                self.awsm.topo.dem.shape,
+                self.awsm.smrf_connector.MAP_INPUTS.values())
+
         # create the output files
+        if self.config['output_writer'] == 'async':
+            self.output_writer = AsyncOutputWriter(
+                max_queue=self.config['output_writer_queue'],
+                batch_size=self.config['output_writer_batch'],
+                sync_interval=self.config['output_sync_interval'],
+                timeout=self.config['output_writer_timeout'])
+
         self.pysnobal_io = PysnobalIO(
             self.awsm.config['ipysnobal']['output_file_name'],
             self.options['output']['location'],
-            self.awsm
+            self.awsm,
+            self.output_writer
         )
-        self.pysnobal_io.create_output_files()
+        self.pysnobal_io.create_output_files(nt=self.output_count)
+
+        if self.config['checkpoint_frequency'] > 0:
+            self.checkpoints = Checkpoints(
+                os.path.join(self.awsm.path_output, 'checkpoints'),
+                self.config['checkpoint_frequency'],
+                self.config['checkpoint_keep'])
 
         self.time_since_out = 0.0
         self.start_step = 0  # if restart then it would be higher
@@ -155,6 +277,19 @@ class PySnobal():
 
         self.set_current_time(step_time, self.time_since_out)
 
+    def set_thresholds(self, factor=1):
+        """Set the mass thresholds for the run time steps from the
+        configuration
+
+        Args:
+            factor (float): multiply the thresholds by a factor, larger
+                thresholds refine the time step for deeper snowpacks
+        """
+
+        self.time_step_info[ipysnobal.NORMAL_TSTEP]['threshold'] = factor * self.config['thresh_normal']  # noqa
+        self.time_step_info[ipysnobal.MEDIUM_TSTEP]['threshold'] = factor * self.config['thresh_medium']  # noqa
+        self.time_step_info[ipysnobal.SMALL_TSTEP]['threshold'] = factor * self.config['thresh_small']  # noqa
+
     def get_args(self):
         """
         Parse the configuration file and returns a dictionary called options.
@@ -186,7 +321,7 @@ class PySnobal():
         config['output'] = {
             'frequency': self.awsm.output_freq,
             'location': self.awsm.path_output,
-            'nthreads': self.config['ithreads'],
+            'nthreads': self.nthreads,
             'output_mode': 'data',
             'out_filename': None
         }
@@ -260,8 +395,7 @@ class PySnobal():
                            variable['variable'])
         else:
             if variable['variable'] == 'soil_temp':
-                data = float(self.awsm.soil_temp) * \
-                    np.ones_like(self.awsm.topo.dem)
+                data = float(self.awsm.soil_temp)
             else:
                 data = self.smrf_queue[variable['variable']].get(
                     self.time_step)
@@ -269,14 +403,29 @@ class PySnobal():
 
     def get_timestep_inputs(self):
         """Get all the forcing variable data from SMRF. Get the data either from
-        the netCDF files or from SMRF directly.
+        the netCDF files or from SMRF directly. The data is copied into the
+        preallocated input buffers.
 
         Returns:
-            dict: dict of input values for all forcing variables
+            dict: dict of input values for all forcing variables, valid until
+                the time step after next
         """
 
-        if self.awsm.smrf_connector.force is not None:
-            data = self.awsm.smrf_connector.get_timestep_netcdf(self.time_step)
+        if self.next_forcing is not None and \
+                self.next_forcing[0] == self.time_step:
+            data = self.next_forcing[1]
+            self.next_forcing = None
+
+        elif (self.forcing_cache is not None and
+              not self.fill_forcing_cache) or \
+                self.prefetcher is not None or \
+                self.awsm.smrf_connector.force is not None:
+            data = self.read_forcing(self.time_step)
+
+        elif self.smrf_process is not None:
+            data = self.smrf_process.get(self.time_step)
+            if self.fill_forcing_cache:
+                self.forcing_cache.write_timestep(self.time_step, data)
 
         else:
             data = {}
@@ -285,19 +434,116 @@ class PySnobal():
                 smrf_data = self.get_smrf_data(v)
 
                 if smrf_data is None:
-                    smrf_data = self.init_zeros
+                    smrf_data = 0.0
                     self._logger.debug(
                         'No data from smrf to iSnobal for {} in {}'.format(
                             v['variable'], self.time_step))
 
                 data[self.awsm.smrf_connector.MAP_INPUTS[var]] = smrf_data
 
-        data['T_a'] = data['T_a'] + FREEZE
-        data['T_pp'] = data['T_pp'] + FREEZE
-        data['T_g'] = data['T_g'] + FREEZE
-        data['time_step'] = self.time_step
+            if self.fill_forcing_cache:
+                self.forcing_cache.write_timestep(self.time_step, data)
 
-        return data
+        inputs = self.inputs.load(data, self.time_step)
+
+        # the forcing is copied out of the ring slot
+        if self.smrf_process is not None:
+            self.smrf_process.release()
+
+        return inputs
+
+    def read_forcing(self, time_step, variables=None):
+        """Read the forcing of a time step from the forcing cache, the
+        prefetcher or the netCDF files
+
+        Args:
+            time_step (datetime): time step
+            variables (list): SMRF variables to read, defaults to all. The
+                prefetcher always returns all the variables
+
+        Returns:
+            dict: forcing keyed by the iSnobal input names
+        """
+
+        if self.forcing_cache is not None and not self.fill_forcing_cache:
+            return self.forcing_cache.get_timestep(
+                time_step, self.rows, variables)
+
+        elif self.prefetcher is not None:
+            return self.prefetcher.get(time_step)
+
+        return self.awsm.smrf_connector.get_timestep_netcdf(
+            time_step, variables)
+
+    def fast_forward_timestep(self):
+        """Fast forward the time step if the whole domain has no snow.
+        Only the precipitation of the time step is read and without any,
+        the model call and the other forcing are skipped. Every pixel is
+        advanced as a dormant pixel, the same as running the model.
+
+        Returns:
+            bool: True if the time step was fast forwarded
+        """
+
+        # the first step initializes the snowcover
+        if not self.fast_forward or self.step_index == 1:
+            return False
+
+        if self.updater is not None and \
+                self.time_step in self.updater.update_dates:
+            return False
+
+        # a skipped time step had no precipitation
+        input1 = self.input1 if self.stale_input is None else {'m_pp': 0.0}
+        no_precip = {'m_pp': 0.0}
+        dormant = dormant_pixels(
+            self.output_rec, input1, no_precip, self.model_mask)
+        if not np.array_equal(dormant, self.model_mask):
+            return False
+
+        data = self.read_forcing(self.time_step, ['precip'])
+        precip = data['m_pp']
+
+        dormant = dormant_pixels(
+            self.output_rec, input1, {'m_pp': precip}, self.model_mask)
+        if not np.array_equal(dormant, self.model_mask):
+            # keep the forcing if it was read in full
+            if self.prefetcher is not None:
+                self.next_forcing = (self.time_step, data)
+            return False
+
+        normal = self.time_step_info[ipysnobal.NORMAL_TSTEP]
+        dormant_update(
+            self.output_rec,
+            dormant,
+            normal['time_step'],
+            int(normal['intervals']))
+
+        # the forcing to start the next model time step from
+        self.stale_input = (
+            self.time_step, data if self.prefetcher is not None else None)
+        self.fast_forward_steps += 1
+
+        self._logger.debug(
+            'iPysnobal fast forwarded {} without snow or precipitation'.format(
+                self.time_step))
+
+        return True
+
+    def catch_up_input(self):
+        """Load the forcing of the last fast forwarded time step as the
+        start of the next time step
+        """
+
+        if self.stale_input is None:
+            return
+
+        time_step, data = self.stale_input
+        self.stale_input = None
+
+        if data is None:
+            data = self.read_forcing(time_step)
+        self.input1 = self.inputs.load(data, time_step)
 
     def set_current_time(self, step_time, time_since_out):
         """Set the current time and time since out
@@ -307,8 +553,24 @@ class PySnobal():
             time_since_out (int): time since out for the model results
         """
 
-        self.output_rec['current_time'] = step_time * self.init_ones
-        self.output_rec['time_since_out'] = time_since_out * self.init_ones
+        self.fill_output_rec('current_time', step_time)
+        self.fill_output_rec('time_since_out', time_since_out)
+
+    def fill_output_rec(self, key, value):
+        """Fill an output record array in place, allocating it only if the
+        output record does not have it yet
+
+        Args:
+            key (str): output record key
+            value (float): value to fill with
+        """
+
+        if key in self.output_rec and \
+                self.output_rec[key].shape == self.awsm.topo.dem.shape:
+            self.output_rec[key].fill(value)
+        else:
+            self.output_rec[key] = np.full(
+                self.awsm.topo.dem.shape, value, dtype=np.float64)
 
     def run_full_timestep(self):
         """Run the full timestep for iPysnobal. Includes getting the input,
@@ -319,33 +581,345 @@ class PySnobal():
         self._logger.info(
             'running iPysnobal for timestep: {}'.format(self.time_step))
 
+        if self.fast_forward_timestep():
+            self.output_timestep()
+            self.checkpoint_timestep()
+            return
+
+        self.catch_up_input()
         self.input2 = self.get_timestep_inputs()
 
         first_step = self.step_index
         first_step = self.do_update(first_step)
 
-        rt = snobal.do_tstep_grid(
-            self.input1,
-            self.input2,
-            self.output_rec,
+        self.run_snobal_timestep(first_step)
+
+        # the next time step loads into the other buffer
+        self.input1 = self.input2
+
+        self.output_timestep()
+        self.checkpoint_timestep()
+
+        self._logger.info(
+            'Finished iPysnobal timestep: {}'.format(self.time_step))
+
+    def do_tstep(self, first_step):
+        """Run the iSnobal time step
+
+        Args:
+            first_step (int): flag for the first time step
+
+        Returns:
+            int: -1 on success, otherwise the index of the failed pixel
+        """
+
+        self.skipped_pixels = None
+
+        if self.tiles is not None:
+            return self.tiles.do_tstep(
+                self.input1,
+                self.output_rec,
+                self.time_step_info,
+                first_step)
+
+        # the first step initializes the snowcover of every pixel
+        if self.config['dormant_fraction'] > 0 and first_step != 1:
+            return self.do_tstep_active(first_step)
+
+        return self.do_tstep_grid(
+            self.input1, self.input2, self.output_rec, first_step)
+
+    def do_tstep_grid(self, input1, input2, output_rec, first_step):
+        """Run the iSnobal time step on all the pixels of the arrays
+
+        Args:
+            input1 (dict): forcing at the start of the time step
+            input2 (dict): forcing at the end of the time step
+            output_rec (dict): iPysnobal output record
+            first_step (int): flag for the first time step
+
+        Returns:
+            int: -1 on success, otherwise the index of the failed pixel
+        """
+
+        return snobal.do_tstep_grid(
+            input1,
+            input2,
+            output_rec,
             self.time_step_info,
             self.options['constants'],
             self.params,
             first_step=first_step,
-            nthreads=self.config['ithreads']
+            nthreads=self.nthreads
         )
 
-        if rt != -1:
+    def do_tstep_active(self, first_step):
+        """Run the iSnobal time step only on the active pixels that have
+        snow or precipitation. The dormant pixels, without snow or
+        precipitation, only advance their clocks and the averages since the
+        last output as iSnobal would. If the fraction of active pixels is
+        above ``dormant_fraction`` the whole grid is run.
+
+        Args:
+            first_step (int): flag for the first time step
+
+        Returns:
+            int: -1 on success, otherwise the index of the failed pixel
+        """
+
+        dormant = dormant_pixels(
+            self.output_rec, self.input1, self.input2, self.model_mask)
+        active = np.flatnonzero(self.model_mask & ~dormant)
+
+        fraction = len(active) / max(np.count_nonzero(self.model_mask), 1)
+        self.active_fraction.append(fraction)
+        self._logger.debug(
+            'iPysnobal {:.1%} of the pixels active for {}'.format(
+                fraction, self.time_step))
+
+        if fraction >= self.config['dormant_fraction']:
+            return self.do_tstep_grid(
+                self.input1, self.input2, self.output_rec, first_step)
+
+        self.skipped_pixels = dormant
+
+        if len(active) > 0:
+            shape = self.awsm.topo.dem.shape
+            state = gather_pixels(self.output_rec, active, shape)
+            rt = self.do_tstep_grid(
+                gather_pixels(self.input1, active, shape),
+                gather_pixels(self.input2, active, shape),
+                state,
+                first_step)
+            scatter_pixels(state, active, self.output_rec)
+
+            if rt != -1:
+                return int(active[rt])
+
+        normal = self.time_step_info[ipysnobal.NORMAL_TSTEP]
+        dormant_update(
+            self.output_rec,
+            dormant,
+            normal['time_step'],
+            int(normal['intervals']))
+
+        return -1
+
+    def log_estimated_cost(self):
+        """Log the regions of the grid with the most estimated compute over
+        the run and their percent of the total
+        """
+
+        if self.cost_total is None:
+            return
+
+        cost = self.cost_total
+
+        # rows of the full grid for out-of-core runs
+        offset = 0
+        if self.awsm.window is not None:
+            offset = self.awsm.window.rows.start
+
+        for rows, cols, fraction in cost_regions(cost):
+            self._logger.info(
+                'iPysnobal estimated compute cost {:.1%} in rows {}-{} and '
+                'columns {}-{}'.format(
+                    fraction, rows.start + offset, rows.stop + offset,
+                    cols.start, cols.stop))
+
+    def log_active_fraction(self):
+        """Log the fraction of the pixels that were active over the run"""
+
+        if self.active_fraction:
+            self._logger.info(
+                'iPysnobal ran on {:.1%} of the pixels on average, between '
+                '{:.1%} and {:.1%} per time step'.format(
+                    np.mean(self.active_fraction),
+                    np.min(self.active_fraction),
+                    np.max(self.active_fraction)))
+
+    def run_snobal_timestep(self, first_step):
+        """Run iSnobal for the time step. With a retry budget, a failed
+        time step is rolled back to the state before the time step and
+        retried. The first retry uses larger mass thresholds to refine the
+        time step and after that the shallow snow at the failed pixel is
+        removed. The snow removed by earlier retries stays removed and a
+        pixel that fails again without its snow is not retried.
+
+        Args:
+            first_step (int): flag for the first time step
+
+        Raises:
+            ValueError: if the time step fails and can't be retried
+        """
+
+        if self.config['retry_budget'] > 0:
+            self.backup_state()
+
+        # time the threads for ithreads auto, the first step initializes
+        tune = self.thread_tuner is not None and first_step != 1
+
+        # cost of the time step from the snow state at the start
+        cost = None
+        if self.cost_total is not None or tune:
+            cost = pixel_cost(self.output_rec, self.time_step_info)
+
+        if tune:
+            snow = self.output_rec['m_s'][self.model_mask] > 0
+            self.nthreads = self.thread_tuner.next_threads(
+                np.mean(snow) if snow.size > 0 else 0.0)
+            start = perf_counter()
+
+        attempt = 0
+        self.cleared_pixels = set()
+        try:
+            rt = self.do_tstep(first_step)
+            while rt != -1:
+                self.retry_timestep(rt, attempt)
+                attempt += 1
+                rt = self.do_tstep(first_step)
+
+        finally:
+            if attempt > 0:
+                self.set_thresholds()
+
+        if tune and attempt == 0:
+            self.thread_tuner.record(perf_counter() - start, np.sum(cost))
+
+        if self.cost_total is not None:
+            cost *= attempt + 1
+            # the dormant pixels did not run the kernel
+            if self.skipped_pixels is not None:
+                cost[self.skipped_pixels] = 0.0
+            self.output_rec['estimated_cost'] += cost
+            self.cost_total += cost
+
+        if attempt > 0:
+            self._logger.warning(
+                'iPysnobal time step {} succeeded after {} retries'.format(
+                    self.time_step, attempt))
+
+    def retry_timestep(self, pixel, attempt):
+        """Roll back a failed time step and change the state or the
+        thresholds to retry it
+
+        Args:
+            pixel (int): index of the failed pixel
+            attempt (int): number of retries of the time step so far
+
+        Raises:
+            ValueError: if the retry budget is used up or nothing is left to
+                change
+        """
+
+        error = 'ipysnobal error on time step {}, pixel {}'.format(
+            self.time_step, pixel)
+
+        if self.retries >= self.config['retry_budget']:
+            if self.config['retry_budget'] > 0:
+                error += ', all {} retries used'.format(self.retries)
+            raise ValueError(error)
+
+        if pixel in self.cleared_pixels:
             raise ValueError(
-                'ipysnobal error on time step {}, pixel {}'.format(
-                    self.time_step, rt))
+                '{}, the pixel fails again after its snow was '
+                'removed'.format(error))
 
-        self.input1 = self.input2.copy()
+        self.retries += 1
+        self.restore_state()
 
-        self.output_timestep()
+        # the backup still has the snow removed by the earlier retries
+        for cleared in self.cleared_pixels:
+            self.remove_shallow_snow(
+                *np.unravel_index(cleared, self.awsm.topo.dem.shape))
 
-        self._logger.info(
-            'Finished iPysnobal timestep: {}'.format(self.time_step))
+        row, col = np.unravel_index(pixel, self.awsm.topo.dem.shape)
+
+        if attempt == 0:
+            factor = self.config['retry_thresh_factor']
+            self.set_thresholds(factor)
+            action = 'mass thresholds multiplied by {}'.format(factor)
+
+        elif self.remove_shallow_snow(row, col):
+            self.cleared_pixels.add(pixel)
+            action = 'snow removed at pixel'
+
+        else:
+            raise ValueError(
+                '{}, snow depth {:.3f} m is deeper than the depth_thresh '
+                '{} m to remove'.format(
+                    error,
+                    self.output_rec['z_s'][row, col],
+                    self.awsm.config['isnobal restart']['depth_thresh']))
+
+        self._logger.warning(
+            '{} (row {}, column {}), retrying with {} ({} of {} '
+            'retries used)'.format(
+                error, row, col, action,
+                self.retries, self.config['retry_budget']))
+
+    def backup_state(self):
+        """Copy the model state before the time step into the backup,
+        reusing the backup arrays
+        """
+
+        for key, value in self.output_rec.items():
+            backup = self.backup_rec.get(key)
+            if isinstance(value, np.ndarray) and \
+                    isinstance(backup, np.ndarray) and \
+                    backup.shape == value.shape:
+                np.copyto(backup, value)
+            else:
+                self.backup_rec[key] = np.copy(value)
+
+    def restore_state(self):
+        """Roll the model state back to the backup"""
+
+        for key, value in self.backup_rec.items():
+            if isinstance(self.output_rec.get(key), np.ndarray):
+                np.copyto(self.output_rec[key], value)
+            else:
+                self.output_rec[key] = np.copy(value)
+
+    def remove_shallow_snow(self, row, col):
+        """Remove the snow at a pixel if it is shallower than the
+        ``[isnobal restart] depth_thresh``, the same as restarting from a
+        crash
+
+        Args:
+            row (int): pixel row
+            col (int): pixel column
+
+        Returns:
+            bool: True if the snow was removed
+        """
+
+        depth_thresh = self.awsm.config['isnobal restart']['depth_thresh']
+        z_s = self.output_rec['z_s'][row, col]
+        if z_s >= depth_thresh:
+            return False
+
+        restart_var = ModelInit.zero_crash_depths(
+            depth_thresh,
+            z_s,
+            self.output_rec['rho'][row, col],
+            self.output_rec['T_s_0'][row, col] - FREEZE,
+            self.output_rec['T_s_l'][row, col] - FREEZE,
+            self.output_rec['T_s'][row, col] - FREEZE,
+            self.output_rec['h2o_sat'][row, col])
+
+        for key in ('T_s_0', 'T_s_l', 'T_s'):
+            restart_var[key] += FREEZE
+
+        # the rest of the snowcover goes with the depth
+        for key in self.SNOW_STATE:
+            if key in self.output_rec:
+                self.output_rec[key][row, col] = 0.0
+
+        for key, value in restart_var.items():
+            self.output_rec[key][row, col] = value
+
+        return True
 
     def smrf_ipysnobal_time_step(self):
         """Run the time step for a `smrf_ipysnobal` simulation
@@ -378,16 +952,37 @@ class PySnobal():
             self._logger.debug('iPysnobal {0:.2f} seconds for time step'
                                .format(telapsed.total_seconds()))
 
-    def output_timestep(self):
-        """Output the time step if on the right frequency.
+    def is_output_step(self, step_index):
+        """Check if a time step is output, either on the output frequency
+        or the last time step
+
+        Args:
+            step_index (int): index of the time step
+
+        Returns:
+            bool: True if the time step is output
         """
 
-        out_freq = (self.step_index * self.data_time_step /
+        out_freq = (step_index * self.data_time_step /
                     3600.0) % self.options['output']['frequency'] == 0
-        last_time_step = self.step_index == len(
+        last_time_step = step_index == len(
             self.options['time']['date_time']) - 1
 
-        if out_freq or last_time_step:
+        return out_freq or last_time_step
+
+    @property
+    def output_count(self):
+        """Number of output time steps in the run"""
+        return sum([
+            self.is_output_step(idx)
+            for idx in range(1, len(self.options['time']['date_time']))
+        ])
+
+    def output_timestep(self):
+        """Output the time step if on the right frequency.
+        """
+
+        if self.is_output_step(self.step_index):
 
             self._logger.info('iPysnobal outputting {}'.format(self.time_step))
             self.pysnobal_io.output_timestep(
@@ -395,7 +990,119 @@ class PySnobal():
                 self.time_step
             )
 
-            self.output_rec['time_since_out'] = self.init_zeros
+            self.fill_output_rec('time_since_out', 0.0)
+            if 'estimated_cost' in self.output_rec:
+                self.fill_output_rec('estimated_cost', 0.0)
+
+    @property
+    def update_position(self):
+        """Number of depth updates applied up to the current time step"""
+
+        if self.updater is None:
+            return 0
+        return sum([d <= self.time_step for d in self.updater.update_dates])
+
+    def checkpoint_timestep(self):
+        """Write a checkpoint of the full model state if on the checkpoint
+        frequency. With an output writer, the checkpoint is saved in the
+        writer thread after the output before it.
+        """
+
+        if self.checkpoints is None or not self.checkpoints.is_checkpoint_step(
+                self.step_index, self.data_time_step):
+            return
+
+        # the checkpoint holds the forcing at the end of the time step
+        self.catch_up_input()
+
+        state = Checkpoints.state(
+            self.step_index,
+            self.time_step,
+            self.output_rec,
+            self.input1,
+            self.update_position,
+            copy=self.output_writer is not None)
+
+        if self.output_writer is None:
+            self.save_checkpoint(state)
+        else:
+            self.output_writer.submit_call(self.save_checkpoint, state)
+
+    def save_checkpoint(self, state):
+        """Sync the output to disk and save the checkpoint, so the output
+        is complete up to the checkpoint
+
+        Args:
+            state (dict): checkpoint state
+        """
+
+        self.pysnobal_io.backend.sync()
+        self.checkpoints.save(state)
+
+    def restore_checkpoint(self, file_name):
+        """Restore the model state from a checkpoint. The run continues
+        with the time step after the checkpoint.
+
+        Args:
+            file_name (str): checkpoint file
+
+        Raises:
+            ValueError: if the checkpoint is not in the run or does not match
+                the model domain
+        """
+
+        checkpoint = Checkpoints.read(file_name)
+
+        if checkpoint['time'] not in self.date_time:
+            raise ValueError(
+                'Checkpoint time {} is not a time step of the run'.format(
+                    checkpoint['time']))
+
+        self.start_step = self.date_time.index(checkpoint['time'])
+        if self.start_step != checkpoint['step_index']:
+            raise ValueError(
+                'Checkpoint {} was written at time step {} but is time step '
+                '{} of this run, the start date must match the original '
+                'run'.format(
+                    file_name, checkpoint['step_index'], self.start_step))
+
+        shape = checkpoint['output_rec']['z_s'].shape
+        if shape != self.awsm.topo.dem.shape:
+            raise ValueError(
+                'Checkpoint {} has shape {} but the topo has shape {}'.format(
+                    file_name, shape, self.awsm.topo.dem.shape))
+
+        self.step_index = self.start_step
+        self.time_step = self.date_time[self.start_step]
+        self.output_rec = checkpoint['output_rec']
+        if self.cost_total is not None and \
+                'estimated_cost' not in self.output_rec:
+            self.output_rec['estimated_cost'] = np.zeros_like(
+                self.output_rec['m_s'])
+        self.input1 = self.inputs.load(
+            checkpoint['input'], self.time_step, kelvin=True)
+
+        if checkpoint['update_position'] != self.update_position:
+            self._logger.warning(
+                'Checkpoint applied {} depth updates but the update file has '
+                '{} updates up to {}'.format(
+                    checkpoint['update_position'],
+                    self.update_position,
+                    self.time_step))
+
+        self._logger.info(
+            'Restarting iPysnobal from checkpoint {} at {}'.format(
+                file_name, self.time_step))
+
+    def restart_state(self):
+        """Model state at the end of the run to initialize the next run
+
+        Returns:
+            dict: init fields as they are read from the output, None if they
+                can't be handed over in memory
+        """
+
+        return self.pysnobal_io.restart_state(self.output_rec)
 
     def run_ipysnobal(self):
         """
@@ -406,22 +1113,124 @@ class PySnobal():
         self._logger.info('Initializing PySnobal from netcdf files')
         self.initialize_ipysnobal()
 
+        self.initialize_updater()
+
+        if self.config['restart_checkpoint'] is not None:
+            self.restore_checkpoint(self.config['restart_checkpoint'])
+
         self._logger.info('getting inputs for first timestep')
 
-        self.force = self.awsm.smrf_connector.open_netcdf_files()
-        self.time_step = self.date_time[0]
-        self.input1 = self.get_timestep_inputs()
+        self.initialize_forcing_cache()
+        if self.forcing_cache is None:
+            self.force = self.awsm.smrf_connector.open_netcdf_files()
+            self.initialize_prefetcher()
 
-        self.initialize_updater()
+        if self.config['restart_checkpoint'] is None:
+            self.time_step = self.date_time[0]
+            self.input1 = self.get_timestep_inputs()
 
         self._logger.info('starting PySnobal time series loop')
 
-        for self.step_index, self.time_step in enumerate(self.date_time[1:], 1):  # noqa
-            self.run_full_timestep()
+        self.fast_forward = self.config['fast_forward']
+
+        first = self.start_step + 1
+        try:
+            for self.step_index, self.time_step in enumerate(self.date_time[first:], first):  # noqa
+                self.run_full_timestep()
+        finally:
+            if self.prefetcher is not None:
+                self.prefetcher.stop()
+            self.close_tiles()
+
+        self.log_active_fraction()
+        self.log_estimated_cost()
+        if self.fast_forward_steps > 0:
+            self._logger.info(
+                'iPysnobal fast forwarded {} time steps without snow or '
+                'precipitation'.format(self.fast_forward_steps))
 
         # close input files
-        self.awsm.smrf_connector.close_netcdf_files()
-        self.pysnobal_io.output_file.close()
+        if self.forcing_cache is None:
+            self.awsm.smrf_connector.close_netcdf_files()
+        self.pysnobal_io.close()
+
+    def close_tiles(self):
+        """Stop the tile workers, the model state is copied out of the
+        shared memory
+        """
+
+        if self.tiles is not None:
+            self.tiles.close(self.output_rec)
+            self.tiles = None
+            self.inputs = None
+
+    def initialize_forcing_cache(self, fill=False):
+        """Set up the forcing cache if configured. When replaying a run
+        from the SMRF netCDF files, the cache is converted from the netCDF
+        files the first time and read from then on. When running SMRF, an
+        incomplete cache is filled as the forcing is distributed. A complete
+        cache has the same forcing as SMRF distributes, so it is not filled
+        again.
+
+        Args:
+            fill (bool): fill the cache from SMRF instead of reading it
+        """
+
+        if not self.config['forcing_cache']:
+            return
+
+        cache = ForcingCache.from_awsm(self.awsm)
+
+        if cache.exists():
+            if fill:
+                self._logger.info(
+                    'Forcing cache {} is complete, not filling it '
+                    'again'.format(cache.path))
+            else:
+                cache.open()
+                self.forcing_cache = cache
+
+        elif self.awsm.window is not None:
+            # converting reads the whole grid, only read an existing cache
+            self._logger.warning(
+                'Forcing cache {} does not exist, out-of-core runs read the '
+                'netCDF forcing'.format(cache.path))
+
+        elif fill:
+            cache.create(self.date_time, self.awsm.topo.dem.shape)
+            self.forcing_cache = cache
+            self.fill_forcing_cache = True
+
+        else:
+            convert_netcdf(self.awsm, self.date_time, cache)
+            cache.open()
+            self.forcing_cache = cache
+
+    def finalize_forcing_cache(self):
+        """Mark a cache filled while running SMRF as complete"""
+
+        if self.fill_forcing_cache:
+            self.forcing_cache.finalize()
+            self.forcing_cache = None
+            self.fill_forcing_cache = False
+
+    def initialize_prefetcher(self):
+        """Start reading the netCDF forcing ahead of the model if a
+        prefetch depth is configured
+        """
+
+        if self.config['prefetch_depth'] > 0:
+            # a restart reads from the time step after the checkpoint
+            date_time = self.date_time
+            if self.config['restart_checkpoint'] is not None:
+                date_time = self.date_time[self.start_step + 1:]
+
+            self.prefetcher = ForcingPrefetcher(
+                self.awsm.smrf_connector,
+                date_time,
+                self.config['prefetch_depth'],
+                self.config['prefetch_workers'])
+            self.prefetcher.start()
 
     def run_smrf_ipysnobal(self):
         """
@@ -429,6 +1238,10 @@ class PySnobal():
         iSnobal.
         """
 
+        if self.config['smrf_process']:
+            self.run_smrf_ipysnobal_process()
+            return
+
         with SMRF(
                 self.awsm.smrf_connector.smrf_config,
                 self._logger
@@ -440,14 +1253,69 @@ class PySnobal():
             self.smrf.loadData()
 
             # run threaded or not
-            if self.smrf.threading:
-                self.run_smrf_ipysnobal_threaded()
-            else:
-                self.run_smrf_ipysnobal_serial()
+            try:
+                if self.smrf.threading:
+                    self.run_smrf_ipysnobal_threaded()
+                else:
+                    self.run_smrf_ipysnobal_serial()
+            finally:
+                self.close_tiles()
+
+            self.log_active_fraction()
+            self.log_estimated_cost()
 
-        self.pysnobal_io.output_file.close()
+            # the writer may still have SMRF output to write
+            self.pysnobal_io.close()
+
+        self.finalize_forcing_cache()
         self._logger.debug('DONE!!!!')
 
+    def run_smrf_ipysnobal_process(self):
+        """Run SMRF in a separate process that hands the forcing to
+        iPysnobal through a ring buffer in shared memory. SMRF runs threaded
+        or serial in its process as configured.
+        """
+
+        self._logger.info('Running SMRF and iPysnobal in separate processes')
+
+        self.initialize_ipysnobal()
+        self.initialize_updater()
+        self.initialize_forcing_cache(fill=True)
+
+        self.smrf_process = SMRFProcess(
+            self.awsm.smrf_connector.smrf_config,
+            self.date_time,
+            self.awsm.topo.dem.shape,
+            self.FORCING_VARIABLES,
+            self.awsm.soil_temp,
+            self.awsm.config['awsm system'],
+            self.config['smrf_process_slots'],
+            self.awsm.smrf_connector.forcing_dtype)
+        self.smrf_process.start()
+
+        completed = False
+        try:
+            for self.step_index, self.time_step in enumerate(self.date_time):
+                startTime = datetime.now()
+
+                self.smrf_ipysnobal_time_step()
+
+                telapsed = datetime.now() - startTime
+                self._logger.debug('iPysnobal {0:.2f} seconds for time step'
+                                   .format(telapsed.total_seconds()))
+            completed = True
+
+        finally:
+            self.smrf_process.stop(wait=completed)
+            self.smrf_process = None
+            self.close_tiles()
+
+        self.log_active_fraction()
+        self.log_estimated_cost()
+        self.pysnobal_io.close()
+
+        self.finalize_forcing_cache()
+
     def run_smrf_ipysnobal_serial(self):
         """
         Running smrf and PySnobal in non-threaded application.
@@ -463,12 +1331,13 @@ class PySnobal():
             self.FORCING_VARIABLES, '.')
 
         self.initialize_updater()
+        self.initialize_forcing_cache(fill=True)
 
         for self.step_index, self.time_step in enumerate(self.date_time):
             startTime = datetime.now()
 
             self.smrf.distribute_single_timestep(self.time_step)
-            self.smrf.output(self.time_step)
+            self.output_smrf()
 
             self.smrf_ipysnobal_time_step()
 
@@ -476,6 +1345,22 @@ class PySnobal():
             self.smrf._logger.debug('{0:.2f} seconds for time step'
                                     .format(telapsed.total_seconds()))
 
+    def output_smrf(self):
+        """Output the SMRF forcing for the time step. With an output writer
+        the SMRF output variables are copied and written in the writer
+        thread.
+        """
+
+        if self.output_writer is None or \
+                getattr(self.smrf, 'out_func', None) is None:
+            self.smrf.output(self.time_step)
+            return
+
+        self.output_writer.submit_call(
+            type(self.smrf).output,
+            SMRFOutputSnapshot(self.smrf),
+            self.time_step)
+
     def run_smrf_ipysnobal_threaded(self):
         """
         Function to run SMRF (threaded) and pass outputs in memory to python
@@ -492,6 +1377,7 @@ class PySnobal():
             self.FORCING_VARIABLES, '.')
 
         self.initialize_updater()
+        self.initialize_forcing_cache(fill=True)
 
         self.smrf.create_data_queue()
         self.smrf.set_queue_variables()
@@ -524,9 +1410,56 @@ class PySnobal():
         self.smrf.threads.append(queue.QueueCleaner(
             self.smrf.date_time, self.smrf.smrf_queue))
 
-        # start all the threads
-        for i in range(len(self.smrf.threads)):
-            self.smrf.threads[i].start()
+        telemetry = None
+        if self.awsm.config['awsm system']['queue_telemetry']:
+            telemetry = QueueTelemetry(
+                self.awsm.config['awsm system']['queue_telemetry_interval'])
+            telemetry.instrument(self.smrf.smrf_queue)
+            for thread in self.smrf.threads:
+                telemetry.track(thread)
+            telemetry.start()
+
+        # start all the threads, the telemetry report is written even if
+        # the run fails
+        budget = self.awsm.thread_budget
+        try:
+            if budget is None:
+                for i in range(len(self.smrf.threads)):
+                    self.smrf.threads[i].start()
+
+                for i in range(len(self.smrf.threads)):
+                    self.smrf.threads[i].join()
+
+            else:
+                # the BLAS limit is lifted for the rest of the process
+                with budget.limit_blas():
+                    budget.begin()
+                    for thread in self.smrf.threads:
+                        budget.start(thread, self.thread_group(thread))
+
+                    for thread in self.smrf.threads:
+                        thread.join()
+
+                budget.log_utilization()
+
+        finally:
+            if telemetry is not None:
+                telemetry.stop(os.path.join(
+                    self.awsm.path_output, 'queue_telemetry.json'))
+
+    @staticmethod
+    def thread_group(thread):
+        """Thread budget group of a thread of the threaded smrf_ipysnobal
+
+        Args:
+            thread (threading.Thread): thread to start
+
+        Returns:
+            str: thread group
+        """
 
-        for i in range(len(self.smrf.threads)):
-            self.smrf.threads[i].join()
+        if thread.name == 'ipysnobal':
+            return 'model'
+        if isinstance(thread, (queue.QueueOutput, queue.QueueCleaner)):
+            return 'io'
+        return 'smrf'
@@ -0,0 +1,473 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import netCDF4 as nc
+import numpy as np
+from spatialnc.proj import add_proj, add_proj_from_file
+
+from awsm.models.smrf_connector import NETCDF_LOCK
+
+# target size of an automatically sized chunk in bytes
+AUTO_CHUNK_BYTES = 2**20
+
+
+def auto_chunksizes(ny, nx, nt=None, output_frequency=1, itemsize=4):
+    """Chunk shape for a (time, y, x) variable. The time chunk holds a
+    day of output, or the whole run if shorter, and the spatial chunk
+    is square and sized so a chunk is about ``AUTO_CHUNK_BYTES``.
+
+    Args:
+        ny (int): number of rows
+        nx (int): number of columns
+        nt (int): number of output time steps if known
+        output_frequency (int): hours between outputs
+        itemsize (int): bytes per value
+
+    Returns:
+        tuple: chunk shape
+    """
+
+    nt_chunk = max(24 // max(output_frequency, 1), 1)
+    if nt is not None:
+        nt_chunk = max(min(nt_chunk, nt), 1)
+
+    side = int((AUTO_CHUNK_BYTES / itemsize / nt_chunk) ** 0.5)
+    side = max(side, 1)
+
+    return (nt_chunk, min(side, ny), min(side, nx))
+
+
+def netcdf_storage_options(config, ny, nx, nt=None, output_frequency=1,
+                           itemsize=4):
+    """Build the ``createVariable`` keyword arguments for the chunking and
+    compression options in the ``[ipysnobal]`` section
+
+    Args:
+        config (dict): ipysnobal section of the AWSM config
+        ny (int): number of rows
+        nx (int): number of columns
+        nt (int): number of output time steps if known
+        output_frequency (int): hours between outputs
+        itemsize (int): bytes per value
+
+    Returns:
+        dict: keyword arguments for ``createVariable``
+    """
+
+    chunks = config['output_chunks']
+    if chunks is None or chunks[0] == 'auto':
+        chunksizes = auto_chunksizes(
+            ny, nx, nt, output_frequency, itemsize)
+    else:
+        if len(chunks) != 3:
+            raise ValueError(
+                'output_chunks must be auto or three integers for time, y '
+                'and x, got {}'.format(chunks))
+        chunksizes = (int(chunks[0]),
+                      min(int(chunks[1]), ny),
+                      min(int(chunks[2]), nx))
+
+    return {
+        'chunksizes': chunksizes,
+        'zlib': config['output_zlib'],
+        'complevel': config['output_complevel'],
+        'shuffle': config['output_shuffle'],
+    }
+
+
+def least_significant_digits(config):
+    """Parse the ``output_least_significant_digit`` option
+
+    Args:
+        config (dict): ipysnobal section of the AWSM config
+
+    Returns:
+        dict: variable name and number of significant digits to keep
+    """
+
+    digits = {}
+    for item in config['output_least_significant_digit'] or []:
+        try:
+            var_name, value = item.split(':')
+            digits[var_name.strip()] = int(value)
+        except ValueError:
+            raise ValueError(
+                'output_least_significant_digit items must be in the form '
+                'variable:digits, got {}'.format(item))
+
+    return digits
+
+
+def set_chunk_cache(dataset, config):
+    """Size the HDF5 chunk cache of every variable in the dataset
+
+    Args:
+        dataset (netCDF4.Dataset): open dataset
+        config (dict): ipysnobal section of the AWSM config
+    """
+
+    if config['output_chunk_cache'] is None:
+        return
+
+    size = int(config['output_chunk_cache'] * 2**20)
+    for variable in dataset.variables.values():
+        if variable.ndim == 3:
+            variable.set_var_chunk_cache(size=size)
+
+
+class NetcdfOutput():
+    """netCDF output backend for :class:`PysnobalIO`, writes a single
+    netCDF4 file.
+
+    Args:
+        pysnobal_io (PysnobalIO): output instance with the variables, grid
+            and configuration to write
+    """
+
+    EXTENSION = '.nc'
+
+    def __init__(self, pysnobal_io):
+
+        self._logger = logging.getLogger(__name__)
+        self.io = pysnobal_io
+        self.filename = pysnobal_io.output_filename
+
+        # rows of the grid written, a window for out-of-core runs
+        self.rows = slice(None)
+        if pysnobal_io.window is not None:
+            self.rows = pysnobal_io.window.interior
+        self.dataset = None
+
+    @property
+    def time_units(self):
+        return self.dataset.variables['time'].units
+
+    @property
+    def time_calendar(self):
+        return self.dataset.variables['time'].calendar
+
+    def create(self, nt=None):
+        """Create the output file or open it to append if it exists
+
+        Args:
+            nt (int): number of output time steps in the run
+        """
+
+        io = self.io
+        fmt = '%Y-%m-%d %H:%M:%S'
+        if os.path.isfile(self.filename):
+            self._logger.warning(
+                'Opening {}, data may be overwritten!'.format(
+                    self.filename))
+            em = nc.Dataset(self.filename, 'a')
+            h = '[{}] Data added or updated'.format(
+                datetime.now().strftime(fmt))
+            setattr(em, 'last_modified', h)
+
+            if 'projection' not in em.variables.keys():
+                em = add_proj(em, None, io.awsm.topo.topoConfig['filename'])
+
+        else:
+            em = nc.Dataset(self.filename, 'w')
+
+            dimensions = ('time', 'y', 'x')
+
+            # create the dimensions
+            time_length = None
+            if io.config['output_fixed_time'] and nt is not None:
+                time_length = nt
+            em.createDimension('time', time_length)
+            em.createDimension('y', len(io.y))
+            em.createDimension('x', len(io.x))
+
+            # create some variables
+            # TODO what is the cell references, LL or center? #41
+            em.createVariable('time', 'f', dimensions[0])
+            em.createVariable('y', 'f', dimensions[1])
+            em.createVariable('x', 'f', dimensions[2])
+
+            for key, value in io.time_attributes.items():
+                setattr(em.variables['time'], key, value)
+
+            em.variables['x'][:] = io.x
+            em.variables['y'][:] = io.y
+
+            storage = netcdf_storage_options(
+                io.config,
+                len(io.y),
+                len(io.x),
+                nt,
+                io.awsm.output_freq,
+                np.dtype(io.precision).itemsize)
+            digits = least_significant_digits(io.config)
+
+            for var_name in io.output_variables:
+
+                em.createVariable(
+                    var_name,
+                    io.precision,
+                    dimensions[:3],
+                    least_significant_digit=digits.get(var_name),
+                    **storage)
+                setattr(em.variables[var_name],
+                        'units',
+                        io.OUTPUT_VARIABLES[var_name]['units'])
+                setattr(em.variables[var_name],
+                        'description',
+                        io.OUTPUT_VARIABLES[var_name]['description'])
+
+            # add projection info
+            em = add_proj(em, None, io.awsm.topo.topoConfig['filename'])
+
+        set_chunk_cache(em, io.config)
+        self.dataset = em
+
+    def existing_times(self):
+        """Time values in the file, fill values are masked"""
+        return self.dataset.variables['time'][:]
+
+    def write_timesteps(self, first, times, data):
+        """Write consecutive time steps
+
+        Args:
+            first (int): time index of the first time step
+            times (list): time values
+            data (dict): variable name and array with shape (time, y, x),
+                the y of the rows written
+        """
+
+        last = first + len(times)
+
+        with NETCDF_LOCK:
+            # insert the time
+            self.dataset.variables['time'][first:last] = times
+
+            # insert the data
+            for key, value in data.items():
+                self.dataset.variables[key][first:last, self.rows] = value
+
+    def sync(self):
+        with NETCDF_LOCK:
+            self.dataset.sync()
+
+    def close(self):
+        with NETCDF_LOCK:
+            self.dataset.close()
+
+
+class ZarrOutput():
+    """Zarr directory store output backend for :class:`PysnobalIO`.
+
+    The arrays carry the ``_ARRAY_DIMENSIONS`` attribute so the store can
+    be opened with ``xarray.open_zarr``. Appending a time step resizes the
+    time dimension and the variables are written concurrently from a pool
+    of threads, each variable chunk is compressed independently.
+
+    Args:
+        pysnobal_io (PysnobalIO): output instance with the variables, grid
+            and configuration to write
+    """
+
+    EXTENSION = '.zarr'
+
+    def __init__(self, pysnobal_io):
+
+        try:
+            import zarr
+        except ImportError:
+            raise ImportError(
+                'The zarr output backend requires the zarr package, '
+                'install with pip install zarr')
+
+        self._logger = logging.getLogger(__name__)
+        self.zarr = zarr
+        self.io = pysnobal_io
+        self.filename = pysnobal_io.output_filename
+
+        # rows of the grid written, a window for out-of-core runs
+        self.rows = slice(None)
+        if pysnobal_io.window is not None:
+            self.rows = pysnobal_io.window.interior
+        self.group = None
+        self.pool = ThreadPoolExecutor(
+            max_workers=pysnobal_io.config['zarr_write_threads'],
+            thread_name_prefix='zarr_output')
+
+    @property
+    def time_units(self):
+        return self.group['time'].attrs['units']
+
+    @property
+    def time_calendar(self):
+        return self.group['time'].attrs['calendar']
+
+    def compressor(self):
+        """zlib compressor if compression is configured, else the zarr
+        default compressor
+        """
+
+        if self.io.config['output_zlib']:
+            from numcodecs import Zlib
+            return Zlib(level=self.io.config['output_complevel'])
+        return 'default'
+
+    def create(self, nt=None):
+        """Create the zarr store or open it to append if it exists
+
+        Args:
+            nt (int): number of output time steps in the run
+        """
+
+        io = self.io
+        synchronizer = self.zarr.ThreadSynchronizer()
+
+        if os.path.isdir(self.filename):
+            self._logger.warning(
+                'Opening {}, data may be overwritten!'.format(
+                    self.filename))
+            self.group = self.zarr.open_group(
+                self.filename, mode='a', synchronizer=synchronizer)
+            self.group.attrs['last_modified'] = \
+                '[{}] Data added or updated'.format(
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+            if 'projection' not in self.group:
+                self.add_proj()
+            return
+
+        self.group = self.zarr.open_group(
+            self.filename, mode='w', synchronizer=synchronizer)
+
+        ny = len(io.y)
+        nx = len(io.x)
+        time_length = 0
+        if io.config['output_fixed_time'] and nt is not None:
+            time_length = nt
+
+        storage = netcdf_storage_options(
+            io.config, ny, nx, nt, io.awsm.output_freq,
+            np.dtype(io.precision).itemsize)
+        chunks = storage['chunksizes']
+
+        time = self.group.full(
+            'time', np.nan, shape=(time_length,), chunks=(chunks[0],),
+            dtype='f4')
+        time.attrs.update(io.time_attributes)
+        time.attrs['_ARRAY_DIMENSIONS'] = ['time']
+
+        for name, values in [('y', io.y), ('x', io.x)]:
+            coord = self.group.array(
+                name, np.asarray(values, dtype='f4'), chunks=(len(values),))
+            coord.attrs['_ARRAY_DIMENSIONS'] = [name]
+
+        digits = least_significant_digits(io.config)
+        for var_name in io.output_variables:
+            filters = None
+            if var_name in digits:
+                from numcodecs import Quantize
+                filters = [Quantize(digits[var_name], dtype=io.precision)]
+
+            variable = self.group.full(
+                var_name,
+                np.nan,
+                shape=(time_length, ny, nx),
+                chunks=chunks,
+                dtype=io.precision,
+                compressor=self.compressor(),
+                filters=filters)
+            variable.attrs['units'] = io.OUTPUT_VARIABLES[var_name]['units']
+            variable.attrs['description'] = \
+                io.OUTPUT_VARIABLES[var_name]['description']
+            variable.attrs['_ARRAY_DIMENSIONS'] = ['time', 'y', 'x']
+
+        # add projection info
+        self.add_proj()
+
+    def add_proj(self):
+        """Add the projection of the topo the same way as
+        ``spatialnc.proj.add_proj`` does for the netCDF output, a scalar
+        ``projection`` variable that the gridded variables reference with
+        their ``grid_mapping`` attribute
+        """
+
+        map_meta = add_proj_from_file(self.io.awsm.topo.topoConfig['filename'])
+
+        projection = self.group.full(
+            'projection', b'', shape=(), dtype='S1')
+        projection.attrs.update(map_meta)
+        projection.attrs['_ARRAY_DIMENSIONS'] = []
+
+        for name, variable in self.group.arrays():
+            dimensions = variable.attrs.get('_ARRAY_DIMENSIONS', [])
+            if 'x' in dimensions and 'y' in dimensions:
+                variable.attrs['grid_mapping'] = 'projection'
+            elif name in ['x', 'y']:
+                variable.attrs['standard_name'] = \
+                    'projection_{}_coordinate'.format(name)
+                variable.attrs['units'] = 'meters'
+
+    def existing_times(self):
+        """Time values in the store, unwritten times are masked"""
+        times = self.group['time'][:]
+        return np.ma.masked_invalid(times)
+
+    def write_timesteps(self, first, times, data):
+        """Write consecutive time steps, growing the time dimension if
+        needed
+
+        Args:
+            first (int): time index of the first time step
+            times (list): time values
+            data (dict): variable name and array with shape (time, y, x),
+                the y of the rows written
+        """
+
+        last = first + len(times)
+
+        if last > self.group['time'].shape[0]:
+            self.group['time'].resize(last)
+            for key in self.io.output_variables:
+                shape = self.group[key].shape
+                self.group[key].resize((last, shape[1], shape[2]))
+
+        self.group['time'][first:last] = times
+
+        def write(key):
+            self.group[key][first:last, self.rows] = data[key]
+
+        # surface any exception from the writes
+        list(self.pool.map(write, data.keys()))
+
+    def sync(self):
+        # zarr writes go straight to the store
+        pass
+
+    def close(self):
+        self.pool.shutdown()
+        self.zarr.consolidate_metadata(self.group.store)
+
+
+OUTPUT_BACKENDS = {
+    'netcdf': NetcdfOutput,
+    'zarr': ZarrOutput,
+}
+
+
+def output_file_path(path, config):
+    """Path to the iPysnobal output of a run
+
+    Args:
+        path (str): run output directory
+        config (dict): casted AWSM config
+
+    Returns:
+        str: output file or store path
+    """
+
+    ipysnobal = config['ipysnobal']
+    return os.path.join(
+        path,
+        ipysnobal['output_file_name'] +
+        OUTPUT_BACKENDS[ipysnobal['output_backend']].EXTENSION)
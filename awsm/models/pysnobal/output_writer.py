@@ -0,0 +1,230 @@
+import logging
+import queue
+import threading
+from time import perf_counter
+
+import numpy as np
+
+from awsm.models.smrf_connector import NETCDF_LOCK
+
+
+class AsyncOutputWriter():
+    """Write model output in a background thread so the model loop does
+    not wait on the disk.
+
+    Two kinds of work can be submitted. Time step snapshots for an output
+    backend with :meth:`submit_timestep` are held until ``batch_size``
+    consecutive time steps are available and then written with one
+    hyperslab write per variable. Any other output, like SMRF's output
+    function, is submitted as a callable with :meth:`submit_call` and runs
+    in order with the snapshots.
+
+    At most ``max_queue`` submissions wait for the writer, so the memory
+    used by snapshots is bounded by ``max_queue + batch_size`` time steps.
+    If a submission can't be queued within ``timeout`` seconds the writer
+    has fallen behind and a ``RuntimeError`` is raised in the model thread.
+    An error in the writer thread is raised on the next submission or on
+    :meth:`close`.
+
+    Args:
+        name (str): name of the writer thread
+        max_queue (int): maximum number of submissions waiting
+        batch_size (int): number of time steps to write at once
+        sync_interval (int): sync the datasets every ``sync_interval``
+            writes, 0 to only sync when closing
+        timeout (float): seconds to wait on a full queue
+    """
+
+    def __init__(self, name='output_writer', max_queue=4, batch_size=1,
+                 sync_interval=1, timeout=600):
+
+        self._logger = logging.getLogger(__name__)
+
+        self.name = name
+        self.batch_size = max(batch_size, 1)
+        self.sync_interval = sync_interval
+        self.timeout = timeout
+
+        self.queue = queue.Queue(maxsize=max(max_queue, 1))
+        self.pending = []
+        self.targets = set()
+        self.nwrites = 0
+        self.write_time = 0.0
+        self.error = None
+
+        self.thread = threading.Thread(
+            target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+
+        self._logger.debug(
+            '{} started with queue {}, batch {} and sync interval {}'.format(
+                self.name, max_queue, self.batch_size, self.sync_interval))
+
+    def submit_timestep(self, target, index, time, data):
+        """Submit a time step snapshot to write to an output backend
+
+        Args:
+            target: output backend with ``write_timesteps`` and ``sync``
+            index (int): time index to write
+            time (float): value of the time variable
+            data (dict): variable name and array to write, the arrays
+                must not be modified after submitting
+        """
+
+        self.put(('timestep', target, index, time, data))
+
+    def submit_call(self, func, *args):
+        """Submit any other output function to run in the writer thread
+
+        Args:
+            func (callable): function to call
+            args: arguments to the function, must not be modified after
+                submitting
+        """
+
+        self.put(('call', func, args))
+
+    def put(self, item):
+        self.raise_error()
+
+        try:
+            self.queue.put(item, timeout=self.timeout)
+        except queue.Full:
+            raise RuntimeError(
+                '{} fell behind the model, no room in the output queue '
+                'after {} seconds'.format(self.name, self.timeout))
+
+    def raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(
+                '{} failed writing output'.format(self.name)) from self.error
+
+    def run(self):
+        """Thread target that writes the submitted output until closed"""
+
+        while True:
+            item = self.queue.get()
+
+            if self.error is None:
+                try:
+                    self.process(item)
+                except Exception as e:
+                    self._logger.error(
+                        '{} failed: {}'.format(self.name, e))
+                    self.error = e
+
+            self.queue.task_done()
+            if item is None:
+                break
+
+    def process(self, item):
+        """Process a submission, batching consecutive time steps
+
+        Args:
+            item (tuple): submission, None when closing
+        """
+
+        if item is not None and item[0] == 'timestep':
+            if self.pending and not self.continues_batch(item):
+                self.write_pending()
+
+            self.pending.append(item)
+            if len(self.pending) >= self.batch_size:
+                self.write_pending()
+            return
+
+        self.write_pending()
+
+        if item is None:
+            self.sync()
+
+        else:
+            start = perf_counter()
+            with NETCDF_LOCK:
+                item[1](*item[2])
+            self.write_time += perf_counter() - start
+
+    def continues_batch(self, item):
+        """Check if a time step goes in the same hyperslab as the pending
+        time steps
+        """
+
+        last = self.pending[-1]
+        return item[1] is last[1] and item[2] == last[2] + 1
+
+    def write_pending(self):
+        """Write the pending time steps as one hyperslab per variable"""
+
+        if not self.pending:
+            return
+
+        start = perf_counter()
+        target = self.pending[0][1]
+
+        target.write_timesteps(
+            self.pending[0][2],
+            [item[3] for item in self.pending],
+            {
+                key: np.stack([item[4][key] for item in self.pending])
+                for key in self.pending[0][4].keys()
+            })
+
+        self.targets.add(target)
+        self.pending = []
+        self.nwrites += 1
+        self.write_time += perf_counter() - start
+
+        if self.sync_interval > 0 and self.nwrites % self.sync_interval == 0:
+            self.sync()
+
+    def sync(self):
+        for target in self.targets:
+            target.sync()
+
+    def close(self):
+        """Write everything that is left, sync and stop the writer thread
+
+        Raises:
+            RuntimeError: if the writer failed
+        """
+
+        self.queue.put(None)
+        self.thread.join()
+
+        self._logger.info(
+            '{} spent {:.2f} seconds writing in {} writes'.format(
+                self.name, self.write_time, self.nwrites))
+
+        self.raise_error()
+
+
+class SMRFOutputSnapshot():
+    """Stand in for a SMRF instance that holds a copy of the distributed
+    output variables, so ``SMRF.output`` can run in the writer thread while
+    SMRF moves on to the next time step.
+
+    Args:
+        smrf (SMRF): SMRF instance
+    """
+
+    def __init__(self, smrf):
+        self._smrf = smrf
+        self.distribute = {}
+
+        for v in smrf.out_func.variable_list.values():
+            module = v['module'] if 'module' in v else v['info']['module']
+            if module not in self.distribute:
+                self.distribute[module] = _DistributeSnapshot()
+
+            data = getattr(smrf.distribute[module], v['variable'])
+            if data is not None:
+                data = np.copy(data)
+            setattr(self.distribute[module], v['variable'], data)
+
+    def __getattr__(self, name):
+        return getattr(self._smrf, name)
+
+
+class _DistributeSnapshot():
+    """Holds the copied variables of a SMRF distribution module"""
+    pass
@@ -0,0 +1,79 @@
+import numpy as np
+from pysnobal import ipysnobal
+
+# cost of a run time step without snow relative to one with snow, the
+# energy and mass balance are skipped
+NO_SNOW_COST = 0.1
+
+
+def pixel_cost(output_rec, time_step_info):
+    """Estimate the cost of the next time step of every pixel from the snow
+    state. iSnobal divides the data time step into medium and small run time
+    steps when a snow layer is thinner than the mass thresholds, so the
+    cost is the number of run time steps the layer masses will take. This
+    is a heuristic, the refinement iSnobal does is not measured.
+
+    Args:
+        output_rec (dict): iPysnobal output record
+        time_step_info (list): iSnobal time step info with the thresholds
+
+    Returns:
+        ndarray: cost of every pixel, zero outside of the model mask
+    """
+
+    normal = time_step_info[ipysnobal.NORMAL_TSTEP]
+    medium = time_step_info[ipysnobal.MEDIUM_TSTEP]
+    small = time_step_info[ipysnobal.SMALL_TSTEP]
+
+    layer_count = output_rec.get('layer_count', output_rec['m_s'] > 0)
+    layer_mass = output_rec['m_s']
+    if 'm_s_0' in output_rec and 'm_s_l' in output_rec:
+        layer_mass = np.where(
+            layer_count > 1,
+            np.minimum(output_rec['m_s_0'], output_rec['m_s_l']),
+            layer_mass)
+
+    steps = np.full(layer_mass.shape, float(normal['intervals']))
+    steps[layer_mass < normal['threshold']] *= medium['intervals']
+    steps[layer_mass < medium['threshold']] *= small['intervals']
+
+    cost = np.where(
+        layer_count > 0, steps, NO_SNOW_COST * normal['intervals'])
+
+    if 'mask' in output_rec:
+        cost[output_rec['mask'] == 0] = 0.0
+
+    return cost
+
+
+def cost_regions(cost, blocks=8, top=5):
+    """Regions of the grid with the highest cost
+
+    Args:
+        cost (ndarray): cost of every pixel of the grid
+        blocks (int): number of regions along each side of the grid
+        top (int): number of regions to return
+
+    Returns:
+        list: rows slice, columns slice and fraction of the total cost of
+            the costliest regions
+    """
+
+    total = np.sum(cost)
+    if total == 0:
+        return []
+
+    regions = []
+    for rows in np.array_split(np.arange(cost.shape[0]), blocks):
+        for cols in np.array_split(np.arange(cost.shape[1]), blocks):
+            if len(rows) == 0 or len(cols) == 0:
+                continue
+            rows_slice = slice(rows[0], rows[-1] + 1)
+            cols_slice = slice(cols[0], cols[-1] + 1)
+            regions.append((
+                rows_slice,
+                cols_slice,
+                float(np.sum(cost[rows_slice, cols_slice]) / total)))
+
+    regions.sort(key=lambda region: region[2], reverse=True)
+    return regions[:top]
@@ -1,14 +1,32 @@
 import os
-from copy import copy
 import logging
-from datetime import datetime
 
 import netCDF4 as nc
+import numpy as np
 import pandas as pd
-from spatialnc.proj import add_proj
+
+from awsm.models.pysnobal.output_backends import (OUTPUT_BACKENDS,
+                                                  least_significant_digits)
 
 FREEZE = 273.16
 
+# output variables converted from Kelvin to Celsius
+CELSIUS_VARIABLES = frozenset([
+    'temperature_surface',
+    'temperature_lower',
+    'temperature_snowcover'
+])
+
+# output variables that initialize the next run and their init names
+STATE_VARIABLES = {
+    'thickness': 'z_s',
+    'snow_density': 'rho',
+    'temperature_surface': 'T_s_0',
+    'temperature_snowcover': 'T_s',
+    'temperature_lower': 'T_s_l',
+    'water_saturation': 'h2o_sat',
+}
+
 
 class PysnobalIO():
 
@@ -107,90 +125,110 @@ class PysnobalIO():
             'units': 'percent',
             'description': 'Percentage of liquid water saturation of the snowcover',  # noqa
             'ipysnobal_var': 'h2o_sat'
+        },
+        'estimated_cost': {
+            'units': 'time steps',
+            'description': 'Estimate of the iSnobal run time steps computed since the last output, from the mass thresholds the snow layers are under. Pixels that did not run the model have no cost',  # noqa
+            'ipysnobal_var': 'estimated_cost'
         }
     }
 
-    def __init__(self, output_file_name, output_path, myawsm):
+    def __init__(self, output_file_name, output_path, myawsm,
+                 output_writer=None):
 
         self._logger = logging.getLogger(__name__)
 
-        self.output_file_name = output_file_name + '.nc'
+        self.awsm = myawsm
+        self.config = self.awsm.config['ipysnobal']
+        self.backend_class = OUTPUT_BACKENDS[self.config['output_backend']]
+        self.backend = None
+
+        self.output_file_name = output_file_name + \
+            self.backend_class.EXTENSION
         self.output_path = output_path
         self.output_filename = os.path.join(
             self.output_path, self.output_file_name)
 
         self.start_date = myawsm.start_date
-        self.awsm = myawsm
+
+        # an out-of-core run writes the rows of its window into the output
+        # of the full grid
+        self.window = myawsm.window
+        self.x = myawsm.topo.x
+        self.y = myawsm.topo.y
+        if self.window is not None:
+            self.y = myawsm.topo.grid_y
 
         self.output_variables = self.awsm.pysnobal_output_vars
         self.precision = self.awsm.config['awsm system']['netcdf_output_precision'][0]  # noqa
 
-        self._logger.info('PysnobalIO initialized')
+        # AsyncOutputWriter to hand the output to, None writes directly
+        self.output_writer = output_writer
 
-    def create_output_files(self):
-        """
-        Create the ipysnobal output netCDF file
-        """
+        # with float32_forcing and float output, the copies handed to the
+        # writer are stored as they will be written
+        self.snapshot_dtype = None
+        if self.awsm.config['ipysnobal']['float32_forcing'] and \
+                self.precision == 'f':
+            self.snapshot_dtype = np.float32
 
-        self._logger.info('Creating output iPysnobal file at {}'.format(
-            self.output_file_name))
+        # reused buffers for the converted temperatures when writing directly
+        self.buffers = {}
 
-        fmt = '%Y-%m-%d %H:%M:%S'
-        if os.path.isfile(self.output_filename):
-            self._logger.warning(
-                'Opening {}, data may be overwritten!'.format(
-                    self.output_filename))
-            em = nc.Dataset(self.output_filename, 'a')
-            h = '[{}] Data added or updated'.format(
-                datetime.now().strftime(fmt))
-            setattr(em, 'last_modified', h)
+        self._logger.info('PysnobalIO initialized')
 
-            if 'projection' not in em.variables.keys():
-                em = add_proj(em, None, self.awsm.topo.topoConfig['filename'])
+    @property
+    def time_attributes(self):
+        """Attributes of the time variable for a new output"""
+        return {
+            'units': 'hours since %s' % self.start_date.tz_localize(None),
+            'time_zone': str(self.awsm.tzinfo).lower(),
+            'calendar': 'standard',
+        }
 
-        else:
-            em = nc.Dataset(self.output_filename, 'w')
+    def create_output_files(self, nt=None):
+        """
+        Create the ipysnobal output with the configured output backend
 
-            dimensions = ('time', 'y', 'x')
+        Args:
+            nt (int): number of output time steps in the run. Used to size
+                the chunks and for a fixed length time dimension
+        """
 
-            # create the dimensions
-            em.createDimension('time', None)
-            em.createDimension('y', len(self.awsm.topo.y))
-            em.createDimension('x', len(self.awsm.topo.x))
+        self._logger.info('Creating output iPysnobal file at {}'.format(
+            self.output_file_name))
 
-            # create some variables
-            # TODO what is the cell references, LL or center? #41
-            em.createVariable('time', 'f', dimensions[0])
-            em.createVariable('y', 'f', dimensions[1])
-            em.createVariable('x', 'f', dimensions[2])
+        self.backend = self.backend_class(self)
+        self.backend.create(nt)
 
-            setattr(em.variables['time'], 'units',
-                    'hours since %s' % self.start_date.tz_localize(None))
-            setattr(em.variables['time'], 'time_zone',
-                    str(self.awsm.tzinfo).lower())
-            setattr(em.variables['time'], 'calendar', 'standard')
+        # map the time values already in the output to their index, a
+        # fixed length time dimension has fill values past the last output
+        times = self.backend.existing_times()
+        valid = ~np.ma.getmaskarray(times)
+        self.time_index = {
+            float(np.float32(t)): idx
+            for idx, t in enumerate(times) if valid[idx]
+        }
+        self.ntimes = int(np.max(np.nonzero(valid)[0])) + 1 \
+            if np.any(valid) else 0
 
-            em.variables['x'][:] = self.awsm.topo.x
-            em.variables['y'][:] = self.awsm.topo.y
+    def find_index(self, t):
+        """Find the index to write the time value to, either where it is in
+        the file already or the next index
 
-            for var_name in self.output_variables:
+        Args:
+            t (float): time value
 
-                em.createVariable(
-                    var_name,
-                    self.precision,
-                    dimensions[:3],
-                    chunksizes=(6, 10, 10))
-                setattr(em.variables[var_name],
-                        'units',
-                        self.OUTPUT_VARIABLES[var_name]['units'])
-                setattr(em.variables[var_name],
-                        'description',
-                        self.OUTPUT_VARIABLES[var_name]['description'])
+        Returns:
+            int: time index
+        """
 
-            # add projection info
-            em = add_proj(em, None, self.awsm.topo.topoConfig['filename'])
+        key = float(np.float32(t))
+        if key not in self.time_index:
+            self.time_index[key] = self.ntimes
+            self.ntimes += 1
 
-        self.output_file = em
+        return self.time_index[key]
 
     def output_timestep(self, smrf_data, tstep):
         """
@@ -202,39 +240,126 @@ class PysnobalIO():
 
         """
 
-        # preallocate
-        output = {}
+        # the output writer needs a copy that the model won't change
+        data = gather_output(
+            smrf_data,
+            self.output_variables,
+            None if self.output_writer is not None else self.buffers,
+            self.snapshot_dtype)
 
-        # gather all the data together
-        for key, att in self.OUTPUT_VARIABLES.items():
-            output[key] = copy(smrf_data[att['ipysnobal_var']])
-
-        # convert from K to C
-        output['temperature_snowcover'] -= FREEZE
-        output['temperature_surface'] -= FREEZE
-        output['temperature_lower'] -= FREEZE
+        if self.window is not None:
+            data = {
+                key: value[self.window.local] for key, value in data.items()
+            }
 
         # now find the correct index
-        # the current time integer
-        times = self.output_file.variables['time']
-
         # offset to match same convention as iSnobal
         tstep -= pd.to_timedelta(1, unit='h')
         t = nc.date2num(tstep.replace(tzinfo=None),
-                        times.units,
-                        times.calendar)
+                        self.backend.time_units,
+                        self.backend.time_calendar)
 
-        try:
-            index = nc.date2index(tstep, times, select='exact')
-        except Exception:
-            index = len(times)
+        index = self.find_index(t)
 
-        # insert the time
-        self.output_file.variables['time'][index] = t
+        if self.output_writer is not None:
+            self.output_writer.submit_timestep(self.backend, index, t, data)
+            return
 
-        # insert the data
-        for key in self.output_variables:
-            self.output_file.variables[key][index, :] = output[key]
+        self.backend.write_timesteps(
+            index,
+            [t],
+            {key: value[np.newaxis] for key, value in data.items()})
 
         # sync to disk
-        self.output_file.sync()
+        self.backend.sync()
+
+    def restart_state(self, output_rec):
+        """The model state as the next run would read it back from this
+        output with ``ModelInit``, so the next run can be initialized without
+        reading the output
+
+        Args:
+            output_rec (dict): iPysnobal output record of the last time step
+
+        Returns:
+            dict: init fields, None if the output does not hold the state
+                variables or they are quantized
+        """
+
+        digits = least_significant_digits(self.config)
+        for key in STATE_VARIABLES.keys():
+            if key not in self.output_variables or key in digits:
+                return None
+
+        return restart_state(output_rec, self.precision)
+
+    def close(self):
+        """Finish writing any output and close the output"""
+
+        if self.output_writer is not None:
+            self.output_writer.close()
+            self.output_writer = None
+
+        self.backend.close()
+
+
+def gather_output(output_rec, variables, buffers=None, dtype=None):
+    """Gather output variables from the iPysnobal output record, converting
+    the temperatures from K to C
+
+    Args:
+        output_rec (dict): iPysnobal output record
+        variables (list): output variable names from
+            ``PysnobalIO.OUTPUT_VARIABLES``
+        buffers (dict): reused buffers for the converted temperatures,
+            filled on first use. If None, new arrays are returned that the
+            model won't change, otherwise the other variables are the output
+            record arrays themselves
+        dtype (type): type of the new arrays when there are no buffers,
+            defaults to the type of the output record
+
+    Returns:
+        dict: output variable name and array
+    """
+
+    output = {}
+    for key in variables:
+        value = output_rec[PysnobalIO.OUTPUT_VARIABLES[key]['ipysnobal_var']]
+
+        if key in CELSIUS_VARIABLES:
+            out = None
+            if buffers is not None:
+                if key not in buffers:
+                    buffers[key] = np.empty_like(value)
+                out = buffers[key]
+            output[key] = np.subtract(value, FREEZE, out=out)
+            if buffers is None and dtype is not None:
+                output[key] = output[key].astype(dtype, copy=False)
+
+        elif buffers is None:
+            output[key] = value.astype(dtype or value.dtype)
+
+        else:
+            output[key] = value
+
+    return output
+
+
+def restart_state(output_rec, precision):
+    """Convert the model state to the init fields read from the output,
+    rounded to the output precision
+
+    Args:
+        output_rec (dict): iPysnobal output record
+        precision (str): numpy type code of the output variables
+
+    Returns:
+        dict: init fields with the temperatures in C
+    """
+
+    output = gather_output(output_rec, STATE_VARIABLES.keys())
+
+    return {
+        STATE_VARIABLES[key]: value.astype(precision).astype(np.float64)
+        for key, value in output.items()
+    }
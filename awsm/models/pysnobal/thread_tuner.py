@@ -0,0 +1,144 @@
+import logging
+import os
+
+import numpy as np
+
+
+def available_cpus():
+    """Number of CPUs the process is allowed to run on"""
+
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def thread_candidates(max_threads):
+    """Thread counts to try, the powers of two below the maximum and the
+    maximum
+
+    Args:
+        max_threads (int): maximum number of threads
+
+    Returns:
+        list: thread counts in increasing order
+    """
+
+    candidates = set([max_threads])
+    n = 1
+    while n < max_threads:
+        candidates.add(n)
+        n *= 2
+
+    return sorted(candidates)
+
+
+class ThreadTuner():
+    """Pick the number of threads for ``do_tstep_grid`` by timing the
+    time steps.
+
+    Each candidate thread count runs a few time steps in turn and the one
+    with the lowest seconds per unit of estimated compute cost is kept. The
+    cost normalizes the time steps for the snow that changes between them.
+    The candidates are timed again every ``retune_steps`` time steps or
+    when the fraction of pixels with snow changes by more than
+    ``coverage_change`` since the last tuning.
+
+    Args:
+        candidates (list): thread counts to try
+        trial_steps (int): time steps to time each candidate for
+        retune_steps (int): time steps between tunings, 0 to only tune on
+            a change in snow coverage
+        coverage_change (float): change in the fraction of pixels with snow
+            that starts a new tuning
+    """
+
+    def __init__(self, candidates, trial_steps=2, retune_steps=0,
+                 coverage_change=0.1):
+
+        self._logger = logging.getLogger(__name__)
+
+        self.candidates = sorted(set(candidates))
+        self.trial_steps = trial_steps
+        self.retune_steps = retune_steps
+        self.coverage_change = coverage_change
+
+        self.nthreads = self.candidates[-1]
+        self.coverage = None
+        self.start_tuning()
+
+    def start_tuning(self, coverage=None):
+        """Time every candidate again
+
+        Args:
+            coverage (float): fraction of pixels with snow
+        """
+
+        self.trials = {n: [] for n in self.candidates}
+        self.queue = [
+            n for n in self.candidates for _ in range(self.trial_steps)
+        ]
+        self.coverage = coverage
+        self.steps_since_tuning = 0
+
+    @property
+    def tuning(self):
+        return len(self.queue) > 0
+
+    def next_threads(self, coverage):
+        """Number of threads for the next time step
+
+        Args:
+            coverage (float): fraction of pixels with snow
+
+        Returns:
+            int: number of threads
+        """
+
+        if self.coverage is None:
+            self.coverage = coverage
+
+        if not self.tuning:
+            self.steps_since_tuning += 1
+            retune = self.retune_steps > 0 and \
+                self.steps_since_tuning >= self.retune_steps
+            if retune or \
+                    abs(coverage - self.coverage) > self.coverage_change:
+                self._logger.debug(
+                    'Tuning iPysnobal threads again, snow coverage changed '
+                    'from {:.1%} to {:.1%}'.format(self.coverage, coverage))
+                self.start_tuning(coverage)
+
+        if self.tuning:
+            self.nthreads = self.queue[0]
+
+        return self.nthreads
+
+    def record(self, seconds, cost):
+        """Record the wall time of a time step run with ``nthreads``
+
+        Args:
+            seconds (float): wall time of the time step
+            cost (float): estimated compute cost of the time step
+        """
+
+        if not self.tuning:
+            return
+
+        self.queue.pop(0)
+        self.trials[self.nthreads].append(seconds / max(cost, 1e-12))
+
+        if not self.tuning:
+            self.choose()
+
+    def choose(self):
+        """Keep the candidate with the lowest seconds per unit cost"""
+
+        rates = {n: np.median(t) for n, t in self.trials.items() if t}
+        self.nthreads = min(rates, key=rates.get)
+
+        self._logger.info(
+            'iPysnobal ithreads auto chose {} threads, seconds per unit '
+            'cost {}'.format(
+                self.nthreads,
+                ', '.join('{}: {:.3g}'.format(n, r)
+                          for n, r in sorted(rates.items()))))
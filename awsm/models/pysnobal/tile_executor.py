@@ -0,0 +1,324 @@
+import logging
+import multiprocessing
+import traceback
+
+import numpy as np
+from pysnobal.c_snobal import snobal
+
+from awsm.models.pysnobal.input_arena import InputArena
+
+
+def row_bands(mask, ntiles):
+    """Split the rows of the grid into bands with about the same number of
+    pixels in the mask
+
+    Args:
+        mask (ndarray): model mask
+        ntiles (int): number of bands
+
+    Returns:
+        list: (first row, last row + 1) of each band
+    """
+
+    # every row costs a little even when it is masked out
+    weight = np.cumsum(np.count_nonzero(mask, axis=1) + 1)
+    targets = weight[-1] * np.arange(1, ntiles) / ntiles
+    edges = np.argmin(
+        np.abs(weight[:, np.newaxis] - targets[np.newaxis, :]), axis=0) + 1
+
+    edges = [0] + [int(e) for e in edges] + [mask.shape[0]]
+    return [
+        (start, end) for start, end in zip(edges[:-1], edges[1:])
+        if end > start
+    ]
+
+
+def shared_memory():
+    """The ``SharedMemory`` class, imported when the tiles are run as
+    ``multiprocessing.shared_memory`` needs Python 3.8
+
+    Returns:
+        type: multiprocessing.shared_memory.SharedMemory
+
+    Raises:
+        ImportError: on Python before 3.8
+    """
+
+    try:
+        from multiprocessing.shared_memory import SharedMemory
+    except ImportError:
+        raise ImportError(
+            'tile_workers larger than 1 requires Python 3.8 or later for '
+            'multiprocessing.shared_memory')
+
+    return SharedMemory
+
+
+def _attach(blocks, band, attached):
+    """Row band views of the shared arrays in a worker process
+
+    Args:
+        blocks (dict): key and (shared memory name, shape) or a value that
+            is not shared
+        band (tuple): first and last row + 1
+        attached (list): keeps the shared memory handles open
+
+    Returns:
+        dict: key and row band view or value
+    """
+
+    SharedMemory = shared_memory()
+
+    views = {}
+    for key, block in blocks.items():
+        if not isinstance(block, _SharedBlock):
+            views[key] = block
+            continue
+
+        shm = SharedMemory(name=block.name)
+        attached.append(shm)
+        data = np.ndarray(block.shape, dtype=np.float64, buffer=shm.buf)
+        views[key] = data[band[0]:band[1]]
+
+    return views
+
+
+def _tile_worker(conn, spec):
+    """Worker process that runs the iSnobal time steps of a row band.
+
+    Args:
+        conn (Connection): pipe to the main process
+        spec (dict): shared arrays, band and model parameters
+    """
+
+    attached = []
+    band = spec['band']
+    state = _attach(spec['state'], band, attached)
+    inputs = [_attach(blocks, band, attached) for blocks in spec['inputs']]
+
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+
+        input1, time_step_info, first_step = msg
+        try:
+            rec = dict(state)
+            rt = snobal.do_tstep_grid(
+                inputs[input1],
+                inputs[1 - input1],
+                rec,
+                time_step_info,
+                spec['constants'],
+                spec['params'],
+                first_step=first_step,
+                nthreads=spec['nthreads'])
+
+            # keep the shared arrays if the kernel replaced any
+            for key, value in rec.items():
+                if value is not state[key] and \
+                        isinstance(state[key], np.ndarray):
+                    np.copyto(state[key], value)
+
+            conn.send(('done', rt))
+
+        except Exception:
+            conn.send(('error', traceback.format_exc()))
+
+    state = inputs = rec = None
+    for shm in attached:
+        shm.close()
+    conn.close()
+
+
+class _SharedBlock():
+    """Name and shape of a shared array, sent to the workers"""
+
+    def __init__(self, name, shape):
+        self.name = name
+        self.shape = shape
+
+
+class TileExecutor():
+    """Run the iSnobal time steps of row bands of the grid in worker
+    processes.
+
+    The model state and the double buffered forcing input live in shared
+    memory. The main process keeps reading the forcing, updating the state
+    and writing the output on the full grid arrays, and each worker runs
+    ``do_tstep_grid`` on views of its band of the same memory. Pixels are
+    independent in iSnobal, so the bands give the same result as the full
+    grid. The bands are split to have about the same number of pixels in
+    the mask.
+
+    Args:
+        output_rec (dict): iPysnobal output record, the grid arrays are
+            moved into shared memory
+        input_names (list): iSnobal input names
+        constants (dict): iSnobal constants
+        params (dict): iSnobal parameters
+        mask (ndarray): model mask to balance the bands
+        workers (int): number of worker processes
+        nthreads (int): threads for ``do_tstep_grid`` in each worker
+    """
+
+    def __init__(self, output_rec, input_names, constants, params, mask,
+                 workers, nthreads=1):
+
+        self._logger = logging.getLogger(__name__)
+        self.SharedMemory = shared_memory()
+
+        self.shape = mask.shape
+        self.shm = []
+        self.names = {}
+        self.shared = {}
+
+        self.bands = row_bands(mask, workers)
+
+        # the shared model state
+        state_blocks = {}
+        for key, value in output_rec.items():
+            if isinstance(value, np.ndarray) and value.shape == self.shape:
+                self.shared[key] = self.zeros(self.shape)
+                np.copyto(self.shared[key], value)
+                output_rec[key] = self.shared[key]
+                state_blocks[key] = self.block(self.shared[key])
+            else:
+                state_blocks[key] = value
+
+        # the shared forcing input
+        self.inputs = InputArena(self.shape, input_names, zeros=self.zeros)
+        input_blocks = [
+            {name: self.block(value) for name, value in buffer.items()}
+            for buffer in self.inputs.buffers
+        ]
+
+        ctx = multiprocessing.get_context('spawn')
+        self.workers = []
+        for band in self.bands:
+            conn, child = ctx.Pipe()
+            process = ctx.Process(
+                target=_tile_worker,
+                name='tile_{}_{}'.format(*band),
+                args=(child, {
+                    'band': band,
+                    'state': state_blocks,
+                    'inputs': input_blocks,
+                    'constants': constants,
+                    'params': params,
+                    'nthreads': nthreads,
+                }),
+                daemon=True)
+            process.start()
+            self.workers.append((process, conn))
+
+        self._logger.info(
+            'Running iSnobal in {} row bands {} with {} threads each'.format(
+                len(self.bands), self.bands, nthreads))
+
+    def zeros(self, shape):
+        """Allocate a zeroed float64 array in shared memory
+
+        Args:
+            shape (tuple): array shape
+
+        Returns:
+            ndarray: array backed by shared memory
+        """
+
+        nbytes = int(np.prod(shape)) * np.dtype(np.float64).itemsize
+        shm = self.SharedMemory(create=True, size=max(nbytes, 1))
+        self.shm.append(shm)
+
+        data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        data.fill(0.0)
+        self.names[id(data)] = shm.name
+
+        return data
+
+    def block(self, data):
+        return _SharedBlock(self.names[id(data)], data.shape)
+
+    def share_state(self, output_rec):
+        """Make sure the output record uses the shared arrays. A depth
+        update or a restart replaces the arrays, the values are copied
+        into the shared arrays.
+
+        Args:
+            output_rec (dict): iPysnobal output record
+        """
+
+        for key, value in self.shared.items():
+            if output_rec[key] is not value:
+                np.copyto(value, output_rec[key])
+                output_rec[key] = value
+
+    def do_tstep(self, input1, output_rec, time_step_info, first_step):
+        """Run the time step in all the bands
+
+        Args:
+            input1 (dict): input buffer at the start of the time step, the
+                other buffer is the end of the time step
+            output_rec (dict): iPysnobal output record
+            time_step_info (list): iSnobal time step info
+            first_step (int): flag for the first time step
+
+        Raises:
+            RuntimeError: if a worker failed
+
+        Returns:
+            int: -1 on success, otherwise the index of the first failed
+                pixel in the grid
+        """
+
+        self.share_state(output_rec)
+        index = 0 if input1 is self.inputs.buffers[0] else 1
+
+        for _, conn in self.workers:
+            conn.send((index, time_step_info, first_step))
+
+        rt = -1
+        errors = []
+        for band, (_, conn) in zip(self.bands, self.workers):
+            status, value = conn.recv()
+            if status == 'error':
+                errors.append(value)
+            elif value != -1 and rt == -1:
+                rt = band[0] * self.shape[1] + value
+
+        if errors:
+            raise RuntimeError(
+                'iSnobal tile worker failed:\n{}'.format('\n'.join(errors)))
+
+        return rt
+
+    def close(self, output_rec):
+        """Stop the workers and release the shared memory. The output record
+        gets private copies of the shared arrays.
+
+        Args:
+            output_rec (dict): iPysnobal output record
+        """
+
+        for process, conn in self.workers:
+            if process.is_alive():
+                conn.send(None)
+            process.join()
+            conn.close()
+        self.workers = []
+
+        for key, value in self.shared.items():
+            if output_rec[key] is value:
+                output_rec[key] = value.copy()
+
+        self.shared = {}
+        self.inputs = None
+
+        for shm in self.shm:
+            try:
+                shm.close()
+            except BufferError:
+                # a view is still held, the memory is freed with it
+                pass
+            shm.unlink()
+        self.shm = []
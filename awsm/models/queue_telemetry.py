@@ -0,0 +1,253 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from time import perf_counter
+
+
+class InstrumentedQueue():
+    """Wrap a SMRF date queue to measure how long the threads block on it
+    and how full it is. Everything else is passed to the wrapped queue.
+
+    Args:
+        wrapped (DateQueueThreading): SMRF date queue
+        name (str): queue name
+        telemetry (QueueTelemetry): collects the measurements
+    """
+
+    def __init__(self, wrapped, name, telemetry):
+        self.wrapped = wrapped
+        self.name = name
+        self.telemetry = telemetry
+
+    def put(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return self.wrapped.put(*args, **kwargs)
+        finally:
+            self.telemetry.record(
+                self.name, 'put', perf_counter() - start,
+                self.wrapped.qsize())
+
+    def get(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return self.wrapped.get(*args, **kwargs)
+        finally:
+            self.telemetry.record(
+                self.name, 'get', perf_counter() - start,
+                self.wrapped.qsize())
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+
+class QueueTelemetry():
+    """Queue depth, wait time and back-pressure of the threaded
+    smrf_ipysnobal.
+
+    The queues of the ``smrf_queue`` are wrapped to record the occupancy
+    after every put and get, the time the producers block in ``put`` on a
+    full queue and the time each consumer thread blocks in ``get`` waiting
+    for a time step. The threads are wrapped to measure how long they run,
+    the busy fraction is the time a thread is not blocked on a queue. A
+    summary is logged every ``interval`` seconds and written to a JSON file
+    at the end.
+
+    Args:
+        interval (float): seconds between the logged summaries, 0 to only
+            log at the end
+    """
+
+    def __init__(self, interval=300.0):
+
+        self._logger = logging.getLogger(__name__)
+
+        self.interval = interval
+        self.queues = {}
+        self.threads = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.reporter = None
+        self.start_time = perf_counter()
+
+    def instrument(self, smrf_queue):
+        """Wrap the queues of the SMRF queue dictionary in place
+
+        Args:
+            smrf_queue (dict): SMRF queues keyed by variable
+        """
+
+        for name, wrapped in smrf_queue.items():
+            if isinstance(wrapped, InstrumentedQueue):
+                continue
+
+            smrf_queue[name] = InstrumentedQueue(wrapped, name, self)
+            self.queues[name] = {
+                'max_size': getattr(wrapped, 'maxsize', None),
+                'puts': 0,
+                'gets': 0,
+                'producer_wait': 0.0,
+                'consumer_wait': defaultdict(float),
+                'occupancy_sum': 0,
+                'max_occupancy': 0,
+            }
+
+    def track(self, thread):
+        """Measure how long a thread that is not started yet runs
+
+        Args:
+            thread (threading.Thread): thread to track
+        """
+
+        run = thread.run
+
+        def tracked_run():
+            stats = self.thread_stats(thread.name)
+            stats['start'] = perf_counter()
+            try:
+                run()
+            finally:
+                stats['end'] = perf_counter()
+
+        thread.run = tracked_run
+
+    def thread_stats(self, name):
+        with self._lock:
+            if name not in self.threads:
+                self.threads[name] = {
+                    'start': None, 'end': None, 'queue_wait': 0.0
+                }
+            return self.threads[name]
+
+    def record(self, name, operation, seconds, occupancy):
+        """Record a put or get on a queue
+
+        Args:
+            name (str): queue name
+            operation (str): put or get
+            seconds (float): time the call blocked
+            occupancy (int): items in the queue after the call
+        """
+
+        thread = threading.current_thread().name
+        stats = self.queues[name]
+        thread_stats = self.thread_stats(thread)
+
+        with self._lock:
+            if operation == 'put':
+                stats['puts'] += 1
+                stats['producer_wait'] += seconds
+            else:
+                stats['gets'] += 1
+                stats['consumer_wait'][thread] += seconds
+
+            stats['occupancy_sum'] += occupancy
+            stats['max_occupancy'] = max(stats['max_occupancy'], occupancy)
+            thread_stats['queue_wait'] += seconds
+
+    def start(self):
+        """Start logging the summary every interval"""
+
+        self.start_time = perf_counter()
+        if self.interval > 0:
+            self.reporter = threading.Thread(
+                target=self.report,
+                name='queue_telemetry',
+                daemon=True)
+            self.reporter.start()
+
+    def report(self):
+        while not self._stop.wait(self.interval):
+            self.log_summary()
+
+    def summary(self):
+        """Queue and thread statistics up to now
+
+        Returns:
+            dict: elapsed seconds, statistics of every queue and thread
+        """
+
+        now = perf_counter()
+        with self._lock:
+            queues = {}
+            for name, stats in self.queues.items():
+                calls = stats['puts'] + stats['gets']
+                queues[name] = {
+                    'max_size': stats['max_size'],
+                    'puts': stats['puts'],
+                    'gets': stats['gets'],
+                    'mean_occupancy':
+                        stats['occupancy_sum'] / calls if calls else 0.0,
+                    'max_occupancy': stats['max_occupancy'],
+                    'producer_wait': stats['producer_wait'],
+                    'consumer_wait': dict(stats['consumer_wait']),
+                }
+
+            threads = {}
+            for name, stats in self.threads.items():
+                if stats['start'] is None:
+                    continue
+                end = now if stats['end'] is None else stats['end']
+                alive = end - stats['start']
+                threads[name] = {
+                    'alive': alive,
+                    'queue_wait': stats['queue_wait'],
+                    'busy': 1 - stats['queue_wait'] / alive
+                    if alive > 0 else 0.0,
+                }
+
+        return {
+            'elapsed': now - self.start_time,
+            'queues': queues,
+            'threads': threads,
+        }
+
+    def log_summary(self):
+        """Log the queue occupancy and wait times and the thread busy
+        fractions
+        """
+
+        summary = self.summary()
+        self._logger.info(
+            'Queue telemetry after {:.1f} seconds'.format(summary['elapsed']))
+
+        for name, stats in sorted(summary['queues'].items()):
+            self._logger.info(
+                'Queue {}: occupancy mean {:.2f} max {} of {}, producer '
+                'waited {:.2f} s, consumers waited {:.2f} s{}'.format(
+                    name,
+                    stats['mean_occupancy'],
+                    stats['max_occupancy'],
+                    stats['max_size'],
+                    stats['producer_wait'],
+                    sum(stats['consumer_wait'].values()),
+                    '' if not stats['consumer_wait'] else ' ({})'.format(
+                        ', '.join(
+                            '{} {:.2f}'.format(thread, seconds)
+                            for thread, seconds in sorted(
+                                stats['consumer_wait'].items())))))
+
+        self._logger.info('Thread busy fraction: {}'.format(', '.join(
+            '{} {:.1%}'.format(name, stats['busy'])
+            for name, stats in sorted(summary['threads'].items()))))
+
+    def stop(self, path=None):
+        """Stop the periodic summary, log the final summary and write it to
+        a JSON file
+
+        Args:
+            path (str): JSON file for the summary
+        """
+
+        self._stop.set()
+        if self.reporter is not None:
+            self.reporter.join()
+            self.reporter = None
+
+        self.log_summary()
+
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(self.summary(), f, indent=2)
+            self._logger.info('Wrote queue telemetry to {}'.format(path))
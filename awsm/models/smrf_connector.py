@@ -1,13 +1,38 @@
 import copy
+import functools
 import os
 import logging
-import pytz
+import threading
 from types import MappingProxyType
 
 import numpy as np
 import netCDF4 as nc
+import pandas as pd
 from smrf.framework.model_framework import run_smrf
 
+# serialize netCDF access from the AWSM threads, the netCDF library is not
+# thread safe
+NETCDF_LOCK = threading.RLock()
+
+
+@functools.lru_cache(maxsize=4)
+def phase_fill(shape, dtype=np.float64):
+    """Read only zeros shared as the precipitation phase forcing of time
+    steps without precipitation, iSnobal only uses the phase where there is
+    precipitation
+
+    Args:
+        shape (tuple): shape of the forcing images
+        dtype (type): type of the forcing images
+
+    Returns:
+        ndarray: read only array of zeros
+    """
+
+    fill = np.zeros(shape, dtype=dtype)
+    fill.setflags(write=False)
+    return fill
+
 
 class SMRFConnector():
 
@@ -25,12 +50,24 @@ class SMRFConnector():
         'precip_temp': 'T_pp'
     })
 
+    # forcing that only matters where there is precipitation
+    PRECIP_PHASE = ('percent_snow', 'snow_density', 'precip_temp')
+
     def __init__(self, myawsm):
 
         self._logger = logging.getLogger(__name__)
         self.myawsm = myawsm
         self.force = None
 
+        # the forcing is converted to float64 when it is loaded into the
+        # model input, float32_forcing keeps float32 until then
+        self.forcing_dtype = np.float64
+        if self.myawsm.config['ipysnobal']['float32_forcing']:
+            self.forcing_dtype = np.float32
+
+        # rows of the grid to read, a window for out-of-core runs
+        self.rows = slice(None)
+
         self.create_smrf_config()
 
         self._logger.info('SMRFConnector initialized')
@@ -77,21 +114,111 @@ class SMRFConnector():
         - The others z_s, rho, T_s_0, T_s, h2o_sat, mask can be specified
         but will be set to default of 0's or 1's for mask
         - Open the files for the inputs and store the file identifier
+        - Build a descriptor for each file so a time step can be found
+          without searching the time axis
 
         """
 
         self.force = {}
+        self.force_info = {}
+        if self.myawsm.window is not None:
+            self.rows = self.myawsm.window.rows
+        else:
+            self.rows = slice(None)
+
         for variable in self.MAP_INPUTS.keys():
             try:
                 self.force[variable] = nc.Dataset(
                     os.path.join(self.output_path, '{}.nc'.format(variable)),
                     'r')
                 self.force[variable].set_always_mask(False)
+                self.force_info[variable] = self.forcing_descriptor(
+                    self.force[variable])
 
             except FileNotFoundError:
                 self.force['soil_temp'] = float(self.myawsm.soil_temp) * \
                     np.ones_like(self.myawsm.topo.dem)
 
+    @staticmethod
+    def forcing_descriptor(dataset):
+        """Resolve everything needed to read a time step from a SMRF
+        forcing file once, instead of on every time step.
+
+        Args:
+            dataset (netCDF4.Dataset): open SMRF output file
+
+        Returns:
+            dict: with the data ``variable`` handle, the time ``calendar``
+                and ``time_index`` mapping naive time stamps to indices
+        """
+
+        # compare the dimensions and variables to get the variable name
+        v = list(set(dataset.variables.keys()) -
+                 set(dataset.dimensions.keys()))
+        v = [fv for fv in v if fv != 'projection'][0]
+
+        times = dataset.variables['time']
+        calendar = getattr(times, 'calendar', 'standard')
+        dates = nc.num2date(
+            times[:],
+            times.units,
+            calendar=calendar,
+            only_use_cftime_datetimes=False)
+
+        # round to the second to protect against float time values
+        dates = pd.DatetimeIndex(dates).round('s')
+
+        return {
+            'name': v,
+            'variable': dataset.variables[v],
+            'calendar': calendar,
+            'time_index': {date: idx for idx, date in enumerate(dates)}
+        }
+
+    def forcing_index(self, variable, tstep):
+        """Find the index of the time step in a forcing file
+
+        Args:
+            variable (str): SMRF variable name
+            tstep (datetime): time step
+
+        Raises:
+            ValueError: if the time step is not in the forcing file
+
+        Returns:
+            int: index of the time step
+        """
+
+        return self.time_index(self.force_info[variable], variable, tstep)
+
+    @staticmethod
+    def time_index(descriptor, variable, tstep):
+        """Look up a time step in a forcing file descriptor from
+        :meth:`forcing_descriptor`
+
+        Args:
+            descriptor (dict): forcing file descriptor
+            variable (str): SMRF variable name, used for the error message
+            tstep (datetime): time step
+
+        Raises:
+            ValueError: if the time step is not in the forcing file
+
+        Returns:
+            int: index of the time step
+        """
+
+        # the forcing files are referenced in the time zone the time step
+        # is in, so only strip the time zone information
+        tstep_zone = pd.Timestamp(tstep).tz_localize(None)
+
+        try:
+            return descriptor['time_index'][tstep_zone]
+        except KeyError:
+            raise ValueError(
+                'Time step {} not found in {}.nc forcing file'.format(
+                    tstep_zone, variable))
+
     def close_netcdf_files(self):
         """
         Close input netCDF forcing files
@@ -101,7 +228,7 @@ class SMRFConnector():
             if not isinstance(self.force[f], np.ndarray):
                 self.force[f].close()
 
-    def get_timestep_netcdf(self, tstep):
+    def get_timestep_netcdf(self, tstep, variables=None):
         """
         Pull out a time step from the forcing files and
         place that time step into a dict
@@ -109,6 +236,7 @@ class SMRFConnector():
         Args:
             force:   input array of forcing variables
             tstep:   datetime time step
+            variables: SMRF variables to read, defaults to all
 
         Returns:
             inpt:    dictionary of forcing variable images
@@ -116,39 +244,37 @@ class SMRFConnector():
 
         inpt = {}
 
-        for f in self.force.keys():
+        # read the precipitation first, the phase is not read without it
+        variables = sorted(
+            [f for f in self.force.keys()
+             if variables is None or f in variables],
+            key=lambda f: f != 'precip')
+        no_precip = False
+
+        for f in variables:
 
-            if isinstance(self.force[f], np.ndarray):
+            if no_precip and f in self.PRECIP_PHASE:
+                inpt[self.MAP_INPUTS[f]] = phase_fill(
+                    inpt['m_pp'].shape, self.forcing_dtype)
+
+            elif isinstance(self.force[f], np.ndarray):
                 # If it's a constant value then just read in the numpy array
                 # pull out the value
                 # ensures not a reference (especially if T_g)
-                inpt[self.MAP_INPUTS[f]] = self.force[f].copy()
+                inpt[self.MAP_INPUTS[f]] = self.force[f].astype(
+                    self.forcing_dtype)
 
             else:
-                # determine the index in the netCDF file
-
-                # compare the dimensions and variables to get the variable name
-                v = list(set(self.force[f].variables.keys()) -
-                         set(self.force[f].dimensions.keys()))
-                v = [fv for fv in v if fv != 'projection'][0]
-
-                # make sure you're in the same timezone
-                if hasattr(self.force[f].variables['time'], 'time_zone'):
-                    tstep_zone = tstep.astimezone(pytz.timezone(
-                        self.force[f].variables['time'].time_zone))
-                    tstep_zone = tstep.tz_localize(None)
-                else:
-                    tstep_zone = tstep.tz_localize(None)
-
-                # find the index based on the time step
-                t = nc.date2index(
-                    tstep_zone,
-                    self.force[f].variables['time'],
-                    calendar=self.force[f].variables['time'].calendar,
-                    select='exact')
+                info = self.force_info[f]
+                t = self.forcing_index(f, tstep)
 
                 # pull out the value
-                inpt[self.MAP_INPUTS[f]] = \
-                    self.force[f].variables[v][t, :].astype(np.float64)
+                with NETCDF_LOCK:
+                    inpt[self.MAP_INPUTS[f]] = \
+                        info['variable'][t, self.rows].astype(
+                            self.forcing_dtype)
+
+            if f == 'precip':
+                no_precip = not np.any(inpt['m_pp'])
 
         return inpt
@@ -0,0 +1,388 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import traceback
+from time import perf_counter
+
+import numpy as np
+import smrf.framework.logger as smrf_logger
+from smrf.framework.model_framework import SMRF
+from smrf.utils import queue as smrf_queue
+
+from awsm.models.smrf_connector import SMRFConnector
+
+# seconds to wait on the ring before checking if the other side stopped
+POLL_TIMEOUT = 1
+
+
+def shared_memory():
+    """The ``SharedMemory`` class, imported when the SMRF process is run as
+    ``multiprocessing.shared_memory`` needs Python 3.8
+
+    Returns:
+        type: multiprocessing.shared_memory.SharedMemory
+
+    Raises:
+        ImportError: on Python before 3.8
+    """
+
+    try:
+        from multiprocessing.shared_memory import SharedMemory
+    except ImportError:
+        raise ImportError(
+            'smrf_process requires Python 3.8 or later for '
+            'multiprocessing.shared_memory')
+
+    return SharedMemory
+
+
+class _RingWriter():
+    """Producer side of the forcing ring in the SMRF process. Each time
+    step waits for a free slot, which holds SMRF back when the model falls
+    behind, and copies the forcing into the slot.
+
+    Args:
+        spec (dict): shared memory name, shape and input names of the ring
+        free (Semaphore): number of free slots
+        messages (Queue): filled slots and errors sent to the model
+        stop (Event): set by the model to stop SMRF
+    """
+
+    def __init__(self, spec, free, messages, stop):
+
+        self.shm = shared_memory()(name=spec['name'])
+        self.ring = np.ndarray(
+            spec['shape'], dtype=spec['dtype'], buffer=self.shm.buf)
+        self.names = spec['names']
+        self.free = free
+        self.messages = messages
+        self.stop = stop
+        self.wait_time = 0.0
+
+    def put(self, step_index, data):
+        """Copy the forcing of a time step into the next slot
+
+        Args:
+            step_index (int): index of the time step
+            data (dict): forcing images or scalars keyed by the iSnobal
+                input names, None where SMRF has no data
+
+        Returns:
+            bool: False if the model stopped the run
+        """
+
+        start = perf_counter()
+        while not self.free.acquire(timeout=POLL_TIMEOUT):
+            if self.stop.is_set():
+                return False
+        self.wait_time += perf_counter() - start
+
+        slot = step_index % self.ring.shape[0]
+        for index, name in enumerate(self.names):
+            value = data.get(name)
+            np.copyto(self.ring[slot, index], 0.0 if value is None else value)
+
+        self.messages.put(('step', step_index, slot))
+        return True
+
+    def close(self):
+        self.ring = None
+        self.shm.close()
+
+
+def _run_serial(smrf, writer, variable_list, date_time):
+    """Distribute the time steps one at a time and write the forcing
+    into the ring
+    """
+
+    smrf.initialize_distribution()
+
+    for step_index, time_step in enumerate(date_time):
+        smrf.distribute_single_timestep(time_step)
+        smrf.output(time_step)
+
+        data = {
+            SMRFConnector.MAP_INPUTS[var]: getattr(
+                smrf.distribute[v['info']['module']], v['variable'])
+            for var, v in variable_list.items()
+        }
+        if not writer.put(step_index, data):
+            return
+
+
+def _run_threaded(smrf, writer, variable_list, date_time, soil_temp):
+    """Run the SMRF distribution threads with a ring thread that takes the
+    place of the iPysnobal thread of the threaded smrf_ipysnobal
+    """
+
+    smrf.create_data_queue()
+    smrf.set_queue_variables()
+    smrf.create_distributed_threads()
+
+    smrf.threads.append(
+        smrf_queue.QueueOutput(
+            smrf.smrf_queue,
+            date_time,
+            smrf.out_func,
+            smrf.config['output']['frequency'],
+            smrf.topo.nx,
+            smrf.topo.ny))
+
+    # the cleaner waits on the ring thread to be done with a time step
+    smrf.smrf_queue['ipysnobal'] = smrf_queue.DateQueueThreading(
+        smrf.queue_max_values,
+        smrf.time_out,
+        name='ipysnobal')
+
+    errors = []
+
+    def ring_thread():
+        try:
+            for step_index, time_step in enumerate(date_time):
+                data = {}
+                for var, v in variable_list.items():
+                    if v['variable'] == 'soil_temp':
+                        value = float(soil_temp)
+                    else:
+                        value = smrf.smrf_queue[v['variable']].get(time_step)
+                    data[SMRFConnector.MAP_INPUTS[var]] = value
+
+                if not writer.put(step_index, data):
+                    return
+                smrf.smrf_queue['ipysnobal'].put([time_step, True])
+
+        except Exception:
+            errors.append(traceback.format_exc())
+
+    smrf.threads.append(
+        threading.Thread(target=ring_thread, name='forcing_ring'))
+    smrf.threads.append(
+        smrf_queue.QueueCleaner(smrf.date_time, smrf.smrf_queue))
+
+    for thread in smrf.threads:
+        thread.start()
+    for thread in smrf.threads:
+        thread.join()
+
+    if errors:
+        raise RuntimeError(errors[0])
+
+
+def _smrf_producer(spec, free, messages, stop):
+    """SMRF process target, distributes the forcing into the ring. Any
+    error is sent to the model.
+
+    Args:
+        spec (dict): SMRF config, time steps and ring description
+        free (Semaphore): number of free slots
+        messages (Queue): filled slots and errors sent to the model
+        stop (Event): set by the model to stop SMRF
+    """
+
+    smrf_logger.SMRFLogger(spec['log_config'])
+    logger = logging.getLogger(__name__)
+    writer = _RingWriter(spec['ring'], free, messages, stop)
+
+    try:
+        with SMRF(spec['smrf_config'], logger) as smrf:
+            smrf.loadTopo()
+            smrf.create_distribution()
+            smrf.initializeOutput()
+            smrf.loadData()
+
+            variable_list = smrf.create_output_variable_dict(
+                spec['variables'], '.')
+            if smrf.threading:
+                _run_threaded(smrf, writer, variable_list,
+                              spec['date_time'], spec['soil_temp'])
+            else:
+                _run_serial(smrf, writer, variable_list, spec['date_time'])
+
+        messages.put(('done', writer.wait_time))
+
+    except Exception:
+        messages.put(('error', traceback.format_exc()))
+
+    finally:
+        writer.close()
+
+
+class SMRFProcess():
+    """Run SMRF in a separate process from iPysnobal, so the Python work of
+    SMRF and the model does not contend for the same GIL.
+
+    The SMRF process distributes the forcing of each time step into a ring
+    of slots in shared memory and sends the slot to the model. The model
+    copies the forcing out of the slot into its input buffers and frees the
+    slot. SMRF waits for a free slot when it is ``slots`` time steps ahead
+    of the model. A float64 ring copies the forcing without changes, so the
+    model gets the same input as the threaded smrf_ipysnobal.
+
+    Args:
+        smrf_config (UserConfig): SMRF config
+        date_time (list): time steps of the run
+        shape (tuple): shape (y, x) of the forcing images
+        variables (frozenset): SMRF forcing variables
+        soil_temp (float): soil temperature for threaded SMRF
+        log_config (dict): AWSM logging config for the SMRF process
+        slots (int): number of time steps in the ring
+        dtype (type): type of the forcing in the ring, float32 halves the
+            ring but rounds the forcing
+    """
+
+    def __init__(self, smrf_config, date_time, shape, variables, soil_temp,
+                 log_config, slots=4, dtype=np.float64):
+
+        self._logger = logging.getLogger(__name__)
+
+        self.date_time = list(date_time)
+        self.names = [SMRFConnector.MAP_INPUTS[v] for v in sorted(variables)]
+        self.slots = slots
+
+        ring_shape = (slots, len(self.names)) + tuple(shape)
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(ring_shape)) * dtype.itemsize
+        self.shm = shared_memory()(create=True, size=max(nbytes, 1))
+        self.ring = np.ndarray(ring_shape, dtype=dtype, buffer=self.shm.buf)
+
+        ctx = multiprocessing.get_context('spawn')
+        self.free = ctx.Semaphore(slots)
+        self.messages = ctx.Queue()
+        self._stop = ctx.Event()
+
+        self.process = ctx.Process(
+            target=_smrf_producer,
+            name='smrf',
+            args=({
+                'smrf_config': smrf_config,
+                'date_time': self.date_time,
+                'variables': variables,
+                'soil_temp': soil_temp,
+                'log_config': log_config,
+                'ring': {
+                    'name': self.shm.name,
+                    'shape': ring_shape,
+                    'dtype': dtype.str,
+                    'names': self.names,
+                },
+            }, self.free, self.messages, self._stop),
+            daemon=True)
+
+        self.wait_time = 0.0
+        self.smrf_wait_time = None
+        self.nsteps = 0
+
+    def start(self):
+        """Start the SMRF process"""
+
+        self.process.start()
+        self._logger.info(
+            'Running SMRF in process {} with a ring of {} time steps'.format(
+                self.process.pid, self.slots))
+
+    def message(self, tstep=None):
+        """Next message from the SMRF process
+
+        Args:
+            tstep (datetime): time step waited on, for the error message
+
+        Raises:
+            RuntimeError: if the SMRF process failed or stopped
+
+        Returns:
+            tuple: message
+        """
+
+        while True:
+            try:
+                msg = self.messages.get(timeout=POLL_TIMEOUT)
+                break
+            except queue.Empty:
+                if not self.process.is_alive():
+                    # the last message may still be in the pipe
+                    try:
+                        msg = self.messages.get(timeout=POLL_TIMEOUT)
+                        break
+                    except queue.Empty:
+                        raise RuntimeError(
+                            'SMRF process stopped before {}'.format(tstep))
+
+        if msg[0] == 'error':
+            raise RuntimeError('SMRF process failed:\n{}'.format(msg[1]))
+
+        return msg
+
+    def get(self, tstep):
+        """Get the forcing for the time step, waiting on SMRF if it has not
+        gotten there yet. The forcing is valid until :meth:`release`.
+
+        Args:
+            tstep (datetime): time step
+
+        Raises:
+            ValueError: if the time steps are not requested in order
+
+        Returns:
+            dict: forcing images keyed by the iSnobal input names
+        """
+
+        start = perf_counter()
+        msg = self.message(tstep)
+        self.wait_time += perf_counter() - start
+        self.nsteps += 1
+
+        _, step_index, slot = msg
+        if self.date_time[step_index] != tstep:
+            raise ValueError(
+                'SMRF process expected time step {} but got {}'.format(
+                    tstep, self.date_time[step_index]))
+
+        return {
+            name: self.ring[slot, index]
+            for index, name in enumerate(self.names)
+        }
+
+    def release(self):
+        """Free the slot of the oldest time step for SMRF"""
+
+        self.free.release()
+
+    def stop(self, wait=True):
+        """Stop the SMRF process and release the ring
+
+        Args:
+            wait (bool): wait for SMRF to finish its output, otherwise it is
+                stopped
+        """
+
+        try:
+            if wait:
+                msg = self.message()
+                if msg[0] == 'done':
+                    self.smrf_wait_time = msg[1]
+                self.process.join()
+
+        finally:
+            if self.process.is_alive():
+                self._stop.set()
+                self.process.join(timeout=10 * POLL_TIMEOUT)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+
+            self.messages.close()
+            self.ring = None
+            self.shm.close()
+            self.shm.unlink()
+
+        if self.nsteps > 0:
+            self._logger.info(
+                'iPysnobal waited {:.2f} seconds on SMRF over {} time steps '
+                '({:.3f} seconds per step){}'.format(
+                    self.wait_time,
+                    self.nsteps,
+                    self.wait_time / self.nsteps,
+                    '' if self.smrf_wait_time is None else
+                    ', SMRF waited {:.2f} seconds for free slots'.format(
+                        self.smrf_wait_time)))
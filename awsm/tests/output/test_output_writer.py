@@ -0,0 +1,96 @@
+import unittest
+
+import netCDF4 as nc
+import numpy as np
+
+from awsm.models.pysnobal.output_writer import AsyncOutputWriter
+
+
+class DatasetTarget():
+    """Minimal output backend around a netCDF dataset"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def write_timesteps(self, first, times, data):
+        last = first + len(times)
+        self.dataset.variables['time'][first:last] = times
+        for key, value in data.items():
+            self.dataset.variables[key][first:last, :] = value
+
+    def sync(self):
+        self.dataset.sync()
+
+
+class TestAsyncOutputWriter(unittest.TestCase):
+    """
+    Testing the background output writer against an in memory netCDF
+    """
+
+    def setUp(self):
+        self.ds = nc.Dataset('writer.nc', 'w', diskless=True)
+        self.ds.createDimension('time', None)
+        self.ds.createDimension('y', 3)
+        self.ds.createDimension('x', 4)
+        self.ds.createVariable('time', 'f', ('time',))
+        self.ds.createVariable('thickness', 'f', ('time', 'y', 'x'))
+        self.target = DatasetTarget(self.ds)
+
+    def tearDown(self):
+        self.ds.close()
+
+    def write_steps(self, writer, indices):
+        for idx in indices:
+            writer.submit_timestep(
+                self.target,
+                idx,
+                float(idx),
+                {'thickness': np.full((3, 4), idx, dtype=np.float32)})
+        writer.close()
+
+    def assert_written(self, indices):
+        np.testing.assert_array_equal(
+            self.ds.variables['time'][:], np.arange(len(indices)))
+        for idx in indices:
+            np.testing.assert_array_equal(
+                self.ds.variables['thickness'][idx, :], idx)
+
+    def test_single_writes(self):
+        writer = AsyncOutputWriter(batch_size=1)
+        self.write_steps(writer, range(5))
+
+        self.assertEqual(writer.nwrites, 5)
+        self.assert_written(range(5))
+
+    def test_batched_writes(self):
+        writer = AsyncOutputWriter(batch_size=2, sync_interval=0)
+        self.write_steps(writer, range(5))
+
+        self.assertEqual(writer.nwrites, 3)
+        self.assert_written(range(5))
+
+    def test_non_contiguous(self):
+        writer = AsyncOutputWriter(batch_size=4)
+        self.write_steps(writer, [0, 1, 3, 2])
+
+        self.assertEqual(writer.nwrites, 3)
+        self.assert_written(range(4))
+
+    def test_calls_in_order(self):
+        calls = []
+        writer = AsyncOutputWriter(batch_size=2)
+        writer.submit_call(calls.append, 1)
+        writer.submit_call(calls.append, 2)
+        writer.close()
+
+        self.assertEqual(calls, [1, 2])
+
+    def test_error(self):
+        def fail():
+            raise ValueError('failed')
+
+        writer = AsyncOutputWriter()
+        writer.submit_call(fail)
+
+        with self.assertRaises(RuntimeError):
+            writer.close()
@@ -0,0 +1,57 @@
+import unittest
+
+import netCDF4 as nc
+import numpy as np
+
+from awsm.models.pysnobal.pysnobal_io import (FREEZE, STATE_VARIABLES,
+                                              PysnobalIO, restart_state)
+
+
+class TestRestartState(unittest.TestCase):
+    """
+    Testing the in memory state matches reading it back from the output
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.output_rec = {
+            att['ipysnobal_var']: rng.uniform(0, 1, (3, 4))
+            for att in PysnobalIO.OUTPUT_VARIABLES.values()
+        }
+        for key in ('T_s_0', 'T_s_l', 'T_s'):
+            self.output_rec[key] += FREEZE - 5
+
+    def read_back(self, precision):
+        """Write the state variables to netCDF and read them back"""
+
+        ds = nc.Dataset('state.nc', 'w', diskless=True)
+        ds.createDimension('y', 3)
+        ds.createDimension('x', 4)
+
+        state = {}
+        for key, init_key in STATE_VARIABLES.items():
+            value = self.output_rec[
+                PysnobalIO.OUTPUT_VARIABLES[key]['ipysnobal_var']]
+            if init_key.startswith('T_s'):
+                value = value - FREEZE
+            ds.createVariable(key, precision, ('y', 'x'))
+            ds.variables[key][:] = value
+            state[init_key] = ds.variables[key][:].astype(np.float64)
+
+        ds.close()
+        return state
+
+    def test_float(self):
+        state = restart_state(self.output_rec, 'f')
+        expected = self.read_back('f')
+
+        self.assertEqual(sorted(state.keys()), sorted(expected.keys()))
+        for key, value in expected.items():
+            np.testing.assert_array_equal(state[key], value)
+
+    def test_double(self):
+        state = restart_state(self.output_rec, 'd')
+        expected = self.read_back('d')
+
+        for key, value in expected.items():
+            np.testing.assert_array_equal(state[key], value)
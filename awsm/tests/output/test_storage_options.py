@@ -0,0 +1,52 @@
+import unittest
+
+from awsm.models.pysnobal.output_backends import (
+    auto_chunksizes, least_significant_digits, netcdf_storage_options)
+
+
+class TestStorageOptions(unittest.TestCase):
+    """
+    Testing the output chunking and compression options
+    """
+
+    CONFIG = {
+        'output_chunks': ['auto'],
+        'output_zlib': True,
+        'output_complevel': 4,
+        'output_shuffle': True,
+        'output_least_significant_digit': ['thickness:3', 'snow_density: 1'],
+    }
+
+    def test_auto_chunks_small_grid(self):
+        self.assertEqual(auto_chunksizes(10, 20, nt=6), (6, 10, 20))
+
+    def test_auto_chunks_large_grid(self):
+        chunks = auto_chunksizes(1000, 1000, nt=8760, output_frequency=1)
+
+        self.assertEqual(chunks[0], 24)
+        self.assertLessEqual(chunks[0] * chunks[1] * chunks[2] * 4, 2**20)
+        self.assertGreater(chunks[1], 10)
+
+    def test_auto_chunks_frequency(self):
+        chunks = auto_chunksizes(1000, 1000, output_frequency=24)
+        self.assertEqual(chunks[0], 1)
+
+    def test_fixed_chunks(self):
+        config = dict(self.CONFIG)
+        config['output_chunks'] = ['6', '100', '100']
+
+        options = netcdf_storage_options(config, 50, 200)
+        self.assertEqual(options['chunksizes'], (6, 50, 100))
+        self.assertTrue(options['zlib'])
+
+    def test_bad_chunks(self):
+        config = dict(self.CONFIG)
+        config['output_chunks'] = ['6', '100']
+
+        with self.assertRaises(ValueError):
+            netcdf_storage_options(config, 50, 200)
+
+    def test_least_significant_digits(self):
+        self.assertEqual(
+            least_significant_digits(self.CONFIG),
+            {'thickness': 3, 'snow_density': 1})
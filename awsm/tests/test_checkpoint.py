@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from awsm.models.pysnobal.checkpoint import Checkpoints
+
+
+class TestCheckpoints(unittest.TestCase):
+    """
+    Testing the full state checkpoint files
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.checkpoints = Checkpoints(self.path, 1, keep=2)
+
+        rng = np.random.RandomState(0)
+        self.output_rec = {
+            'z_s': rng.uniform(0, 1, (3, 4)),
+            'T_s_0': rng.uniform(250, 273, (3, 4)),
+            'time_since_out': np.full((3, 4), 7200.0),
+        }
+        self.input1 = {
+            'T_a': rng.uniform(250, 273, (3, 4)),
+            'time_step': None,
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def save(self, time_step, step_index=3):
+        state = Checkpoints.state(
+            step_index, time_step, self.output_rec, self.input1, 1)
+        self.checkpoints.save(state)
+        return self.checkpoints.file_name(time_step)
+
+    def test_round_trip(self):
+        time_step = pd.Timestamp('2019-10-01 18:00', tz='MST')
+        checkpoint = Checkpoints.read(self.save(time_step))
+
+        self.assertEqual(checkpoint['step_index'], 3)
+        self.assertEqual(checkpoint['time'], time_step)
+        self.assertEqual(checkpoint['update_position'], 1)
+        self.assertNotIn('time_step', checkpoint['input'])
+
+        for key, value in self.output_rec.items():
+            np.testing.assert_array_equal(checkpoint['output_rec'][key], value)
+        np.testing.assert_array_equal(
+            checkpoint['input']['T_a'], self.input1['T_a'])
+
+    def test_keep(self):
+        times = pd.date_range('2019-10-01 15:00', periods=4, freq='H')
+        for time_step in times:
+            self.save(time_step)
+
+        files = sorted(os.listdir(self.path))
+        self.assertEqual(files, [
+            'checkpoint_20191001_1700.npz',
+            'checkpoint_20191001_1800.npz'
+        ])
+
+    def test_checkpoint_step(self):
+        checkpoints = Checkpoints(self.path, 6)
+
+        self.assertFalse(checkpoints.is_checkpoint_step(0, 3600))
+        self.assertFalse(checkpoints.is_checkpoint_step(3, 3600))
+        self.assertTrue(checkpoints.is_checkpoint_step(6, 3600))
+        self.assertTrue(checkpoints.is_checkpoint_step(24, 900))
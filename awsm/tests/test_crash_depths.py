@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+
+from awsm.models.pysnobal import ModelInit
+
+
+class TestZeroCrashDepths(unittest.TestCase):
+    """
+    Testing removing shallow snow for crash restarts and retries
+    """
+
+    def test_zero_crash_depths(self):
+        z_s = np.array([[0.0, 0.01], [0.05, 1.0]])
+        ones = np.ones_like(z_s)
+
+        restart_var = ModelInit.zero_crash_depths(
+            0.05, z_s, 300 * ones, -2 * ones, -3 * ones, -4 * ones, 0.5 * ones)
+
+        shallow = np.array([[True, True], [False, False]])
+
+        np.testing.assert_array_equal(
+            restart_var['z_s'], np.where(shallow, 0, z_s))
+        np.testing.assert_array_equal(
+            restart_var['rho'], np.where(shallow, 0, 300))
+        np.testing.assert_array_equal(
+            restart_var['T_s_0'], np.where(shallow, -75, -2))
+        np.testing.assert_array_equal(
+            restart_var['T_s_l'], np.where(shallow, -75, -3))
+        np.testing.assert_array_equal(
+            restart_var['T_s'], np.where(shallow, -75, -4))
+        np.testing.assert_array_equal(
+            restart_var['h2o_sat'], np.where(shallow, 0, 0.5))
+
+        # the inputs are not changed
+        self.assertEqual(z_s[0, 1], 0.01)
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from awsm.framework.framework import DailyOps
+
+
+class TestDailyOps(unittest.TestCase):
+    """
+    Testing the config of each day of a daily run
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+        cfg = {
+            'time': {
+                'start_date': pd.to_datetime('2019-10-01 15:00'),
+                'end_date': pd.to_datetime('2019-10-02 17:00'),
+            },
+            'awsm master': {'model_type': 'ipysnobal'},
+            'isnobal restart': {'restart_crash': True},
+            'ipysnobal': {
+                'thresh_normal': 20,
+                'init_type': 'netcdf',
+                'init_file': 'init.nc',
+                'output_file_name': 'ipysnobal',
+                'output_backend': 'netcdf',
+            },
+            'precip': {'storm_days_restart': None},
+        }
+        raw_cfg = {
+            'time': {
+                'start_date': '2019-10-01 15:00',
+                'end_date': '2019-10-02 17:00',
+            },
+            'ipysnobal': {'init_type': 'netcdf', 'init_file': 'init.nc'},
+        }
+
+        self.daily = DailyOps.__new__(DailyOps)
+        self.daily.config = SimpleNamespace(cfg=cfg, raw_cfg=raw_cfg)
+        self.daily.model_start = cfg['time']['start_date']
+        self.daily.model_end = cfg['time']['end_date']
+        self.daily.prev_data_base = os.path.join(self.tmp, 'data')
+
+        storm_days = os.path.join(
+            self.daily.prev_data_base, 'data20191001', 'smrfOutputs')
+        os.makedirs(storm_days)
+        self.storm_days = os.path.join(storm_days, 'storm_days.nc')
+        with open(self.storm_days, 'w') as f:
+            f.write('storm days')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_first_day(self):
+        sd, ed = self.daily.day_dates(pd.to_datetime('2019-10-01'))
+        config = self.daily.day_config(0, sd, ed, None)
+
+        self.assertEqual(config.raw_cfg['time']['start_date'],
+                         '2019-10-01 15:00')
+        self.assertEqual(config.raw_cfg['time']['end_date'],
+                         '2019-10-02 00:00')
+        self.assertEqual(config.cfg['time']['end_date'],
+                         pd.to_datetime('2019-10-02 00:00'))
+        self.assertTrue(config.cfg['isnobal restart']['restart_crash'])
+        self.assertEqual(config.raw_cfg['ipysnobal']['init_file'], 'init.nc')
+
+    def test_next_day(self):
+        prev_path_output = os.path.join(self.tmp, 'runs', 'run20191001')
+        sd, ed = self.daily.day_dates(pd.to_datetime('2019-10-02'))
+        config = self.daily.day_config(1, sd, ed, prev_path_output)
+
+        init_file = os.path.join(prev_path_output, 'ipysnobal.nc')
+        for cfg in (config.cfg, config.raw_cfg):
+            self.assertFalse(cfg['isnobal restart']['restart_crash'])
+            self.assertEqual(cfg['ipysnobal']['thresh_normal'], 60)
+            self.assertEqual(cfg['ipysnobal']['init_type'], 'netcdf_out')
+            self.assertEqual(cfg['ipysnobal']['init_file'], init_file)
+            self.assertEqual(
+                cfg['precip']['storm_days_restart'], self.storm_days)
+
+        self.assertEqual(config.raw_cfg['time']['start_date'],
+                         '2019-10-02 00:00')
+        self.assertEqual(config.raw_cfg['time']['end_date'],
+                         '2019-10-02 17:00')
+        self.assertEqual(config.cfg['time']['start_date'],
+                         pd.to_datetime('2019-10-02 00:00'))
+
+        # the config of the whole run is not changed
+        self.assertEqual(
+            self.daily.config.raw_cfg['ipysnobal']['init_file'], 'init.nc')
+        self.assertEqual(
+            self.daily.config.cfg['ipysnobal']['thresh_normal'], 20)
+        self.assertTrue(
+            self.daily.config.cfg['isnobal restart']['restart_crash'])
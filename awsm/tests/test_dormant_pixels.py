@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+
+from awsm.models.pysnobal.dormant_pixels import (dormant_pixels,
+                                                 dormant_update,
+                                                 gather_pixels,
+                                                 scatter_pixels)
+
+
+def time_avg(avg, total_time, value, time_incr):
+    """Time average of iSnobal"""
+    return (avg * total_time + value * time_incr) / (total_time + time_incr)
+
+
+class TestDormantPixels(unittest.TestCase):
+    """
+    Testing the fast path for pixels without snow or precipitation
+    """
+
+    def setUp(self):
+        self.output_rec = {
+            'm_s': np.array([[0.0, 10.0], [0.0, 0.0]]),
+            'layer_count': np.array([[0.0, 1.0], [0.0, 0.0]]),
+            'R_n_bar': np.array([[50.0, 20.0], [-30.0, 5.0]]),
+            'H_bar': np.array([[4.0, 2.0], [3.0, 1.0]]),
+            'melt_sum': np.array([[1.5, 2.0], [0.5, 0.0]]),
+            'ro_pred_sum': np.array([[3.0, 1.0], [0.2, 0.0]]),
+            'time_since_out': np.array([[3600.0, 3600.0], [0.0, 7200.0]]),
+            'current_time': np.full((2, 2), 36000.0),
+        }
+        self.input1 = {'m_pp': np.array([[0.0, 0.0], [0.0, 1.0]])}
+        self.input2 = {'m_pp': np.zeros((2, 2))}
+
+    def test_dormant_pixels(self):
+        dormant = dormant_pixels(self.output_rec, self.input1, self.input2)
+        np.testing.assert_array_equal(
+            dormant, [[True, False], [True, False]])
+
+        mask = np.array([[False, True], [True, True]])
+        dormant = dormant_pixels(
+            self.output_rec, self.input1, self.input2, mask)
+        np.testing.assert_array_equal(
+            dormant, [[False, False], [True, False]])
+
+    def test_dormant_update(self):
+        dormant = np.array([[True, False], [True, False]])
+        before = {key: value.copy() for key, value in self.output_rec.items()}
+
+        dormant_update(self.output_rec, dormant, 900.0, intervals=4)
+
+        # iSnobal run time steps with zero energy terms
+        for row, col in ((0, 0), (1, 0)):
+            since = before['time_since_out'][row, col]
+            avg = before['R_n_bar'][row, col]
+            melt = before['melt_sum'][row, col]
+            for _ in range(4):
+                if since > 0:
+                    avg = time_avg(avg, since, 0.0, 900.0)
+                    since += 900.0
+                else:
+                    avg = 0.0
+                    melt = 0.0
+                    since = 900.0
+
+            self.assertEqual(self.output_rec['R_n_bar'][row, col], avg)
+            self.assertEqual(self.output_rec['melt_sum'][row, col], melt)
+            self.assertEqual(
+                self.output_rec['time_since_out'][row, col], since)
+            self.assertEqual(
+                self.output_rec['current_time'][row, col], 36000.0 + 3600.0)
+
+        # the active pixels are not touched
+        for key, value in before.items():
+            np.testing.assert_array_equal(
+                self.output_rec[key][~dormant], value[~dormant])
+
+    def test_gather_scatter(self):
+        index = np.array([1, 3])
+        pixels = gather_pixels(self.output_rec, index, (2, 2))
+        np.testing.assert_array_equal(pixels['m_s'], [[10.0], [0.0]])
+
+        pixels['m_s'] = pixels['m_s'] + 1
+        scatter_pixels(pixels, index, self.output_rec)
+        np.testing.assert_array_equal(
+            self.output_rec['m_s'], [[0.0, 11.0], [0.0, 1.0]])
@@ -0,0 +1,234 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from awsm.models.forcing_cache import ForcingCache
+from awsm.models.pysnobal import PySnobal
+from awsm.models.smrf_connector import SMRFConnector
+
+
+class TestForcingCache(unittest.TestCase):
+    """
+    Testing the forcing cache round trip for each storage type
+    """
+
+    SHAPE = (4, 5)
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.date_time = list(pd.date_range(
+            '2019-10-01 15:00', periods=3, freq='H', tz='MST'))
+
+        rng = np.random.RandomState(0)
+        self.forcing = []
+        for _ in self.date_time:
+            data = {
+                name: rng.uniform(0, 1, self.SHAPE)
+                for name in SMRFConnector.MAP_INPUTS.values()
+            }
+            data['m_pp'][0, :] = 0
+            self.forcing.append(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def fill_cache(self, dtype):
+        cache = ForcingCache(self.cache_dir, 'a' * 64, dtype)
+        self.assertFalse(cache.exists())
+
+        cache.create(self.date_time, self.SHAPE)
+        for tstep, data in zip(self.date_time, self.forcing):
+            cache.write_timestep(tstep, data)
+
+        self.assertFalse(cache.exists())
+        cache.finalize()
+        self.assertTrue(cache.exists())
+
+        cache = ForcingCache(self.cache_dir, 'a' * 64, dtype)
+        cache.open()
+        return cache
+
+    def test_float64(self):
+        cache = self.fill_cache('float64')
+
+        for tstep, data in zip(self.date_time, self.forcing):
+            inpt = cache.get_timestep(tstep)
+            for name, values in data.items():
+                np.testing.assert_array_equal(inpt[name], values)
+
+    def test_float32(self):
+        cache = self.fill_cache('float32')
+
+        for tstep, data in zip(self.date_time, self.forcing):
+            inpt = cache.get_timestep(tstep)
+            for name, values in data.items():
+                self.assertEqual(inpt[name].dtype, np.float64)
+                np.testing.assert_array_equal(
+                    inpt[name], values.astype(np.float32))
+
+    def test_float32_forcing(self):
+        cache = self.fill_cache('float32')
+        cache.read_dtype = np.float32
+
+        for tstep, data in zip(self.date_time, self.forcing):
+            inpt = cache.get_timestep(tstep)
+            for name, values in data.items():
+                # the slice of the cache without a copy
+                self.assertEqual(inpt[name].dtype, np.float32)
+                self.assertFalse(inpt[name].flags.writeable)
+                np.testing.assert_array_equal(
+                    inpt[name], values.astype(np.float32))
+
+    def test_float32_forcing_int16(self):
+        self.forcing[2]['m_pp'][:] = 0
+        cache = self.fill_cache('int16')
+        cache.read_dtype = np.float32
+
+        inpt = cache.get_timestep(self.date_time[2])
+        for name in ('m_pp', 'percent_snow', 'T_a'):
+            self.assertEqual(inpt[name].dtype, np.float32)
+
+    def test_int16(self):
+        cache = self.fill_cache('int16')
+
+        for tstep, data in zip(self.date_time, self.forcing):
+            inpt = cache.get_timestep(tstep)
+            np.testing.assert_array_equal(inpt['m_pp'][0, :], 0)
+            for variable, name in SMRFConnector.MAP_INPUTS.items():
+                np.testing.assert_allclose(
+                    inpt[name],
+                    data[name],
+                    atol=cache.meta['variables'][variable]['scale'])
+
+    def test_variables(self):
+        cache = self.fill_cache('float64')
+
+        inpt = cache.get_timestep(self.date_time[1], variables=['precip'])
+        self.assertEqual(list(inpt.keys()), ['m_pp'])
+        np.testing.assert_array_equal(inpt['m_pp'], self.forcing[1]['m_pp'])
+
+    def test_zero_precip(self):
+        self.forcing[2]['m_pp'][:] = 0
+        cache = self.fill_cache('float32')
+
+        self.assertEqual(cache.meta['zero_precip'], [2])
+
+        inpt = cache.get_timestep(self.date_time[2])
+        for name in ('percent_snow', 'rho_snow', 'T_pp'):
+            np.testing.assert_array_equal(inpt[name], 0)
+            self.assertFalse(inpt[name].flags.writeable)
+
+        inpt = cache.get_timestep(self.date_time[1])
+        np.testing.assert_array_equal(
+            inpt['T_pp'], self.forcing[1]['T_pp'].astype(np.float32))
+
+    def test_missing_time(self):
+        cache = self.fill_cache('float64')
+
+        with self.assertRaises(ValueError):
+            cache.get_timestep(pd.Timestamp('2019-10-02 15:00'))
+
+    def test_key_mismatch(self):
+        self.fill_cache('float64')
+
+        cache = ForcingCache(self.cache_dir, 'a' * 16 + 'b' * 48)
+        self.assertFalse(cache.exists())
+
+    def pysnobal(self, smrf_config):
+        """PySnobal with the forcing cache config of an AWSM run whose
+        SMRF output is in the cache directory
+        """
+
+        connector = SimpleNamespace(
+            smrf_config=SimpleNamespace(cfg=smrf_config),
+            output_path=self.cache_dir,
+            forcing_dtype=np.float64)
+        awsm = SimpleNamespace(
+            config={'ipysnobal': {
+                'forcing_cache_dir': self.cache_dir,
+                'forcing_cache_dtype': 'float64',
+            }},
+            smrf_connector=connector,
+            path_wy=self.cache_dir,
+            topo=SimpleNamespace(dem=np.zeros(self.SHAPE)),
+            window=None)
+
+        pysnobal = PySnobal.__new__(PySnobal)
+        pysnobal._logger = logging.getLogger(__name__)
+        pysnobal.awsm = awsm
+        pysnobal.config = {'forcing_cache': True}
+        pysnobal.date_time = self.date_time
+        pysnobal.forcing_cache = None
+        pysnobal.fill_forcing_cache = False
+        return pysnobal
+
+    def test_replay(self):
+        topo = os.path.join(self.cache_dir, 'topo.nc')
+        with open(topo, 'w') as f:
+            f.write('topo')
+        smrf_config = {
+            'time': {
+                'start_date': self.date_time[0],
+                'end_date': self.date_time[-1],
+            },
+            'topo': {'filename': topo},
+            'output': {'out_location': self.cache_dir},
+        }
+
+        # smrf_ipysnobal fills the cache as SMRF distributes the forcing
+        pysnobal = self.pysnobal(smrf_config)
+        pysnobal.initialize_forcing_cache(fill=True)
+        self.assertTrue(pysnobal.fill_forcing_cache)
+        for tstep, data in zip(self.date_time, self.forcing):
+            pysnobal.forcing_cache.write_timestep(tstep, data)
+        pysnobal.finalize_forcing_cache()
+
+        # SMRF wrote the forcing files as a side effect of the run
+        for variable in SMRFConnector.MAP_INPUTS:
+            with open(os.path.join(
+                    self.cache_dir, '{}.nc'.format(variable)), 'w') as f:
+                f.write('forcing')
+
+        # the ipysnobal replay reads the cache instead of converting
+        replay = self.pysnobal(smrf_config)
+        replay.initialize_forcing_cache()
+        self.assertFalse(replay.fill_forcing_cache)
+        self.assertIsNotNone(replay.forcing_cache.meta)
+        inpt = replay.forcing_cache.get_timestep(self.date_time[1])
+        for name, values in self.forcing[1].items():
+            np.testing.assert_array_equal(inpt[name], values)
+
+        # a complete cache is not filled again
+        pysnobal = self.pysnobal(smrf_config)
+        pysnobal.initialize_forcing_cache(fill=True)
+        self.assertIsNone(pysnobal.forcing_cache)
+        self.assertFalse(pysnobal.fill_forcing_cache)
+
+    def test_key(self):
+        topo = os.path.join(self.cache_dir, 'topo.nc')
+        with open(topo, 'w') as f:
+            f.write('topo')
+        smrf_config = {
+            'time': {'start_date': self.date_time[0]},
+            'topo': {'filename': topo},
+            'output': {'out_location': self.cache_dir},
+        }
+        key = ForcingCache.cache_key(smrf_config)
+
+        # the output location is not an input of the forcing
+        smrf_config['output']['out_location'] = 'other'
+        self.assertEqual(key, ForcingCache.cache_key(smrf_config))
+
+        smrf_config['time']['start_date'] = self.date_time[1]
+        self.assertNotEqual(key, ForcingCache.cache_key(smrf_config))
+        smrf_config['time']['start_date'] = self.date_time[0]
+
+        stat = os.stat(topo)
+        os.utime(topo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertNotEqual(key, ForcingCache.cache_key(smrf_config))
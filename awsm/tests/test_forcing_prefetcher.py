@@ -0,0 +1,21 @@
+import unittest
+from unittest import mock
+
+from awsm.models import forcing_prefetcher
+from awsm.models.forcing_prefetcher import ForcingPrefetcher
+
+
+class TestForcingPrefetcher(unittest.TestCase):
+    """
+    Testing the Python version needed by the prefetch worker processes
+    """
+
+    def test_old_python(self):
+        with mock.patch.object(
+                forcing_prefetcher.sys, 'version_info', (3, 6, 9)):
+            with self.assertRaisesRegex(ValueError, 'Python 3.7'):
+                ForcingPrefetcher(None, [], 2, workers=2)
+
+            # reading in a thread works on any version
+            prefetcher = ForcingPrefetcher(None, [], 2)
+            self.assertEqual(prefetcher.workers, 1)
@@ -0,0 +1,120 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import netCDF4 as nc
+import numpy as np
+
+from awsm.framework import framework
+from awsm.framework.framework import AWSM
+from awsm.models.pysnobal.grid_window import (GridWindow, TopoWindow,
+                                              grid_windows)
+
+
+class TestGridWindows(unittest.TestCase):
+    """
+    Testing the windows of rows for out-of-core runs
+    """
+
+    def test_tiles(self):
+        windows = grid_windows(10, 4)
+
+        self.assertEqual(
+            [(w.interior.start, w.interior.stop) for w in windows],
+            [(0, 4), (4, 8), (8, 10)])
+        for window in windows:
+            self.assertEqual(window.rows, window.interior)
+            self.assertEqual(
+                window.local,
+                slice(0, window.interior.stop - window.interior.start))
+
+    def test_single_tile(self):
+        windows = grid_windows(6, 20)
+
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(windows[0].rows, slice(0, 6))
+        self.assertEqual(windows[0].local, slice(0, 6))
+
+
+def point_model(topo):
+    """A pixel by pixel stand-in for the snow model"""
+    return topo.dem * topo.mask + 10 * topo.roughness
+
+
+class TestOutOfCore(unittest.TestCase):
+    """
+    Testing that a run in tiles of rows gives the full grid run
+    """
+
+    SHAPE = (7, 4)
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.topo_config = {'filename': os.path.join(self.tmp, 'topo.nc')}
+
+        rng = np.random.default_rng(0)
+        ny, nx = self.SHAPE
+        with nc.Dataset(self.topo_config['filename'], 'w') as ds:
+            ds.createDimension('y', ny)
+            ds.createDimension('x', nx)
+            ds.createVariable('x', 'f8', ('x',))[:] = np.arange(nx)
+            ds.createVariable('y', 'f8', ('y',))[:] = np.arange(ny)
+            ds.createVariable('dem', 'f8', ('y', 'x'))[:] = \
+                rng.uniform(1000, 3000, self.SHAPE)
+            ds.createVariable('mask', 'f8', ('y', 'x'))[:] = \
+                rng.integers(0, 2, self.SHAPE)
+            ds.createVariable('roughness', 'f8', ('y', 'x'))[:] = \
+                rng.uniform(0.001, 0.01, self.SHAPE)
+
+        self.awsm = AWSM.__new__(AWSM)
+        self.awsm._logger = logging.getLogger(__name__)
+        self.awsm.config = {
+            'topo': self.topo_config,
+            'ipysnobal': {
+                'mask_isnobal': True,
+                'restart_checkpoint': None,
+                'checkpoint_frequency': 0,
+            },
+        }
+        self.awsm.path_output = self.tmp
+        self.awsm.start_date = None
+        self.awsm.model_type = 'ipysnobal'
+        self.awsm.update_depth = False
+        self.awsm.window = None
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_tiles(self):
+        output = np.full(self.SHAPE, np.nan)
+
+        class PySnobal():
+            def __init__(self, myawsm):
+                self.topo = myawsm.topo
+                self.window = myawsm.window
+
+            def run_ipysnobal(self):
+                output[self.window.interior] = \
+                    point_model(self.topo)[self.window.local]
+
+        self.awsm.tile_rows = 3
+        with mock.patch.object(framework, 'PySnobal', PySnobal), \
+                mock.patch.object(framework, 'ModelInit'):
+            self.awsm.run_ipysnobal_tiles()
+
+        full_grid = TopoWindow(
+            self.topo_config, GridWindow(0, self.SHAPE[0]))
+        np.testing.assert_array_equal(output, point_model(full_grid))
+        self.assertIsNone(self.awsm.window)
+
+    def test_update_depth(self):
+        self.awsm.tile_rows = 3
+        self.awsm.check_out_of_core()
+
+        self.awsm.update_depth = True
+        with self.assertRaises(ValueError):
+            self.awsm.check_out_of_core()
@@ -0,0 +1,107 @@
+import importlib
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+import netCDF4 as nc
+import numpy as np
+
+import awsm
+from awsm.models.pysnobal.output_backends import NetcdfOutput, ZarrOutput
+from awsm.models.pysnobal.pysnobal_io import PysnobalIO
+
+
+@unittest.skipIf(importlib.util.find_spec('zarr') is None,
+                 'zarr is not installed')
+class TestZarrProjection(unittest.TestCase):
+    """
+    Testing that the zarr store carries the projection of the netCDF output
+    """
+
+    TOPO = Path(awsm.__file__).parent.joinpath(
+        'tests', 'basins', 'Lakes', 'topo', 'topo.nc')
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+        with nc.Dataset(str(self.TOPO), 'r') as ds:
+            x = ds.variables['x'][:]
+            y = ds.variables['y'][:]
+
+        self.variables = ['thickness', 'snow_density']
+        self.io = SimpleNamespace(
+            config={
+                'output_fixed_time': False,
+                'output_chunks': None,
+                'output_zlib': False,
+                'output_complevel': 4,
+                'output_shuffle': True,
+                'output_least_significant_digit': None,
+                'output_chunk_cache': None,
+                'zarr_write_threads': 1,
+            },
+            awsm=SimpleNamespace(
+                output_freq=1,
+                topo=SimpleNamespace(topoConfig={'filename': str(self.TOPO)})),
+            window=None,
+            x=x,
+            y=y,
+            precision='f4',
+            output_variables=self.variables,
+            OUTPUT_VARIABLES=PysnobalIO.OUTPUT_VARIABLES,
+            time_attributes={
+                'units': 'hours since 2019-10-01 00:00:00',
+                'calendar': 'standard',
+            })
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def create(self, backend):
+        self.io.output_filename = os.path.join(
+            self.tmp, 'ipysnobal' + backend.EXTENSION)
+        output = backend(self.io)
+        output.create()
+        return output
+
+    def test_projection(self):
+        netcdf = self.create(NetcdfOutput)
+        dataset = netcdf.dataset
+        zarr = self.create(ZarrOutput)
+        group = zarr.group
+
+        self.assertEqual(
+            dict(group['projection'].attrs),
+            dict(dataset.variables['projection'].__dict__,
+                 _ARRAY_DIMENSIONS=[]))
+
+        for var_name in self.variables:
+            self.assertEqual(group[var_name].attrs['grid_mapping'],
+                             'projection')
+            self.assertEqual(dataset.variables[var_name].grid_mapping,
+                             'projection')
+
+        for name in ['x', 'y']:
+            for attr in ['standard_name', 'units']:
+                self.assertEqual(
+                    group[name].attrs[attr],
+                    dataset.variables[name].getncattr(attr))
+
+        netcdf.close()
+        zarr.close()
+
+    def test_append(self):
+        zarr = self.create(ZarrOutput)
+        zarr.close()
+
+        # a store from before the projection was written gets it on append
+        del zarr.group['projection']
+        zarr = self.create(ZarrOutput)
+        self.assertEqual(zarr.group['projection'].attrs['grid_mapping_name'],
+                         'universal_transverse_mercator')
+        np.testing.assert_array_equal(
+            zarr.group['x'][:], np.asarray(self.io.x, dtype='f4'))
+        zarr.close()
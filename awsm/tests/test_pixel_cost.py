@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+from pysnobal import ipysnobal
+
+from awsm.models.pysnobal.pixel_cost import (NO_SNOW_COST, cost_regions,
+                                             pixel_cost)
+
+
+class TestPixelCost(unittest.TestCase):
+    """
+    Testing the estimated cost of the pixels
+    """
+
+    def time_step_info(self):
+        info = [{} for _ in range(4)]
+        info[ipysnobal.NORMAL_TSTEP].update(intervals=1, threshold=60)
+        info[ipysnobal.MEDIUM_TSTEP].update(intervals=4, threshold=10)
+        info[ipysnobal.SMALL_TSTEP].update(intervals=15, threshold=1)
+        return info
+
+    def test_pixel_cost(self):
+        output_rec = {
+            'm_s': np.array([[0.0, 100.0, 30.0, 5.0]]),
+            'm_s_0': np.array([[0.0, 20.0, 30.0, 5.0]]),
+            'm_s_l': np.array([[0.0, 80.0, 0.0, 0.0]]),
+            'layer_count': np.array([[0, 2, 1, 1]]),
+            'mask': np.array([[1, 1, 1, 1]]),
+        }
+
+        cost = pixel_cost(output_rec, self.time_step_info())
+        np.testing.assert_array_equal(cost, [[NO_SNOW_COST, 4, 4, 60]])
+
+        output_rec['mask'][0, 3] = 0
+        cost = pixel_cost(output_rec, self.time_step_info())
+        self.assertEqual(cost[0, 3], 0)
+
+    def test_cost_regions(self):
+        cost = np.ones((16, 16))
+        cost[4:6, 10:12] = 100.0
+
+        regions = cost_regions(cost, blocks=8, top=2)
+        self.assertEqual(len(regions), 2)
+
+        rows, cols, fraction = regions[0]
+        self.assertEqual((rows, cols), (slice(4, 6), slice(10, 12)))
+        self.assertAlmostEqual(fraction, 400 / (400 + 252))
+        self.assertEqual(cost_regions(np.zeros((4, 4))), [])
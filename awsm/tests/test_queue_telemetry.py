@@ -0,0 +1,80 @@
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import unittest
+
+from awsm.models.queue_telemetry import InstrumentedQueue, QueueTelemetry
+
+
+class TestQueueTelemetry(unittest.TestCase):
+    """
+    Testing the queue occupancy and wait times of producer and consumer
+    threads
+    """
+
+    def run_threads(self, telemetry, smrf_queue, nitems=3, delay=0.05):
+
+        def producer():
+            for i in range(nitems):
+                smrf_queue['air_temp'].put(i)
+
+        def consumer():
+            for _ in range(nitems):
+                time.sleep(delay)
+                smrf_queue['air_temp'].get()
+
+        threads = [
+            threading.Thread(target=producer, name='air_temp'),
+            threading.Thread(target=consumer, name='ipysnobal'),
+        ]
+        for thread in threads:
+            telemetry.track(thread)
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_back_pressure(self):
+        telemetry = QueueTelemetry(interval=0)
+        smrf_queue = {'air_temp': queue.Queue(maxsize=1)}
+        telemetry.instrument(smrf_queue)
+        self.assertIsInstance(smrf_queue['air_temp'], InstrumentedQueue)
+        self.assertEqual(smrf_queue['air_temp'].maxsize, 1)
+
+        telemetry.start()
+        self.run_threads(telemetry, smrf_queue)
+
+        summary = telemetry.summary()
+        stats = summary['queues']['air_temp']
+        self.assertEqual(stats['max_size'], 1)
+        self.assertEqual((stats['puts'], stats['gets']), (3, 3))
+        self.assertLessEqual(stats['max_occupancy'], 1)
+
+        # the producer is held back by the slow consumer
+        self.assertGreater(stats['producer_wait'], 0.05)
+        self.assertEqual(list(stats['consumer_wait']), ['ipysnobal'])
+
+        threads = summary['threads']
+        self.assertEqual(set(threads), {'air_temp', 'ipysnobal'})
+        self.assertLess(threads['air_temp']['busy'], 0.5)
+        self.assertGreater(threads['ipysnobal']['busy'], 0.5)
+
+    def test_json(self):
+        telemetry = QueueTelemetry(interval=0.01)
+        smrf_queue = {'air_temp': queue.Queue(maxsize=2)}
+        telemetry.instrument(smrf_queue)
+        telemetry.start()
+        self.run_threads(telemetry, smrf_queue, delay=0.01)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'queue_telemetry.json')
+            telemetry.stop(path)
+
+            with open(path) as f:
+                summary = json.load(f)
+
+        self.assertEqual(summary['queues']['air_temp']['puts'], 3)
+        self.assertIn('ipysnobal', summary['threads'])
+        self.assertIsNone(telemetry.reporter)
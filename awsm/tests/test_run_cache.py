@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from awsm.framework.run_cache import RunCache
+
+
+class TestRunCache(unittest.TestCase):
+    """
+    Testing the stage fingerprints and the skip records of the run cache
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path_output = os.path.join(self.tmp, 'runs', 'run20191001')
+        os.makedirs(self.path_output)
+
+        self.topo = os.path.join(self.tmp, 'topo.nc')
+        with open(self.topo, 'w') as f:
+            f.write('topo')
+
+        self.config = {
+            'topo': {'filename': self.topo},
+            'paths': {'path_dr': self.tmp},
+            'awsm system': {'log_level': 'debug', 'output_frequency': 1},
+        }
+        self.cache = RunCache(self.path_output)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_fingerprint(self):
+        fingerprint = self.cache.fingerprint(self.config)
+        self.assertEqual(fingerprint, self.cache.fingerprint(self.config))
+
+        # logging does not change the outputs
+        self.config['awsm system']['log_level'] = 'info'
+        self.assertEqual(fingerprint, self.cache.fingerprint(self.config))
+
+        self.config['awsm system']['output_frequency'] = 24
+        self.assertNotEqual(
+            fingerprint, self.cache.fingerprint(self.config))
+
+    def test_file_mtime(self):
+        fingerprint = self.cache.fingerprint(self.config)
+
+        # files written by the run do not change the fingerprint
+        with open(os.path.join(self.path_output, 'air_temp.nc'), 'w') as f:
+            f.write('forcing')
+        self.assertEqual(fingerprint, self.cache.fingerprint(self.config))
+
+        stat = os.stat(self.topo)
+        os.utime(self.topo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertNotEqual(
+            fingerprint, self.cache.fingerprint(self.config))
+
+    def test_file_hash(self):
+        cache = RunCache(self.path_output, hash_files=True)
+        fingerprint = cache.fingerprint(self.config)
+
+        # touching a file keeps its contents
+        stat = os.stat(self.topo)
+        os.utime(self.topo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(fingerprint, cache.fingerprint(self.config))
+
+        with open(self.topo, 'w') as f:
+            f.write('TOPO')
+        os.utime(self.topo, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertNotEqual(fingerprint, cache.fingerprint(self.config))
+
+    def test_arrays(self):
+        init = {'z_s': np.zeros((3, 4)), 'rho': np.ones((3, 4))}
+        fingerprint = self.cache.fingerprint(self.config, arrays=init)
+        self.assertNotEqual(
+            fingerprint, self.cache.fingerprint(self.config))
+
+        init['z_s'][1, 2] = 0.5
+        self.assertNotEqual(
+            fingerprint, self.cache.fingerprint(self.config, arrays=init))
+
+    def test_record(self):
+        output = os.path.join(self.path_output, 'ipysnobal.nc')
+        fingerprint = self.cache.fingerprint(self.config)
+        self.assertFalse(self.cache.is_current('ipysnobal', fingerprint))
+
+        with open(output, 'w') as f:
+            f.write('output')
+        self.cache.record('ipysnobal', fingerprint, [output])
+
+        cache = RunCache(self.path_output)
+        self.assertTrue(cache.is_current('ipysnobal', fingerprint))
+        self.assertFalse(cache.is_current('smrf', fingerprint))
+        self.assertFalse(cache.is_current('ipysnobal', 'a' * 64))
+
+        # the outputs have to exist
+        os.remove(output)
+        self.assertFalse(cache.is_current('ipysnobal', fingerprint))
+
+    def test_invalidate(self):
+        fingerprint = self.cache.fingerprint(self.config)
+        self.cache.record('smrf', fingerprint, [])
+        self.cache.record('ipysnobal', fingerprint, [])
+
+        self.cache.invalidate('ipysnobal')
+        self.assertTrue(self.cache.is_current('smrf', fingerprint))
+        self.assertFalse(self.cache.is_current('ipysnobal', fingerprint))
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+
+from awsm.models.smrf_connector import SMRFConnector, phase_fill
+
+
+class RecordReads():
+    """Forcing variable that records the time steps read from it"""
+
+    def __init__(self, variable):
+        self.variable = variable
+        self.reads = []
+
+    def __getitem__(self, key):
+        self.reads.append(key[0])
+        return self.variable[key]
+
+
+class TestSMRFConnector(unittest.TestCase):
+    """
+    Testing the time step lookup and reads of the SMRF forcing files
+    """
+
+    SHAPE = (3, 4)
+    UNITS = 'hours since 2019-10-01 00:00'
+
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp()
+        self.hours = [15, 16, 17]
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path)
+
+    def write_forcing(self, variable, values):
+        """Write a SMRF style forcing file with a value per time step"""
+
+        path = os.path.join(self.output_path, '{}.nc'.format(variable))
+        with nc.Dataset(path, 'w') as ds:
+            ds.createDimension('time', None)
+            ds.createDimension('y', self.SHAPE[0])
+            ds.createDimension('x', self.SHAPE[1])
+            ds.createVariable('projection', 'i4')
+
+            times = ds.createVariable('time', 'f8', ('time',))
+            times.units = self.UNITS
+            times.calendar = 'standard'
+            times[:] = self.hours
+
+            data = ds.createVariable(variable, 'f8', ('time', 'y', 'x'))
+            for idx, value in enumerate(values):
+                data[idx, :] = value
+
+        return nc.Dataset(path, 'r')
+
+    def test_forcing_descriptor(self):
+        ds = self.write_forcing('air_temp', [1.0, 2.0, 3.0])
+        descriptor = SMRFConnector.forcing_descriptor(ds)
+
+        self.assertEqual(descriptor['name'], 'air_temp')
+        self.assertEqual(descriptor['calendar'], 'standard')
+
+        dates = nc.num2date(
+            ds.variables['time'][:], self.UNITS,
+            only_use_cftime_datetimes=False)
+        self.assertEqual(
+            descriptor['time_index'],
+            {pd.Timestamp(date): idx for idx, date in enumerate(dates)})
+
+        # time steps are looked up in the time zone they are in
+        tstep = pd.Timestamp('2019-10-01 16:00', tz='MST')
+        idx = SMRFConnector.time_index(descriptor, 'air_temp', tstep)
+        self.assertEqual(idx, 1)
+        np.testing.assert_array_equal(descriptor['variable'][idx], 2.0)
+        ds.close()
+
+    def test_missing_time(self):
+        ds = self.write_forcing('air_temp', [1.0, 2.0, 3.0])
+        descriptor = SMRFConnector.forcing_descriptor(ds)
+
+        # the lookup only uses the index, the file is not searched again
+        ds.close()
+        self.assertEqual(
+            SMRFConnector.time_index(
+                descriptor, 'air_temp', pd.Timestamp('2019-10-01 17:00')),
+            2)
+
+        with self.assertRaises(ValueError):
+            SMRFConnector.time_index(
+                descriptor, 'air_temp', pd.Timestamp('2019-10-01 18:00'))
+
+    def connector(self, forcing):
+        """SMRFConnector reading the given forcing values per time step"""
+
+        connector = SMRFConnector.__new__(SMRFConnector)
+        connector.rows = slice(None)
+        connector.forcing_dtype = np.float64
+        connector.force = {}
+        connector.force_info = {}
+
+        for variable, values in forcing.items():
+            ds = self.write_forcing(variable, values)
+            self.addCleanup(ds.close)
+            connector.force[variable] = ds
+            connector.force_info[variable] = \
+                SMRFConnector.forcing_descriptor(ds)
+            connector.force_info[variable]['variable'] = RecordReads(
+                connector.force_info[variable]['variable'])
+
+        return connector
+
+    def test_zero_precip(self):
+        forcing = {'precip': [0.0, 2.0, 0.0], 'air_temp': [1.0, 2.0, 3.0]}
+        for variable in SMRFConnector.PRECIP_PHASE:
+            forcing[variable] = [0.5, 0.6, 0.7]
+        connector = self.connector(forcing)
+
+        tstep = pd.Timestamp('2019-10-01 15:00', tz='MST')
+        inpt = connector.get_timestep_netcdf(tstep)
+        np.testing.assert_array_equal(inpt['T_a'], 1.0)
+        for variable in SMRFConnector.PRECIP_PHASE:
+            name = SMRFConnector.MAP_INPUTS[variable]
+            self.assertIs(inpt[name], phase_fill(self.SHAPE, np.float64))
+            np.testing.assert_array_equal(inpt[name], 0)
+            self.assertEqual(
+                connector.force_info[variable]['variable'].reads, [])
+
+        # with precipitation the phase is read
+        tstep = pd.Timestamp('2019-10-01 16:00', tz='MST')
+        inpt = connector.get_timestep_netcdf(tstep)
+        np.testing.assert_array_equal(inpt['m_pp'], 2.0)
+        for variable in SMRFConnector.PRECIP_PHASE:
+            name = SMRFConnector.MAP_INPUTS[variable]
+            np.testing.assert_array_equal(inpt[name], 0.6)
+            self.assertEqual(
+                connector.force_info[variable]['variable'].reads, [1])
@@ -0,0 +1,22 @@
+import sys
+import unittest
+from unittest import mock
+
+from awsm.models.smrf_process import shared_memory
+
+
+class TestSharedMemory(unittest.TestCase):
+    """
+    Testing the import of multiprocessing.shared_memory for the SMRF
+    process
+    """
+
+    def test_shared_memory(self):
+        self.assertEqual(shared_memory().__name__, 'SharedMemory')
+
+    def test_old_python(self):
+        # the module is missing before Python 3.8
+        with mock.patch.dict(
+                sys.modules, {'multiprocessing.shared_memory': None}):
+            with self.assertRaisesRegex(ImportError, 'smrf_process'):
+                shared_memory()
@@ -0,0 +1,131 @@
+import logging
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from awsm.models.pysnobal import PySnobal
+from awsm.models.pysnobal.input_arena import FREEZE
+
+
+class TestSnobalTimestep(unittest.TestCase):
+    """
+    Testing the time step driver of PySnobal with a stubbed iSnobal time
+    step, the roll back and retry of failed time steps and the estimated
+    cost
+    """
+
+    SHAPE = (2, 3)
+
+    def pysnobal(self, fail):
+        """PySnobal with an iSnobal time step that changes the state and
+        returns the pixel ``fail`` finds failing, or -1
+        """
+
+        pysnobal = PySnobal.__new__(PySnobal)
+        pysnobal._logger = logging.getLogger(__name__)
+        pysnobal.awsm = SimpleNamespace(
+            config={'isnobal restart': {'depth_thresh': 0.05}},
+            topo=SimpleNamespace(dem=np.zeros(self.SHAPE)))
+        pysnobal.config = {
+            'retry_budget': 10,
+            'retry_thresh_factor': 2,
+            'thresh_normal': 60,
+            'thresh_medium': 10,
+            'thresh_small': 1,
+        }
+        pysnobal.time_step_info = [{'intervals': 1} for _ in range(4)]
+        pysnobal.set_thresholds()
+
+        pysnobal.model_mask = np.ones(self.SHAPE, dtype=bool)
+        pysnobal.thread_tuner = None
+        pysnobal.cost_total = None
+        pysnobal.skipped_pixels = None
+        pysnobal.backup_rec = {}
+        pysnobal.retries = 0
+        pysnobal.time_step = '2019-10-01 16:00'
+
+        ones = np.ones(self.SHAPE)
+        pysnobal.output_rec = {
+            'z_s': 0.01 * ones,
+            'm_s': 3 * ones,
+            'rho': 300 * ones,
+            'T_s_0': (FREEZE - 2) * ones,
+            'T_s_l': (FREEZE - 3) * ones,
+            'T_s': (FREEZE - 4) * ones,
+            'h2o_sat': 0.5 * ones,
+        }
+
+        pysnobal.attempts = 0
+
+        def do_tstep(first_step):
+            pysnobal.attempts += 1
+            pysnobal.output_rec['m_s'] += 1
+            return fail(pysnobal.output_rec['z_s'].reshape(-1))
+
+        pysnobal.do_tstep = do_tstep
+        return pysnobal
+
+    def test_thresholds(self):
+        thresholds = []
+
+        def fail(z_s):
+            thresholds.append(pysnobal.time_step_info[1]['threshold'])
+            return 1 if len(thresholds) == 1 else -1
+
+        pysnobal = self.pysnobal(fail)
+        pysnobal.run_snobal_timestep(0)
+
+        # retried with larger thresholds from the state before the step
+        self.assertEqual(pysnobal.retries, 1)
+        self.assertEqual(thresholds, [60, 120])
+        np.testing.assert_array_equal(pysnobal.output_rec['m_s'], 4)
+        np.testing.assert_array_equal(pysnobal.output_rec['z_s'], 0.01)
+        self.assertEqual(pysnobal.time_step_info[1]['threshold'], 60)
+
+    def test_fails_after_snow_removed(self):
+        pysnobal = self.pysnobal(lambda z_s: 4)
+
+        with self.assertRaisesRegex(ValueError, 'fails again'):
+            pysnobal.run_snobal_timestep(0)
+
+        # thresholds, then the snow removed, not the whole budget
+        self.assertEqual(pysnobal.retries, 2)
+        self.assertEqual(pysnobal.attempts, 3)
+
+    def test_removed_snow_stays_removed(self):
+
+        def fail(z_s):
+            for pixel in (1, 4):
+                if z_s[pixel] > 0:
+                    return pixel
+            return -1
+
+        pysnobal = self.pysnobal(fail)
+        pysnobal.run_snobal_timestep(0)
+
+        self.assertEqual(pysnobal.retries, 3)
+        z_s = pysnobal.output_rec['z_s'].reshape(-1)
+        np.testing.assert_array_equal(z_s[[1, 4]], 0)
+        np.testing.assert_array_equal(z_s[[0, 2, 3, 5]], 0.01)
+
+    def test_estimated_cost(self):
+        dormant = np.zeros(self.SHAPE, dtype=bool)
+        dormant[0, :] = True
+
+        pysnobal = self.pysnobal(lambda z_s: -1)
+        pysnobal.cost_total = np.zeros(self.SHAPE)
+        pysnobal.output_rec['estimated_cost'] = np.zeros(self.SHAPE)
+
+        def do_tstep(first_step):
+            pysnobal.skipped_pixels = dormant
+            return -1
+
+        pysnobal.do_tstep = do_tstep
+        pysnobal.run_snobal_timestep(0)
+
+        # only the pixels that ran the model have a cost
+        cost = pysnobal.output_rec['estimated_cost']
+        np.testing.assert_array_equal(cost[0], 0)
+        self.assertTrue(np.all(cost[1] > 0))
+        np.testing.assert_array_equal(pysnobal.cost_total, cost)
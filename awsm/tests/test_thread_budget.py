@@ -0,0 +1,87 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from awsm.framework import thread_budget
+from awsm.framework.thread_budget import (BLAS_VARIABLES, GROUPS,
+                                          ThreadBudget, split_cpus)
+
+
+class TestThreadBudget(unittest.TestCase):
+    """
+    Testing dividing the CPUs between the thread groups
+    """
+
+    def test_split_cpus(self):
+        cpus = split_cpus(range(8), model_fraction=0.5, io_cpus=1)
+        self.assertEqual(cpus['smrf'], [0, 1, 2])
+        self.assertEqual(cpus['model'], [3, 4, 5, 6])
+        self.assertEqual(cpus['io'], [7])
+
+        cpus = split_cpus(range(8), model_fraction=0.75, io_cpus=2)
+        self.assertEqual(cpus['smrf'], [0, 1])
+        self.assertEqual(cpus['model'], [2, 3, 4, 5])
+        self.assertEqual(cpus['io'], [6, 7])
+
+    def test_every_group_has_cpus(self):
+        cpus = split_cpus(range(3), model_fraction=1.0, io_cpus=4)
+        self.assertEqual(
+            [cpus[group] for group in GROUPS], [[0], [1], [2]])
+
+        cpus = split_cpus(range(2))
+        for group in GROUPS:
+            self.assertEqual(cpus[group], [0, 1])
+
+    def test_start(self):
+        budget = ThreadBudget()
+        result = []
+
+        thread = threading.Thread(
+            target=lambda: result.append(sum(range(100000))))
+        budget.start(thread, 'smrf')
+        thread.join()
+
+        self.assertEqual(result, [sum(range(100000))])
+        self.assertGreater(budget.cpu_time['smrf'], 0)
+        self.assertEqual(budget.cpu_time['io'], 0)
+
+        for group, (seconds, used) in budget.utilization().items():
+            self.assertGreaterEqual(seconds, 0)
+            self.assertGreaterEqual(used, 0)
+
+    def test_no_thread_time(self):
+        budget = ThreadBudget()
+        budget.begin()
+        result = []
+
+        # before Python 3.7 the threads run without measuring
+        with mock.patch.object(thread_budget, 'THREAD_TIME', None):
+            thread = threading.Thread(target=lambda: result.append(1))
+            budget.start(thread, 'smrf')
+            thread.join()
+
+            with self.assertLogs(thread_budget.__name__, 'INFO') as logs:
+                budget.log_utilization()
+
+        self.assertEqual(result, [1])
+        self.assertEqual(budget.cpu_time['smrf'], 0)
+        self.assertIn('Python 3.7', logs.output[0])
+
+    def test_limit_blas(self):
+        budget = ThreadBudget()
+        environ = {
+            variable: os.environ.get(variable)
+            for variable in BLAS_VARIABLES + ('OMP_NUM_THREADS',)
+        }
+
+        with budget.limit_blas(2):
+            for variable in BLAS_VARIABLES:
+                self.assertEqual(os.environ[variable], '2')
+            # the OpenMP threads of the iSnobal kernel are not limited
+            self.assertEqual(
+                os.environ.get('OMP_NUM_THREADS'),
+                environ['OMP_NUM_THREADS'])
+
+        for variable, value in environ.items():
+            self.assertEqual(os.environ.get(variable), value)
@@ -0,0 +1,50 @@
+import unittest
+
+from awsm.models.pysnobal.thread_tuner import ThreadTuner, thread_candidates
+
+
+class TestThreadTuner(unittest.TestCase):
+    """
+    Testing picking the number of threads from the time step wall times
+    """
+
+    # seconds per unit cost of each thread count
+    RATES = {1: 4.0, 2: 2.2, 4: 1.5, 6: 1.8}
+
+    def run_steps(self, tuner, steps, coverage=0.5, cost=10.0):
+        threads = []
+        for _ in range(steps):
+            n = tuner.next_threads(coverage)
+            threads.append(n)
+            tuner.record(self.RATES[n] * cost, cost)
+        return threads
+
+    def test_candidates(self):
+        self.assertEqual(thread_candidates(1), [1])
+        self.assertEqual(thread_candidates(6), [1, 2, 4, 6])
+        self.assertEqual(thread_candidates(8), [1, 2, 4, 8])
+
+    def test_choose(self):
+        tuner = ThreadTuner([1, 2, 4, 6], trial_steps=2)
+        self.assertTrue(tuner.tuning)
+
+        threads = self.run_steps(tuner, 8)
+        self.assertEqual(threads, [1, 1, 2, 2, 4, 4, 6, 6])
+        self.assertFalse(tuner.tuning)
+        self.assertEqual(tuner.nthreads, 4)
+
+        self.assertEqual(self.run_steps(tuner, 5), [4] * 5)
+
+    def test_retune_coverage(self):
+        tuner = ThreadTuner([1, 2, 4, 6], trial_steps=1)
+        self.run_steps(tuner, 4, coverage=0.5)
+        self.assertEqual(self.run_steps(tuner, 2, coverage=0.55), [4, 4])
+
+        # the snow coverage changed
+        self.assertEqual(tuner.next_threads(0.8), 1)
+        self.assertTrue(tuner.tuning)
+
+    def test_retune_steps(self):
+        tuner = ThreadTuner([1, 2], trial_steps=1, retune_steps=3)
+        self.run_steps(tuner, 2)
+        self.assertEqual(self.run_steps(tuner, 3), [2, 2, 1])
@@ -0,0 +1,63 @@
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from awsm.models.pysnobal.tile_executor import row_bands, shared_memory
+
+
+class TestRowBands(unittest.TestCase):
+    """
+    Testing the split of the grid into row bands for the tile workers
+    """
+
+    def assert_covers(self, bands, ny):
+        self.assertEqual(bands[0][0], 0)
+        self.assertEqual(bands[-1][1], ny)
+        for (_, end), (start, _) in zip(bands[:-1], bands[1:]):
+            self.assertEqual(end, start)
+        for start, end in bands:
+            self.assertGreater(end, start)
+
+    def test_uniform_mask(self):
+        bands = row_bands(np.ones((12, 5)), 3)
+
+        self.assertEqual(bands, [(0, 4), (4, 8), (8, 12)])
+
+    def test_balanced_mask(self):
+        mask = np.zeros((20, 10))
+        mask[:5, :] = 1
+
+        bands = row_bands(mask, 2)
+        self.assert_covers(bands, 20)
+
+        # the masked rows are split between the bands
+        counts = [np.count_nonzero(mask[s:e]) for s, e in bands]
+        self.assertLess(bands[0][1], 10)
+        self.assertLessEqual(abs(counts[0] - counts[1]), 20)
+
+    def test_more_bands_than_rows(self):
+        bands = row_bands(np.ones((3, 4)), 8)
+
+        self.assert_covers(bands, 3)
+        self.assertEqual(len(bands), 3)
+
+    def test_single_band(self):
+        self.assertEqual(row_bands(np.ones((7, 2)), 1), [(0, 7)])
+
+
+class TestSharedMemory(unittest.TestCase):
+    """
+    Testing the import of multiprocessing.shared_memory for the tiles
+    """
+
+    def test_shared_memory(self):
+        self.assertEqual(shared_memory().__name__, 'SharedMemory')
+
+    def test_old_python(self):
+        # the module is missing before Python 3.8
+        with mock.patch.dict(
+                sys.modules, {'multiprocessing.shared_memory': None}):
+            with self.assertRaisesRegex(ImportError, 'Python 3.8'):
+                shared_memory()
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from awsm.models.pysnobal.input_arena import FREEZE, InputArena
+from awsm.models.pysnobal.pysnobal_io import PysnobalIO, gather_output
+
+
+class TestInputArena(unittest.TestCase):
+    """
+    Testing the double buffered forcing input
+    """
+
+    NAMES = ['T_a', 'T_pp', 'T_g', 'm_pp']
+
+    def forcing(self, value):
+        return {name: np.full((2, 3), value) for name in self.NAMES}
+
+    def test_alternating_buffers(self):
+        arena = InputArena((2, 3), self.NAMES)
+
+        input1 = arena.load(self.forcing(1.0), 'step 1')
+        input2 = arena.load(self.forcing(2.0), 'step 2')
+        self.assertIsNot(input1, input2)
+        np.testing.assert_array_equal(input1['m_pp'], 1.0)
+        np.testing.assert_array_equal(input2['m_pp'], 2.0)
+
+        # the third load reuses the arrays of the first
+        arrays = {name: input1[name] for name in self.NAMES}
+        input3 = arena.load(self.forcing(3.0), 'step 3')
+        self.assertIs(input3, input1)
+        for name in self.NAMES:
+            self.assertIs(input3[name], arrays[name])
+
+        self.assertEqual(input3['time_step'], 'step 3')
+        np.testing.assert_array_equal(input2['m_pp'], 2.0)
+
+    def test_kelvin(self):
+        arena = InputArena((2, 3), self.NAMES)
+
+        data = self.forcing(-5.0)
+        data['T_g'] = -2.5
+        inpt = arena.load(data, None)
+
+        np.testing.assert_array_equal(inpt['T_a'], -5.0 + FREEZE)
+        np.testing.assert_array_equal(inpt['T_pp'], -5.0 + FREEZE)
+        np.testing.assert_array_equal(inpt['T_g'], -2.5 + FREEZE)
+        np.testing.assert_array_equal(inpt['m_pp'], -5.0)
+
+        # the source data is not changed
+        np.testing.assert_array_equal(data['T_a'], -5.0)
+
+
+class TestGatherOutput(unittest.TestCase):
+    """
+    Testing gathering the configured output variables
+    """
+
+    VARIABLES = ['thickness', 'temperature_surface']
+
+    def setUp(self):
+        self.output_rec = {
+            att['ipysnobal_var']: np.full((2, 3), 300.0)
+            for att in PysnobalIO.OUTPUT_VARIABLES.values()
+        }
+
+    def test_copy(self):
+        output = gather_output(self.output_rec, self.VARIABLES)
+
+        self.assertEqual(sorted(output.keys()), sorted(self.VARIABLES))
+        self.assertIsNot(output['thickness'], self.output_rec['z_s'])
+        np.testing.assert_array_equal(output['thickness'], 300.0)
+        np.testing.assert_allclose(
+            output['temperature_surface'], 300.0 - FREEZE)
+
+    def test_buffers(self):
+        buffers = {}
+        output = gather_output(self.output_rec, self.VARIABLES, buffers)
+
+        self.assertIs(output['thickness'], self.output_rec['z_s'])
+        self.assertIs(
+            output['temperature_surface'], buffers['temperature_surface'])
+
+        self.output_rec['T_s_0'][:] = FREEZE
+        output = gather_output(self.output_rec, self.VARIABLES, buffers)
+        self.assertIs(
+            output['temperature_surface'], buffers['temperature_surface'])
+        np.testing.assert_array_equal(output['temperature_surface'], 0.0)
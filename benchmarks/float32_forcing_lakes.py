@@ -0,0 +1,139 @@
+"""
+Accuracy and memory of the float32_forcing mode over the Lakes test
+basin. Each case is run with the float64 forcing and with float32_forcing
+in a fresh process, reporting the peak resident memory and, for every
+output variable, the maximum absolute and relative difference from the
+float64 run and whether it passes the gold test comparison. Usage:
+
+    python benchmarks/float32_forcing_lakes.py \
+        --cases ipysnobal prefetch smrf_process
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xarray as xr
+from inicheck.tools import cast_all_variables, get_user_config
+
+import awsm
+from awsm.framework.framework import AWSM
+
+LAKES_CONFIG = os.path.join(
+    os.path.dirname(awsm.__file__), 'tests', 'basins', 'Lakes', 'config.ini')
+
+# config changes of each case
+CASES = {
+    'ipysnobal': {},
+    'prefetch': {'ipysnobal': {'prefetch_depth': 4}},
+    'smrf_process': {
+        'awsm master': {'model_type': 'smrf_ipysnobal'},
+        'system': {'threading': True},
+        'ipysnobal': {'smrf_process': True},
+    },
+}
+
+
+def lakes_config(config_file, case, float32):
+    config = get_user_config(config_file, modules=['smrf', 'awsm'])
+    config.raw_cfg['awsm master']['run_smrf'] = False
+    config.raw_cfg['ipysnobal']['output_writer'] = 'async'
+    config.raw_cfg['ipysnobal']['float32_forcing'] = float32
+    for section, items in CASES[case].items():
+        config.raw_cfg[section].update(items)
+
+    config.apply_recipes()
+    return cast_all_variables(config, config.mcfg)
+
+
+def run(config_file, case, float32):
+    """Run in a worker process, the peak resident memory in MB and the
+    model output
+    """
+
+    with AWSM(lakes_config(config_file, case, float32)) as a:
+        if a.model_type == 'smrf_ipysnobal':
+            a.run_smrf_ipysnobal()
+        else:
+            a.run_ipysnobal()
+
+        with xr.open_dataset(
+                os.path.join(a.path_output, 'ipysnobal.nc')) as ds:
+            output = {v: ds[v].values for v in ds.data_vars}
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return peak, output
+
+
+def make_forcing(config_file):
+    """Run SMRF to make the netCDF forcing of the ipysnobal cases"""
+
+    config = lakes_config(config_file, 'ipysnobal', False)
+    with AWSM(config) as a:
+        a.run_smrf()
+
+
+def run_process(target, *args):
+    """Run in a fresh process so the peak memory is its own"""
+
+    with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(target, *args).result()
+
+
+def gold_status(gold, test):
+    """Gold test comparison, exact or the relative tolerance it passes"""
+
+    if np.array_equal(gold, test, equal_nan=True):
+        return 'exact'
+    for rtol in (1e-5, 1e-4):
+        if np.allclose(test, gold, atol=0, rtol=rtol, equal_nan=True):
+            return 'rtol {:g}'.format(rtol)
+    return 'FAIL'
+
+
+def report(case, reference, float32):
+
+    print('{}: peak memory {:.0f} MB float64, {:.0f} MB '
+          'float32_forcing'.format(case, reference[0], float32[0]))
+    print('  {:<24} {:>12} {:>12}  {}'.format(
+        'variable', 'max abs', 'max rel', 'gold check'))
+
+    for name, gold in sorted(reference[1].items()):
+        test = float32[1][name]
+        if gold.dtype.kind != 'f':
+            continue
+
+        diff = np.abs(test - gold)
+        scale = np.maximum(np.abs(gold), np.finfo(np.float32).tiny)
+        print('  {:<24} {:12.3e} {:12.3e}  {}'.format(
+            name,
+            float(np.nanmax(diff)),
+            float(np.nanmax(diff / scale)),
+            gold_status(gold, test)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Accuracy and memory of the float32_forcing mode')
+    parser.add_argument('--config', default=LAKES_CONFIG)
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES),
+                        default=['ipysnobal', 'smrf_process'])
+    args = parser.parse_args()
+
+    if any(CASES[case].get('awsm master', {}).get('model_type') is None
+           for case in args.cases):
+        run_process(make_forcing, args.config)
+
+    for case in args.cases:
+        report(case,
+               run_process(run, args.config, case, False),
+               run_process(run, args.config, case, True))
+
+
+if __name__ == '__main__':
+    main()
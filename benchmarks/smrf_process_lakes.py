@@ -0,0 +1,92 @@
+"""
+Throughput of smrf_ipysnobal over the Lakes test basin with HRRR loaded in
+timestep mode, running SMRF threaded in the model process and in a separate
+process that hands the forcing to the model through the shared memory ring.
+The model output of the two runs is compared. Usage:
+
+    python benchmarks/smrf_process_lakes.py --repeat 3 --slots 2 4
+"""
+
+import argparse
+import os
+from time import perf_counter
+
+import numpy as np
+import xarray as xr
+from inicheck.tools import cast_all_variables, get_user_config
+
+import awsm
+from awsm.framework.framework import AWSM
+
+LAKES_CONFIG = os.path.join(
+    os.path.dirname(awsm.__file__), 'tests', 'basins', 'Lakes', 'config.ini')
+
+
+def lakes_config(config_file, slots):
+    config = get_user_config(config_file, modules=['smrf', 'awsm'])
+    config.raw_cfg['gridded']['hrrr_load_method'] = 'timestep'
+    config.raw_cfg['awsm master']['run_smrf'] = False
+    config.raw_cfg['awsm master']['model_type'] = 'smrf_ipysnobal'
+    config.raw_cfg['system']['threading'] = True
+    config.raw_cfg['ipysnobal']['smrf_process'] = slots > 0
+    if slots > 0:
+        config.raw_cfg['ipysnobal']['smrf_process_slots'] = slots
+
+    config.apply_recipes()
+    return cast_all_variables(config, config.mcfg)
+
+
+def run(config_file, slots):
+    """Seconds to run smrf_ipysnobal, the number of time steps and the
+    model output
+    """
+
+    with AWSM(lakes_config(config_file, slots)) as a:
+        start = perf_counter()
+        a.run_smrf_ipysnobal()
+        elapsed = perf_counter() - start
+
+        nsteps = len(a.pysnobal.date_time)
+        with xr.open_dataset(
+                os.path.join(a.path_output, 'ipysnobal.nc')) as ds:
+            output = ds.load()
+
+    return elapsed, nsteps, output
+
+
+def max_difference(reference, output):
+    return max(
+        float(np.nanmax(np.abs(reference[v].values - output[v].values)))
+        for v in reference.data_vars
+        if v in output and reference[v].dtype.kind == 'f'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='smrf_ipysnobal threaded and with a SMRF process')
+    parser.add_argument('--config', default=LAKES_CONFIG)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--slots', type=int, nargs='+', default=[2, 4])
+    args = parser.parse_args()
+
+    reference = None
+    base = None
+    for slots in [0] + args.slots:
+        runs = [run(args.config, slots) for _ in range(args.repeat)]
+        seconds = min(elapsed for elapsed, _, _ in runs)
+        nsteps, output = runs[0][1], runs[0][2]
+
+        if reference is None:
+            base, reference = seconds, output
+
+        name = 'threaded' if slots == 0 else \
+            'process, {} slots'.format(slots)
+        print('{:>18}: {:8.3f} s, {:6.2f} time steps per s, speedup '
+              '{:5.2f}, max output difference {:.2e}'.format(
+                  name, seconds, nsteps / seconds, base / seconds,
+                  max_difference(reference, output)))
+
+
+if __name__ == '__main__':
+    main()
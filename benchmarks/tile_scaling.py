@@ -0,0 +1,143 @@
+"""
+Wall time of iPysnobal time steps on a synthetic snowpack, running the
+whole grid in the model process and in row bands with tile worker
+processes. Usage:
+
+    python benchmarks/tile_scaling.py --ny 1000 --nx 1000 --steps 6 \
+        --workers 1 2 4 8 --ithreads 1
+"""
+
+import argparse
+import time
+
+import numpy as np
+from pysnobal import ipysnobal
+from pysnobal.c_snobal import snobal
+
+from awsm.models.pysnobal.input_arena import FREEZE, InputArena
+from awsm.models.pysnobal.tile_executor import TileExecutor
+from awsm.models.smrf_connector import SMRFConnector
+
+CONSTANTS = {
+    'time_step': 60,
+    'max-h2o': 0.01,
+    'c': True,
+    'K': True,
+    'mass_threshold': 60,
+    'time_z': 0,
+    'max_z_s_0': 0.25,
+    'z_u': 5.0,
+    'z_t': 5.0,
+    'z_g': 0.5,
+    'relative_heights': True,
+}
+
+
+def make_init(shape, rng):
+    depth = rng.uniform(0, 2, shape)
+    depth[:, :shape[1] // 4] = 0.0
+    return {
+        'mask': np.ones(shape),
+        'z_0': np.full(shape, 0.005),
+        'elevation': rng.uniform(1500, 3000, shape),
+        'z_s': depth,
+        'rho': np.full(shape, 250.0),
+        'T_s_0': np.full(shape, FREEZE - 5),
+        'T_s_l': np.full(shape, FREEZE - 5),
+        'T_s': np.full(shape, FREEZE - 5),
+        'h2o_sat': np.zeros(shape),
+    }
+
+
+def make_forcing(shape, rng, hour):
+    return {
+        'S_n': np.clip(600 * np.sin(np.pi * hour / 24), 0, None) *
+        rng.uniform(0.5, 1, shape),
+        'I_lw': rng.uniform(200, 300, shape),
+        'T_a': rng.uniform(-10, 5, shape),
+        'e_a': rng.uniform(200, 600, shape),
+        'u': rng.uniform(0, 8, shape),
+        'T_g': np.full(shape, -2.5),
+        'm_pp': rng.uniform(0, 2, shape),
+        'percent_snow': np.ones(shape),
+        'rho_snow': np.full(shape, 150.0),
+        'T_pp': rng.uniform(-10, 0, shape),
+    }
+
+
+def run(shape, steps, workers, ithreads, seed=0):
+    """Seconds per time step with a number of tile workers, 1 runs the
+    whole grid in the process
+    """
+
+    rng = np.random.default_rng(seed)
+    options = {
+        'constants': dict(CONSTANTS),
+        'output': {'frequency': 1, 'nthreads': ithreads},
+    }
+    params, time_step_info = ipysnobal.get_tstep_info(
+        options['constants'], options)
+    output_rec = ipysnobal.initialize(
+        params, time_step_info, make_init(shape, rng))
+    names = SMRFConnector.MAP_INPUTS.values()
+
+    tiles = None
+    if workers > 1:
+        tiles = TileExecutor(
+            output_rec, names, options['constants'], params,
+            np.ones(shape), workers, ithreads)
+        inputs = tiles.inputs
+    else:
+        inputs = InputArena(shape, names)
+
+    forcing = [make_forcing(shape, rng, hour) for hour in range(steps + 1)]
+    input1 = inputs.load(forcing[0], 0)
+
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        input2 = inputs.load(forcing[step], step)
+        if tiles is None:
+            snobal.do_tstep_grid(
+                input1, input2, output_rec, time_step_info,
+                options['constants'], params, first_step=step,
+                nthreads=ithreads)
+        else:
+            tiles.do_tstep(input1, output_rec, time_step_info, step)
+        input1 = input2
+    elapsed = time.perf_counter() - start
+
+    if tiles is not None:
+        tiles.close(output_rec)
+
+    return elapsed / steps, output_rec['z_s']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='iPysnobal time step scaling with tile workers')
+    parser.add_argument('--ny', type=int, default=1000)
+    parser.add_argument('--nx', type=int, default=1000)
+    parser.add_argument('--steps', type=int, default=6)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    parser.add_argument('--ithreads', type=int, default=1)
+    args = parser.parse_args()
+
+    shape = (args.ny, args.nx)
+    print('Grid {} x {}, {} steps, {} threads per worker'.format(
+        args.ny, args.nx, args.steps, args.ithreads))
+
+    base = None
+    reference = None
+    for workers in args.workers:
+        seconds, z_s = run(shape, args.steps, workers, args.ithreads)
+        if base is None:
+            base, reference = seconds, z_s
+        print('{:>3} workers: {:8.3f} s per step, speedup {:5.2f}, '
+              'max depth difference {:.2e}'.format(
+                  workers, seconds, base / seconds,
+                  np.max(np.abs(z_s - reference))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Memory allocated by the Python side of an iPysnobal time step, comparing
+the previous implementation with the preallocated input and output buffers.
+
+The iSnobal kernel is not run, only the forcing conversion, the input
+hand off and the output gathering around it. Usage:
+
+    python benchmarks/timestep_allocations.py --ny 500 --nx 500 --steps 24
+"""
+
+import argparse
+import tracemalloc
+from copy import copy
+
+import numpy as np
+
+from awsm.models.pysnobal.input_arena import FREEZE, InputArena
+from awsm.models.pysnobal.pysnobal_io import PysnobalIO, gather_output
+from awsm.models.smrf_connector import SMRFConnector
+
+
+def make_forcing(shape):
+    return {
+        name: np.random.uniform(0, 1, shape)
+        for name in SMRFConnector.MAP_INPUTS.values()
+    }
+
+
+def make_output_rec(shape):
+    output_rec = {
+        att['ipysnobal_var']: np.random.uniform(250, 300, shape)
+        for att in PysnobalIO.OUTPUT_VARIABLES.values()
+    }
+    output_rec['current_time'] = np.zeros(shape)
+    output_rec['time_since_out'] = np.zeros(shape)
+    return output_rec
+
+
+def previous_step(state, forcing, output_rec, variables):
+    """The time step hand off as it was before the input buffers"""
+
+    data = dict(forcing)
+    data['T_a'] = data['T_a'] + FREEZE
+    data['T_pp'] = data['T_pp'] + FREEZE
+    data['T_g'] = data['T_g'] + FREEZE
+    state['input2'] = data
+
+    state['input1'] = state['input2'].copy()
+
+    output = {}
+    for key, att in PysnobalIO.OUTPUT_VARIABLES.items():
+        output[key] = copy(output_rec[att['ipysnobal_var']])
+    output['temperature_snowcover'] -= FREEZE
+    output['temperature_surface'] -= FREEZE
+    output['temperature_lower'] -= FREEZE
+    state['output'] = {key: output[key] for key in variables}
+
+    output_rec['time_since_out'] = np.zeros_like(output_rec['z_s'])
+
+
+def buffered_step(state, forcing, output_rec, variables):
+    """The time step hand off with the input and output buffers"""
+
+    state['input2'] = state['arena'].load(forcing, None)
+    state['input1'] = state['input2']
+
+    state['output'] = gather_output(output_rec, variables, state['buffers'])
+
+    output_rec['time_since_out'].fill(0.0)
+
+
+def measure(step, state, shape, steps, variables):
+    """Peak bytes allocated per step, after a warm up step"""
+
+    forcing = make_forcing(shape)
+    output_rec = make_output_rec(shape)
+    step(state, forcing, output_rec, variables)
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(steps):
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        step(state, forcing, output_rec, variables)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - start)
+    tracemalloc.stop()
+
+    return np.mean(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Bytes allocated per iPysnobal time step')
+    parser.add_argument('--ny', type=int, default=500)
+    parser.add_argument('--nx', type=int, default=500)
+    parser.add_argument('--steps', type=int, default=24)
+    parser.add_argument(
+        '--variables', nargs='+',
+        default=['thickness', 'snow_density', 'specific_mass',
+                 'liquid_water', 'temperature_snowcover'])
+    args = parser.parse_args()
+
+    shape = (args.ny, args.nx)
+    grid = np.zeros(shape).nbytes
+
+    previous = measure(previous_step, {}, shape, args.steps, args.variables)
+    buffered = measure(
+        buffered_step,
+        {
+            'arena': InputArena(shape, SMRFConnector.MAP_INPUTS.values()),
+            'buffers': {},
+        },
+        shape, args.steps, args.variables)
+
+    print('Grid {} x {}, {} output variables, {} bytes per grid'.format(
+        args.ny, args.nx, len(args.variables), grid))
+    for name, value in (('previous', previous), ('buffered', buffered)):
+        print('{:>10}: {:14.0f} bytes per step ({:.1f} grids)'.format(
+            name, value, value / grid))
+
+
+if __name__ == '__main__':
+    main()
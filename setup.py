@@ -34,7 +34,8 @@ setup(
         './scripts/plot_csv',
         './scripts/clean_awsm',
         './scripts/awsm_daily',
-        './scripts/awsm_daily_airflow'
+        './scripts/awsm_daily_airflow',
+        './scripts/awsm_forcing_cache'
     ],
     install_requires=requirements,
     license="CC0 1.0",